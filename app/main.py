@@ -9,32 +9,57 @@ their own copy of this code on their own machine.
 
 ENDPOINTS:
   GET  /                  - Returns API name and list of endpoints.
-  GET  /health            - Returns status of all services (for monitoring).
+  GET  /health            - Returns status of all services, plus vector index readiness and
+                            build progress (for monitoring / load balancers).
+  GET  /stats             - Returns cache counters (query-embedding LRU, embedding cache),
+                            the session flusher's backlog, the in-memory session cache's
+                            hits/misses/evictions, per-session lock wait times and the
+                            session store's counts.
+  GET  /startup           - Returns the startup timeline (imports, model load, document load,
+                            chunking, embedding, indexing, client creation).
   POST /chat              - General chat: pure LLM, no web search. Uses learning data
                             and past chats via vector-store retrieval only.
   POST /chat/realtime     - Realtime chat: runs a Tavily web search first, then
                             sends results + context to Groq. Same session as /chat.
-  GET  /chat/history/{id} - Returns all messages for a session (general + realtime).
+  GET  /chat/history/{id} - Returns the messages of a session (general + realtime); all of
+                            them, or one page with ?offset=&limit=.
 
 SESSION:
   Both /chat and /chat/realtime use the same session_id. If you omit session_id,
   the server generates a UUID and returns it; send it back on the next request
-  to continue the conversation. Sessions are saved to disk and survive restarts.
+  to continue the conversation. Sessions are saved to disk and survive restarts; a turn is
+  written shortly after the response is sent, by a background flusher (see CHAT_FLUSH_INTERVAL),
+  to JSON files or an SQLite database (CHAT_STORE, see app/services/session_store.py).
+  Handlers run their blocking work in the thread pool; two requests for the same session
+  take turns (per-session lock), requests for different sessions run in parallel.
 
 STARTUP:
-  On startup, the lifespan function builds the vector store from learning_data/*.txt
-  and chats_data/*.json, then creates Groq, Realtime, and Chat services. On shutdown,
-  it saves all in-memory sessions to disk.
+  On startup, the lifespan function starts loading the saved vector store in the background
+  (re-embedding only the learning_data/*.txt files and chat sessions that changed since it
+  was saved, or building it from scratch if needed), then creates Groq, Realtime, and Chat
+  services and starts serving right away. Until the index is ready, chats are answered without
+  retrieved context; /health reports "ready" and the build percentage. A watcher then keeps
+  learning_data/*.txt in sync with the index (see LEARNING_WATCH in config.py). On shutdown,
+  it drains the session flusher so every unsaved turn is written to disk.
+
+  Importing this module is cheap: the service modules (LangChain FAISS, langchain_groq,
+  tavily) are imported inside lifespan, and the embedding model (torch / transformers) loads
+  in the background build. Each step is timed in app.utils.startup_timeline; the summary is
+  logged once the server is serving and the index is ready, and served by GET /startup.
 """
 
-
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Optional
 import uvicorn
 import logging
 
+from app.utils.startup_timeline import startup_timeline
+
 from app.models import ChatRequest, ChatResponse
+from config import LEARNING_WATCH
 
 # User-friendly message when Groq rate limit (daily token quota) is exceeded.
 RATE_LIMIT_MESSAGE = (
@@ -49,12 +74,13 @@ def _is_rate_limit_error(exc: Exception) -> bool:
     return "429" in str(exc) or "rate limit" in msg or "tokens per day" in msg
 
 
-from app.services.vector_store import VectorStoreService
-from app.services.groq_service import GroqService
-from app.services.realtime_service import RealtimeGroqService
-from app.services.chat_service import ChatService
-from config import VECTOR_STORE_DIR
-from langchain_community.vectorstores import FAISS
+if TYPE_CHECKING:
+    # Only for the annotations below; the real imports happen in lifespan (see STARTUP).
+    from app.services.vector_store import VectorStoreService
+    from app.services.groq_service import GroqService
+    from app.services.realtime_service import RealtimeGroqService
+    from app.services.chat_service import ChatService
+    from app.services.learning_watcher import LearningDataWatcher
 
 
 # -----------------------------------------------------------------------------
@@ -73,10 +99,11 @@ logger = logging.getLogger("J.A.R.V.I.S")
 # -----------------------------------------------------------------------------
 # Set during startup (lifespan) and used by all route handlers.
 # Stored as globals so async endpoints can access the same service instances.
-vector_store_service: VectorStoreService = None
-groq_service: GroqService = None
-realtime_service: RealtimeGroqService = None
-chat_service: ChatService = None
+vector_store_service: "VectorStoreService" = None
+learning_watcher: "LearningDataWatcher" = None
+groq_service: "GroqService" = None
+realtime_service: "RealtimeGroqService" = None
+chat_service: "ChatService" = None
 
 def print_title():
     """Print the J.A.R.V.I.S ASCII art banner to the console when the server starts."""
@@ -112,12 +139,14 @@ async def lifespan(app: FastAPI):
 
     This function manages the application's lifecycle:
     - STARTUP: Initializes all services in the correct order
-      1. VectorStoreService: Creates FAISS index from learning data and chat history
+      1. VectorStoreService: Starts loading (or building) the FAISS index from learning data and
+         chat history in the background; requests are served meanwhile with no retrieved context
       2. GroqService: Sets up general chat AI service
       3. RealtimeGroqService: Sets up realtime chat with Tavily search
       4. ChatService: Manages chat sessions and conversations
     - RUNTIME: Application runs normally
-    - SHUTDOWN: Saves all active chat sessions to disk
+    - SHUTDOWN: Drains the session flusher (writes every unsaved chat turn), stops the learning
+      data watcher, then saves the live-updated vector index
 
     The services are initialized in this specific order because:
     - VectorStoreService must be created first (used by GroqService)
@@ -126,7 +155,7 @@ async def lifespan(app: FastAPI):
     
     All services are stored as global variables so they can be accessed by API endpoints.
     """
-    global vector_store_service, groq_service, realtime_service, chat_service
+    global vector_store_service, learning_watcher, groq_service, realtime_service, chat_service
 
     print_title()
     logger.info("=" * 60)
@@ -134,31 +163,45 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 60)
 
     try:
-        # Initialize vector store service
+        # Service modules pull in LangChain, FAISS, Groq and Tavily; import them now, not at module load.
+        with startup_timeline.phase("imports"):
+            from app.services.vector_store import VectorStoreService
+            from app.services.groq_service import GroqService
+            from app.services.realtime_service import RealtimeGroqService
+            from app.services.chat_service import ChatService
+            from app.services.learning_watcher import LearningDataWatcher
+
+        # Initialize vector store service; the index loads/builds in the background.
         logger.info("Initializing vector store service...")
         vector_store_service = VectorStoreService()
-        vector_store_service.create_vector_store()
-        logger.info("Vector store initialized successfully")
-
-        # Initialize Groq service (general chat)
-        logger.info("Initializing Groq service (general queries)...")
-        groq_service = GroqService(vector_store_service)
-        logger.info("Groq service initialized successfully")
-
-        # Initialize Realtime Groq service (with Tavily search)
-        logger.info("Initializing Realtime Groq service (with Tavily search)...")
-        realtime_service = RealtimeGroqService(vector_store_service)
-        logger.info("Realtime Groq service initialized successfully")
-
-        # Initialize chat service
-        logger.info("Initializing chat service...")
-        chat_service = ChatService(groq_service, realtime_service)
-        logger.info("Chat service initialized successfully")
+        vector_store_service.start_background_build()
+        logger.info("Vector store build started in the background")
+        if LEARNING_WATCH:
+            # Re-index learning data files edited while running; updates queue behind the build.
+            learning_watcher = LearningDataWatcher(vector_store_service)
+            learning_watcher.start()
+
+        with startup_timeline.phase("client_creation"):
+            # Initialize Groq service (general chat)
+            logger.info("Initializing Groq service (general queries)...")
+            groq_service = GroqService(vector_store_service)
+            logger.info("Groq service initialized successfully")
+
+            # Initialize Realtime Groq service (with Tavily search)
+            logger.info("Initializing Realtime Groq service (with Tavily search)...")
+            realtime_service = RealtimeGroqService(vector_store_service)
+            logger.info("Realtime Groq service initialized successfully")
+
+            # Initialize chat service
+            logger.info("Initializing chat service...")
+            chat_service = ChatService(groq_service, realtime_service, vector_store_service)
+            logger.info("Chat service initialized successfully")
+        startup_timeline.mark("serving")
 
         # Startup complete
         logger.info("=" * 60)
         logger.info("Service Status:")
-        logger.info("    - Vector Store: Ready")
+        logger.info("    - Vector Store: Building in background (see /health)")
         logger.info("    - Groq AI (General): Ready")
         logger.info("    - Groq AI (Realtime): Ready")
         logger.info("    - Chat Service: Ready")
@@ -170,11 +213,17 @@ async def lifespan(app: FastAPI):
 
         yield
 
-        # Shutdown: Save active sessions
+        # Shutdown: final drain of sessions the flusher has not written yet
         logger.info("\nShutting down J.A.R.V.I.S...")
         if chat_service:
-            for session_id in list(chat_service.sessions.keys()):
-                chat_service.save_chat_session(session_id)
+            chat_service.close()
+        if learning_watcher:
+            learning_watcher.stop()
+        # Apply any queued live index updates and persist the index if they changed it.
+        if vector_store_service:
+            vector_store_service.close()
+            # Last reader of the session store (queued chat re-indexing) is done; release it.
+            vector_store_service.session_store.close()
         logger.info("All sessions saved. Goodbye!")
 
     except Exception as e:
@@ -201,6 +250,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Everything above after FastAPI itself (pydantic models, config) is what importing app.main costs.
+startup_timeline.mark("app_imported")
+
 
 # =========================================================================
 # API ENDPOINTS
@@ -215,23 +267,62 @@ async def root():
             "/chat": "General chat (pure LLM, no web search)",
             "/chat/realtime": "Realtime chat (with Tavily search)",
             "/chat/history/{session_id}": "Get chat history",
-            "/health": "System health check"
+            "/health": "System health check",
+            "/stats": "Cache and performance counters",
+            "/startup": "Startup timeline (where boot time went)"
         }
     }
 
 
 @app.get("/health")
 async def health():
-    """Return 'healthy' and whether each service (vector_store, groq, realtime, chat) is initialized."""
+    """
+    Return 'healthy', whether each service (vector_store, groq, realtime, chat) is initialized,
+    and the vector index build status. "ready" is False while the index is still building
+    (chats are answered without retrieved context until then); "index_build" has the phase
+    and an approximate percent.
+    """
     return {
         "status": "healthy",
+        "ready": vector_store_service is not None and vector_store_service.is_ready(),
         "vector_store": vector_store_service is not None,
         "groq_service": groq_service is not None,
         "realtime_service": realtime_service is not None,
-        "chat_service": chat_service is not None
+        "chat_service": chat_service is not None,
+        "index_build": vector_store_service.build_progress() if vector_store_service else None,
+    }
+
+
+@app.get("/stats")
+async def stats():
+    """
+    Return performance counters: query-embedding LRU hits/misses, chunk embedding cache size,
+    the session flusher's backlog and write rounds, the session cache's size and
+    hit/miss/eviction counters, per-session lock acquisitions and wait times, and the session
+    store backend's counts.
+    """
+    if not vector_store_service:
+        raise HTTPException(status_code=503, detail="Vector store not initialized")
+    flusher = chat_service.flusher if chat_service else None
+    return {
+        "vector_store": vector_store_service.stats(),
+        "session_flusher": flusher.stats() if flusher else None,
+        "session_cache": chat_service.sessions.stats() if chat_service else None,
+        "session_locks": chat_service.session_locks.stats() if chat_service else None,
+        "session_store": vector_store_service.session_store.stats(),
     }
 
 
+@app.get("/startup")
+async def startup():
+    """
+    Return the startup timeline: seconds spent per phase (imports, model_load, index_load,
+    document_load, chunking, embedding, indexing, client_creation) and when the server
+    started serving and the index became ready. "finished" is False while the index builds.
+    """
+    return startup_timeline.report()
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -250,7 +341,7 @@ async def chat(request: ChatRequest):
     3. Processes message through GroqService (pure LLM, no web search)
     4. Retrieves context from user data files and past conversations
     5. Generates response using Groq AI
-    6. Saves session to disk
+    6. Marks the session dirty; it is saved to disk in the background
     7. Returns response and session_id
 
     SESSION MANAGEMENT:
@@ -276,11 +367,12 @@ async def chat(request: ChatRequest):
 
     try:
         # Get existing session or create a new one (and optionally load from disk).
-        session_id = chat_service.get_or_create_session(request.session_id)
+        # Blocking work runs in the thread pool so other requests are served meanwhile.
+        session_id = await run_in_threadpool(chat_service.get_or_create_session, request.session_id)
         # Process with general chat: no web search; context comes from vector store only.
-        response_text = chat_service.process_message(session_id, request.message)
-        # Save session to disk so it survives restart and can be used by the vector store later.
-        chat_service.save_chat_session(session_id)
+        # Turns of the same session wait for each other (per-session lock in ChatService).
+        # The session is marked dirty; the flusher saves it (and re-indexes it) in the background.
+        response_text = await run_in_threadpool(chat_service.process_message, session_id, request.message)
         return ChatResponse(response=response_text, session_id=session_id)
     except ValueError as e:
         # Invalid session_id (e.g. path traversal ".." or too long).
@@ -313,7 +405,7 @@ async def chat_realtime(request: ChatRequest):
     4. Retrieves context from user data files and past conversations
     5. Combines search results with context
     6. Generates response using Groq AI with all available information
-    7. Saves session to disk
+    7. Marks the session dirty; it is saved to disk in the background
     8. Returns response and session_id
 
     IMPORTANT: This uses the SAME chat session as /chat endpoint.
@@ -350,10 +442,9 @@ async def chat_realtime(request: ChatRequest):
         raise HTTPException(status_code=503, detail="Realtime service not initialized")
 
     try:
-        session_id = chat_service.get_or_create_session(request.session_id)
+        session_id = await run_in_threadpool(chat_service.get_or_create_session, request.session_id)
         # Realtime: Tavily search first, then Groq with search results + context
-        response_text = chat_service.process_realtime_message(session_id, request.message)
-        chat_service.save_chat_session(session_id)
+        response_text = await run_in_threadpool(chat_service.process_realtime_message, session_id, request.message)
         return ChatResponse(response=response_text, session_id=session_id)
     except ValueError as e:
         logger.warning(f"Invalid session_id: {e}")
@@ -367,7 +458,7 @@ async def chat_realtime(request: ChatRequest):
 
 
 @app.get("/chat/history/{session_id}")
-async def get_chat_history(session_id: str):
+async def get_chat_history(session_id: str, offset: int = 0, limit: Optional[int] = None):
     """
     Get chat history for a specific session.
 
@@ -377,7 +468,8 @@ async def get_chat_history(session_id: str):
     HOW IT WORKS:
     1. Receives session_id as URL parameter
     2. Retrieves all messages from that session
-    3. Returns messages in chronological order
+    3. Returns messages in chronological order; with ?limit=N only messages offset .. offset + N - 1
+       (a session that is not in memory is then paged from the session store, not loaded whole)
 
     RESPONSE:
     {
@@ -395,8 +487,11 @@ async def get_chat_history(session_id: str):
         raise HTTPException(status_code=503, detail="Chat service not initialized")
 
     try:
-        # Return in-memory messages for this session (empty if session not loaded).
-        messages = chat_service.get_chat_history(session_id)
+        if limit is not None:
+            messages = await run_in_threadpool(chat_service.get_history_page, session_id, offset, limit)
+        else:
+            # Messages of this session, reloaded from the session store if not in memory.
+            messages = await run_in_threadpool(chat_service.get_chat_history, session_id)
         return {
             "session_id": session_id, 
             "messages": [{"role": msg.role, "content": msg.content} for msg in messages]
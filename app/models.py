@@ -9,7 +9,7 @@ serialize responses; the chat service uses them when saving/loading sessions.
 MODELS:
   ChatRequest     - Body of POST /chat and POST /chat/realtime (message + optional session_id).
   ChatResponse    - Body returned by both chat endpoints (response text + session_id).
-  ChatMessage     - One message in a conversation (role + content). Used inside ChatHistory.
+  ChatMessage     - One message in a conversation (role + content + when it was sent). Used inside ChatHistory.
   ChatHistory     - Full conversation: session_id + list of ChatMessage. Used when saving to disk.
 """
 
@@ -23,10 +23,12 @@ from typing import List, Optional
 class ChatMessage(BaseModel):
     """
     A single message in a conversation (user or assistant).
-    Stored in order inside a session. No timestamp; order defines chronology.
+    Stored in order inside a session; order defines chronology. timestamp is when the
+    message was added (ISO 8601, UTC); None for messages saved before it was recorded.
     """
     role: str       # Either "user" (human) or "assistant" (Jarvis).
     content: str    # The message text.
+    timestamp: Optional[str] = None
 
 class ChatRequest(BaseModel):
     """
@@ -0,0 +1,127 @@
+"""
+BM25 INDEX MODULE
+=================
+
+In-memory inverted index with Okapi BM25 scoring over the same chunks as the FAISS index.
+Dense (MiniLM) similarity is good at meaning but often misses exact tokens: names, IDs,
+numbers and rare words from userdata.txt or past chats. BM25 catches those, and the vector
+store fuses both rankings with reciprocal rank fusion (see VectorStoreService.search).
+
+DATA:
+  postings  - term -> {doc_id: term frequency}
+  doc_terms - doc_id -> Counter of its terms (so a chunk can be removed again)
+  doc_len   - doc_id -> number of terms; total_len tracks the sum for the average length
+
+TOKENS:
+  Lower-cased runs of letters/digits/underscore (unicode aware). A short list of English
+  stopwords is dropped: they carry almost no BM25 weight but have the longest postings, so
+  skipping them keeps queries fast.
+
+Thread-safe: add/remove/search take one lock. Scoring is pure Python but only touches the
+postings of the query's terms, so it stays in the sub-millisecond to few-ms range.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its me my of on or "
+    "our she so that the their them they this to was we were what when where which who will "
+    "with you your user assistant".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-case word tokens, dropping stopwords (and the User:/Assistant: labels)."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+# ==============================================================================
+# BM25 INDEX CLASS
+# ==============================================================================
+
+class BM25Index:
+    """Okapi BM25 over chunks keyed by their docstore id. k1 = term saturation, b = length normalisation."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """Create an empty index with the given BM25 parameters."""
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: str, text: str):
+        """Index one chunk (replacing it if doc_id is already present)."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._doc_terms[doc_id] = terms
+            length = sum(terms.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """Index several (doc_id, text) pairs."""
+        for doc_id, text in items:
+            self.add(doc_id, text)
+
+    def remove(self, doc_ids: Iterable[str]):
+        """Remove chunks; ids that are not indexed are ignored."""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str):
+        """Remove one chunk's postings (caller holds the lock)."""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        for term in terms:
+            docs = self._postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (doc_id, bm25_score) pairs, best first. Empty if no query term is indexed."""
+        query_terms = set(tokenize(query))
+        with self._lock:
+            num_docs = len(self._doc_len)
+            if not num_docs or not query_terms:
+                return []
+            avg_len = self._total_len / num_docs
+            scores: Dict[str, float] = {}
+            for term in query_terms:
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                df = len(docs)
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def __len__(self) -> int:
+        """Number of indexed chunks."""
+        with self._lock:
+            return len(self._doc_len)
+
+    def stats(self) -> dict:
+        """Chunk and vocabulary counts."""
+        with self._lock:
+            return {"documents": len(self._doc_len), "terms": len(self._postings)}
@@ -0,0 +1,139 @@
+"""
+CHAT JOURNAL MODULE
+===================
+
+On-disk format of a chat session: a snapshot plus an append-only journal, so saving a
+turn writes only the new messages instead of re-serializing the whole conversation.
+
+FILES (database/chats_data/):
+  chat_<id>.json   Snapshot: {"session_id": ..., "messages": [...]}, the same layout as
+                   before journaling, so older files load unchanged. Always written
+                   atomically (temp file + rename).
+  chat_<id>.jsonl  Journal: one message per line, {"seq": n, "role", "content", "timestamp"},
+                   where seq is the message's position in the session. Lines are only
+                   ever appended.
+
+READING:
+  read_session() returns the snapshot's messages followed by the journal lines whose seq
+  continues them. Lines with a seq the snapshot already covers are skipped (left over if
+  the process stopped between writing a snapshot and removing the journal), and so is a
+  torn line from an interrupted append; the next append starts on a fresh line.
+  JsonSessionStore (session_store.py) reads and writes sessions through here for
+  ChatService and the vector store's chat loader.
+
+DURABILITY:
+  append_messages() and write_snapshot() take fsync=True to force their data to disk
+  before returning (for the snapshot: before the rename, so the new name never points at
+  a half-written file); fsync_directory() makes new and renamed entries durable.
+
+COMPACTION:
+  write_snapshot() folds everything into a new snapshot and deletes the journal. The JSON
+  session store does that when a session is first saved and whenever its journal reaches
+  CHAT_JOURNAL_COMPACT_LINES lines, so loading never has to replay a long journal.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+JOURNAL_SUFFIX = ".jsonl"
+
+
+def journal_path(snapshot_path: Path) -> Path:
+    """Journal file that belongs to a snapshot: chat_<id>.json -> chat_<id>.jsonl."""
+    return Path(snapshot_path).with_suffix(JOURNAL_SUFFIX)
+
+
+def read_journal(snapshot_path: Path, start_seq: int) -> List[dict]:
+    """
+    Messages appended to the journal from position start_seq on, in order (seq removed).
+    Skips unreadable lines and stops at the first gap; returns [] if there is no journal.
+    """
+    path = journal_path(snapshot_path)
+    messages: List[dict] = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring unreadable line in chat journal %s", path)
+                    continue
+                seq = entry.pop("seq", None)
+                if not isinstance(seq, int) or seq < start_seq + len(messages):
+                    continue  # Already in the snapshot.
+                if seq != start_seq + len(messages):
+                    logger.warning("Chat journal %s skips from %d to %d; ignoring the rest", path, start_seq + len(messages), seq)
+                    break
+                messages.append(entry)
+    except FileNotFoundError:
+        pass
+    return messages
+
+
+def read_session(snapshot_path: Path) -> Tuple[Optional[str], List[dict], int]:
+    """
+    Load a session: (session_id from the snapshot, all messages as dicts, number of those
+    that came from the journal). Raises like json.load if the snapshot is unreadable.
+    """
+    with open(snapshot_path, "r", encoding="utf-8") as f:
+        chat_dict = json.load(f)
+    messages = list(chat_dict.get("messages", []))
+    journaled = read_journal(snapshot_path, len(messages))
+    return chat_dict.get("session_id"), messages + journaled, len(journaled)
+
+
+def append_messages(snapshot_path: Path, first_seq: int, messages: List[dict], fsync: bool = False):
+    """Append messages (positions first_seq, first_seq + 1, ...) to the session's journal."""
+    lines = "".join(
+        json.dumps({"seq": first_seq + i, **message}, ensure_ascii=False) + "\n"
+        for i, message in enumerate(messages)
+    )
+    with open(journal_path(snapshot_path), "ab+") as f:
+        # After a torn append the file does not end in a newline; start a new line first.
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                lines = "\n" + lines
+        f.write(lines.encode("utf-8"))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def write_snapshot(snapshot_path: Path, session_id: str, messages: List[dict], fsync: bool = False):
+    """
+    Write all messages as the session's snapshot (temp file + atomic rename), then delete
+    its journal. A crash in between leaves a journal whose lines the snapshot already
+    covers, which read_session() skips.
+    """
+    snapshot_path = Path(snapshot_path)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"session_id": session_id, "messages": messages}, f, indent=2, ensure_ascii=False)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path)
+    journal_path(snapshot_path).unlink(missing_ok=True)
+
+
+def fsync_directory(directory: Path):
+    """fsync a directory so files created, renamed or deleted in it survive a crash (no-op where unsupported)."""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where directories cannot be opened.
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -4,32 +4,54 @@ CHAT SERVICE MODULE
 
 This service owns all chat session and conversation logic. It is used by the
 /chat and /chat/realtime endpoints. Designed for single-user use: one server
-has one ChatService and one in-memory session store; the user can have many
-sessions (each identified by session_id).
+has one ChatService and one in-memory session cache; the user can have many
+sessions (each identified by session_id). The cache is bounded (session_cache.py):
+least recently used sessions are saved and dropped, and reloaded on their next use.
 
 RESPONSIBILITIES:
 - get_or_create_session(session_id): Return existing session or create new one.
   If the user sends a session_id that was used before (e.g. before a restart),
   we try to load it from disk so the conversation continues.
-- add_message / get_chat_history: Keep messages in memory per session.
+- add_message / get_chat_history: Keep messages in memory per session (reloading a session
+  that was evicted from the cache).
+- get_history_page: One page of a session's messages; sessions not in memory are read
+  straight from the session store without loading the whole conversation.
 - format_history_for_llm: Turn the message list into (user, assistant) pairs
   and trim to MAX_CHAT_HISTORY_TURNS so we don't overflow the prompt.
 - process_message / process_realtime_message: Add user message, call Groq (or
-  RealtimeGroq), add assistant reply, return reply.
-- save_chat_session: Write session to database/chats_data/*.json so it persists
-  and can be loaded on next startup (and used by the vector store for retrieval).
+  RealtimeGroq), add assistant reply, mark the session dirty, return reply. The whole
+  turn holds the session's lock (session_locks.py), so overlapping requests for one
+  session take turns while other sessions run in parallel.
+- mark_dirty: Hand the session to the write-behind flusher (session_flusher.py), which
+  saves it shortly after the request returns, batched with other dirty sessions.
+- save_chat_session: Persist the session in the session store (session_store.py: JSON
+  snapshot + journal files, or SQLite) so it survives a restart: only the messages added
+  since the last save are appended.
+  If a vector store is attached, the saved session is also re-indexed in the background
+  so the conversation is retrievable right away.
+- close: Final drain on shutdown; writes every session that is still dirty.
 """
 
-import json
 import logging
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import List, Optional, Dict
 import uuid
 
-from config import CHATS_DATA_DIR, MAX_CHAT_HISTORY_TURNS
+from config import (
+    MAX_CHAT_HISTORY_TURNS,
+    CHAT_FLUSH_INTERVAL,
+    CHAT_FSYNC,
+)
 from app.models import ChatMessage, ChatHistory
+from app.services.session_cache import SessionCache
+from app.services.session_locks import SessionLocks
+from app.services.session_flusher import SessionFlusher
+from app.services.session_store import SessionStore, create_session_store
 from app.services.groq_service import GroqService
 from app.services.realtime_service import RealtimeGroqService
+from app.services.vector_store import VectorStoreService
 
 logger = logging.getLogger("J.A.R.V.I.S")
 
@@ -40,51 +62,85 @@ logger = logging.getLogger("J.A.R.V.I.S")
 class ChatService:
     """
     Manages chat sessions: in-memory message lists, load/save to disk, and
-    calling Groq (or Realtime) to get replies. All state for active sessions
-    is in self.sessions; saving to disk is done after each message so
-    conversations survive restarts.
+    calling Groq (or Realtime) to get replies. Recently used sessions are in
+    self.sessions (an LRU SessionCache); each message marks its session dirty and the flusher
+    writes it to disk in the background so conversations survive restarts.
     """
 
-    def __init__(self, groq_service: GroqService, realtime_service: RealtimeGroqService = None):
-        """Store references to the Groq and Realtime services; keep sessions in memory."""
+    def __init__(
+        self,
+        groq_service: GroqService,
+        realtime_service: RealtimeGroqService = None,
+        vector_store_service: Optional[VectorStoreService] = None,
+        session_store: Optional[SessionStore] = None,
+    ):
+        """
+        Store references to the Groq and Realtime services; keep sessions in memory.
+        If vector_store_service is given, every saved session is re-indexed in the background.
+        Sessions are persisted in session_store (default: the vector store's, else a new one
+        per CHAT_STORE).
+        """
         self.groq_service = groq_service
         self.realtime_service = realtime_service
-        # Map: session_id -> list of ChatMessage (user and assistant messages in order).
-        self.sessions: Dict[str, List[ChatMessage]] = {}
+        self.vector_store_service = vector_store_service
+        if session_store is None:
+            session_store = vector_store_service.session_store if vector_store_service else create_session_store()
+        self.store = session_store
+        # LRU of session_id -> list of ChatMessage (user and assistant messages in order);
+        # a session is saved before it is evicted.
+        self.sessions = SessionCache(self._save_for_eviction, dropped=self._forget_session)
+        # One lock per busy session: a turn holds it from the user message to the saved reply.
+        self.session_locks = SessionLocks()
+        # Map: session_id -> how many of its messages are in the session store.
+        self._persisted: Dict[str, int] = {}
+        # Serializes writes: the flusher thread and the shutdown drain never save at the same time.
+        self._save_lock = threading.Lock()
+        # Write-behind saving; None means save inside the request (CHAT_FLUSH_INTERVAL = 0).
+        self.flusher: Optional[SessionFlusher] = None
+        if CHAT_FLUSH_INTERVAL > 0:
+            self.flusher = SessionFlusher(self.flush_sessions)
+            self.flusher.start()
 
     # -----------------------------------------------------------------------------
     # SESSION LOAD / VALIDATE / GET-OR-CREATE
     # -----------------------------------------------------------------------------
 
-    def load_session_from_disk(self, session_id: str) -> bool:
+    def session_path(self, session_id: str) -> Path:
+        """
+        Source path of a session: chat_{safe_session_id}.json in database/chats_data/, where
+        safe_session_id has dashes/spaces removed (a real file only with the JSON store).
         """
-        Load a session from database/chats_data/ if a file for this session_id exists.
+        return self.store.source_path(session_id)
 
-        File name is chat_{safe_session_id}.json where safe_session_id has dashes/spaces removed.
-        On success we put the messages into self.sessions[session_id] so later requests use them.
-        Returns True if loaded, False if file missing or unreadable.
+    def load_session_from_disk(self, session_id: str) -> bool:
         """
-        # Sanitize ID for use in filename (no dashes or spaces).
-        safe_session_id = session_id.replace("-", "").replace(" ", "_")
-        filename = f"chat_{safe_session_id}.json"
-        filepath = CHATS_DATA_DIR / filename
+        Load a session from the session store if it has this session_id.
 
-        if not filepath.exists():
-            return False
+        On success we put the messages into the session cache so later requests use them.
+        Returns True if loaded, False if the session is missing or unreadable.
+        """
+        return self._load_session(session_id) is not None
 
+    def _load_session(self, session_id: str) -> Optional[List[ChatMessage]]:
+        """load_session_from_disk(), returning the message list it cached (None if not loaded)."""
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                chat_dict = json.load(f)
+            records = self.store.load(session_id)
+            if records is None:
+                return None
             # Convert stored dicts back to ChatMessage objects.
             messages = [
-                ChatMessage(role=msg.get("role"), content=msg.get("content"))
-                for msg in chat_dict.get("messages", [])
+                ChatMessage(role=msg.get("role"), content=msg.get("content"), timestamp=msg.get("timestamp"))
+                for msg in records
             ]
-            self.sessions[session_id] = messages
-            return True
+            # If another thread loaded it meanwhile, keep (and append to) its list; its
+            # persisted count may already be ahead of what we read, so leave it alone.
+            cached = self.sessions.setdefault(session_id, messages)
+            if cached is messages:
+                self._persisted[session_id] = len(messages)
+            return cached
         except Exception as e:
             logger.warning("Failed to load session %s from disk: %s", session_id, e)
-            return False
+            return None
 
     def validate_session_id(self, session_id: str) -> bool:
         """
@@ -105,7 +161,7 @@ class ChatService:
         Return a session ID and ensure that session exists in memory.
 
         - If session_id is None: create a new session with a new UUID and return it.
-        - If session_id is provided: validate it; if it's in self.sessions return it;
+        - If session_id is provided: validate it; if it's in the session cache return it;
           else try to load from disk; if not found, create a new session with that ID.
         Raises ValueError if session_id is invalid (empty, path traversal, or too long).
         """
@@ -113,7 +169,7 @@ class ChatService:
         # If no session ID was provided, create a new one.
         if not session_id:
             new_session_id = str(uuid.uuid4())
-            self.sessions[new_session_id] = []
+            self.sessions.put(new_session_id, [])
             return new_session_id
 
         if not self.validate_session_id(session_id):
@@ -122,29 +178,61 @@ class ChatService:
                 "not contain path traversal characters, and be under 255 characters."
             )
 
-        if session_id in self.sessions:
-            return session_id
-
-        if self.load_session_from_disk(session_id):
-            return session_id
-
-        # New session with this ID (e.g. client sent an ID that was never saved).
-        self.sessions[session_id] = []
+        self._session(session_id)
         return session_id
 
+    def _session(self, session_id: str) -> List[ChatMessage]:
+        """
+        The session's message list: from the cache, else reloaded from the session store (it may
+        have been evicted), else a new empty session.
+        """
+        messages = self.sessions.get(session_id)
+        if messages is None:
+            messages = self._load_session(session_id)
+        if messages is None:
+            # New session with this ID (e.g. client sent an ID that was never saved).
+            messages = self.sessions.setdefault(session_id, [])
+        return messages
+
     # -----------------------------------------------------------------------------
     # MESSAGES AND HISTORY FORMATTING
     # -----------------------------------------------------------------------------
 
     def add_message(self, session_id: str, role: str, content: str):
-        """Append one message (user or assistant) to the session's message list. Creates session if missing."""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        self.sessions[session_id].append(ChatMessage(role=role, content=content))
+        """
+        Append one message (user or assistant), stamped with the current UTC time. Reloads the
+        session if it was evicted; creates it if missing.
+        """
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        message = ChatMessage(role=role, content=content, timestamp=timestamp)
+        self._session(session_id).append(message)
+        self.sessions.account(session_id, message)
     
     def get_chat_history(self, session_id: str) -> List[ChatMessage]:
-        """Return the list of messages for this session (chronological). Empty list if session unknown."""
-        return self.sessions.get(session_id, [])
+        """
+        Return the list of messages for this session (chronological), reloading it from the
+        session store if it is not in memory. Empty list if session unknown or the id is invalid.
+        """
+        messages = self.sessions.get(session_id)
+        if messages is None and self.validate_session_id(session_id):
+            messages = self._load_session(session_id)
+        return messages if messages is not None else []
+
+    def get_history_page(self, session_id: str, offset: int = 0, limit: int = 50) -> List[ChatMessage]:
+        """
+        Return messages offset .. offset + limit - 1 of a session. Sessions in memory are sliced
+        (they include turns not saved yet); others are paged from the session store without
+        loading them. Empty list if the session is unknown or the id is invalid.
+        """
+        messages = self.sessions.peek(session_id)
+        if messages is not None:
+            return messages[max(0, offset):max(0, offset) + max(0, limit)]
+        if not self.validate_session_id(session_id):
+            return []
+        return [
+            ChatMessage(role=msg.get("role"), content=msg.get("content"), timestamp=msg.get("timestamp"))
+            for msg in self.store.read_page(session_id, offset, limit)
+        ]
     
     def format_history_for_llm(self, session_id: str, exclude_last: bool = False) -> List[tuple]:
         """
@@ -179,55 +267,108 @@ class ChatService:
     def process_message(self, session_id: str, user_message: str) -> str:
         """
         Handle one general-chat message: add user message, call Groq (no web search), add reply, return it.
+        The turn holds the session's lock (other turns of this session wait) and pins it in the cache.
         """
-        self.add_message(session_id, "user", user_message)
-        chat_history = self.format_history_for_llm(session_id, exclude_last=True)
-        response = self.groq_service.get_response(question=user_message, chat_history=chat_history)
-        self.add_message(session_id, "assistant", response)
-        self.save_chat_session(session_id)
+        with self.sessions.pinned(session_id), self.session_locks.hold(session_id):
+            self.add_message(session_id, "user", user_message)
+            chat_history = self.format_history_for_llm(session_id, exclude_last=True)
+            response = self.groq_service.get_response(question=user_message, chat_history=chat_history)
+            self.add_message(session_id, "assistant", response)
+            self.mark_dirty(session_id)
         return response
 
     def process_realtime_message(self, session_id: str, user_message: str) -> str:
         """
         Handle one realtime message: add user message, call realtime service (Tavily + Groq), add reply, return it.
-        Uses the same session as process_message so history is shared. Raises ValueError if realtime_service is None.
+        Uses the same session as process_message so history is shared, and the same per-session lock.
+        Raises ValueError if realtime_service is None.
         """
         if not self.realtime_service:
             raise ValueError("Realtime service is not initialized. Cannot process realtime queries.")
-        self.add_message(session_id, "user", user_message)
-        chat_history = self.format_history_for_llm(session_id, exclude_last=True)
-        response = self.realtime_service.get_response(question=user_message, chat_history=chat_history)
-        self.add_message(session_id, "assistant", response)
-        self.save_chat_session(session_id)
+        with self.sessions.pinned(session_id), self.session_locks.hold(session_id):
+            self.add_message(session_id, "user", user_message)
+            chat_history = self.format_history_for_llm(session_id, exclude_last=True)
+            response = self.realtime_service.get_response(question=user_message, chat_history=chat_history)
+            self.add_message(session_id, "assistant", response)
+            self.mark_dirty(session_id)
         return response
 
     # -----------------------------------------------------------------------------
     # PERSIST SESSION TO DISK
     # -----------------------------------------------------------------------------
 
-    def save_chat_session(self, session_id: str):
-        """
-        Write this session's messages to database/chats_data/chat_{safe_id}.json.
+    def mark_dirty(self, session_id: str):
+        """Schedule this session to be saved by the flusher (or save it now if write-behind is off)."""
+        if self.flusher is not None:
+            self.flusher.mark_dirty(session_id)
+        else:
+            self.save_chat_session(session_id)
 
-        Called after each message so the conversation is persisted. The vector store
-        is rebuilt on startup from these files, so new chats are included after restart.
-        If the session is missing or empty we do nothing. On write error we only log.
+    def flush_sessions(self, session_ids: List[str]) -> List[str]:
         """
-        if session_id not in self.sessions or not self.sessions[session_id]:
-            return
-
-        messages = self.sessions[session_id]
-        safe_session_id = session_id.replace("-", "").replace(" ", "_")
-        filename = f"chat_{safe_session_id}.json"
-        filepath = CHATS_DATA_DIR / filename
-        chat_dict = {
-            "session_id": session_id,
-            "messages": [{"role": msg.role, "content": msg.content} for msg in messages]
-        }
-
-        try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(chat_dict, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error("Failed to save chat session %s to disk: %s", session_id, e)
+        Save a round of dirty sessions (called by the flusher) with the CHAT_FSYNC policy:
+        "data" and "full" fsync every written file, "full" also syncs the store once at the
+        end (fsyncs chats_data/ for the JSON store). Returns the ids that could not be
+        saved, so they are retried.
+        """
+        fsync = CHAT_FSYNC in ("data", "full")
+        failed = [session_id for session_id in session_ids if not self.save_chat_session(session_id, fsync=fsync)]
+        if CHAT_FSYNC == "full" and len(failed) < len(session_ids):
+            self.store.sync()
+        return failed
+
+    def _save_for_eviction(self, session_id: str) -> bool:
+        """Session cache callback: save a session (CHAT_FSYNC applies) before it is dropped from memory."""
+        return self.save_chat_session(session_id, fsync=CHAT_FSYNC in ("data", "full"))
+
+    def _forget_session(self, session_id: str):
+        """Session cache callback after an eviction: the next load re-reads the persisted count."""
+        self._persisted.pop(session_id, None)
+
+    def close(self):
+        """Shutdown drain: stop the flusher after it has written every dirty session."""
+        if self.flusher is not None:
+            self.flusher.stop()
+
+    def save_chat_session(self, session_id: str, fsync: bool = False) -> bool:
+        """
+        Persist the messages added to this session since its last save.
+
+        Called by the flusher after messages were added, so the conversation is persisted. New messages are
+        appended in the session store; a session's first save (or a save after its history
+        shrank) replaces the whole stored session instead. After a successful write we
+        ask the vector store to re-index the session in the background. Chats are indexed
+        one exchange per unit, so when the session only grew, just the new turn is
+        embedded and added; the conversation can be retrieved immediately.
+        With fsync the write is forced to disk before we return.
+        If the session is missing (e.g. evicted, which saved it), empty or already saved we do
+        nothing. Returns False only on a write error (which we log).
+        """
+        with self._save_lock:
+            messages = self.sessions.peek(session_id)
+            if not messages:
+                return True
+
+            # Fixed length: messages appended meanwhile by a request go in the next save.
+            count = len(messages)
+            persisted = self._persisted.get(session_id, 0)
+            if persisted == count:
+                return True
+            filepath = self.session_path(session_id)
+
+            try:
+                if persisted == 0 or persisted > count:
+                    records = [msg.model_dump(exclude_none=True) for msg in messages[:count]]
+                    self.store.replace(session_id, records, fsync=fsync)
+                else:
+                    records = [msg.model_dump(exclude_none=True) for msg in messages[persisted:count]]
+                    self.store.append(session_id, persisted, records, fsync=fsync)
+            except Exception as e:
+                logger.error("Failed to save chat session %s to disk: %s", session_id, e)
+                return False
+            self._persisted[session_id] = count
+
+        if self.vector_store_service:
+            self.vector_store_service.schedule_source_update(filepath)
+        return True
 
@@ -0,0 +1,133 @@
+"""
+NEAR-DUPLICATE DETECTION MODULE
+===============================
+
+SimHash fingerprints for chunks, plus an index that finds an already-indexed chunk whose
+fingerprint is within a few bits of a new one. Learning files repeat the same passages
+(copied notes, boilerplate) and the 200-char chunk overlap adds more; the vector store
+uses this to index each near-duplicate learning-data chunk once instead of filling k=10
+results with copies of the same thing. Chat exchanges are not deduplicated.
+
+SIMHASH:
+  Text is lower-cased and split into word 3-shingles (overlapping 3-word windows). Each
+  shingle is hashed to 64 bits; bit i of the fingerprint is 1 when most shingles have bit
+  i set. Texts that share most of their shingles get fingerprints that differ in only a
+  few bits, so "near-duplicate" = Hamming distance <= max_distance (3 by default, the
+  usual setting for 64-bit SimHash).
+
+LOOKUP:
+  The 64 bits are split into max_distance + 1 bands. Two fingerprints within max_distance
+  bits must agree exactly on at least one band (pigeonhole), so each band is a dict
+  lookup and only the few candidates that share a band are compared bit by bit.
+"""
+
+import hashlib
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+SHINGLE_SIZE = 3
+FINGERPRINT_BITS = 64
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of text over word 3-shingles (texts with fewer words use the words themselves)."""
+    words = _TOKEN_RE.findall(text.lower())
+    if len(words) >= SHINGLE_SIZE:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    else:
+        shingles = [" ".join(words)]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # One row of 64 bits per shingle; a fingerprint bit is set when more than half the rows set it.
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(len(shingles), 8), axis=1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of bits in which two fingerprints differ."""
+    return bin(a ^ b).count("1")
+
+
+# ==============================================================================
+# SIMHASH INDEX CLASS
+# ==============================================================================
+
+class SimHashIndex:
+    """
+    doc_id -> fingerprint, with near-duplicate lookup by banded exact matching.
+    Thread-safe. max_distance < 0 disables matching (find() always returns None).
+    """
+
+    def __init__(self, max_distance: int = 3):
+        """Create an empty index that treats fingerprints within max_distance bits as duplicates."""
+        self.max_distance = max_distance
+        num_bands = max(1, max_distance + 1)
+        width = FINGERPRINT_BITS // num_bands
+        # (shift, mask) per band; the last band takes the leftover bits.
+        self._bands: List[Tuple[int, int]] = []
+        for band in range(num_bands):
+            bits = width if band < num_bands - 1 else FINGERPRINT_BITS - width * (num_bands - 1)
+            self._bands.append((band * width, (1 << bits) - 1))
+        self._fingerprints: Dict[str, int] = {}
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: str, fingerprint: int):
+        """Index one chunk's fingerprint (replacing it if doc_id is already present)."""
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._fingerprints[doc_id] = fingerprint
+            for buckets, (shift, mask) in zip(self._buckets, self._bands):
+                buckets.setdefault((fingerprint >> shift) & mask, set()).add(doc_id)
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """Fingerprint and index several (doc_id, text) pairs."""
+        for doc_id, text in items:
+            self.add(doc_id, simhash(text))
+
+    def remove(self, doc_ids: Iterable[str]):
+        """Remove chunks; ids that are not indexed are ignored."""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str):
+        """Remove one fingerprint from every band (caller holds the lock)."""
+        fingerprint = self._fingerprints.pop(doc_id, None)
+        if fingerprint is None:
+            return
+        for buckets, (shift, mask) in zip(self._buckets, self._bands):
+            band = (fingerprint >> shift) & mask
+            ids = buckets.get(band)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del buckets[band]
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """Return the id of the closest indexed chunk within max_distance bits, or None."""
+        if self.max_distance < 0:
+            return None
+        best: Optional[Tuple[int, str]] = None
+        with self._lock:
+            seen: Set[str] = set()
+            for buckets, (shift, mask) in zip(self._buckets, self._bands):
+                for doc_id in buckets.get((fingerprint >> shift) & mask, ()):
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    distance = hamming_distance(fingerprint, self._fingerprints[doc_id])
+                    if distance <= self.max_distance and (best is None or (distance, doc_id) < best):
+                        best = (distance, doc_id)
+        return best[1] if best else None
+
+    def __len__(self) -> int:
+        """Number of indexed chunks."""
+        with self._lock:
+            return len(self._fingerprints)
@@ -0,0 +1,215 @@
+"""
+EMBEDDING BACKENDS MODULE
+=========================
+
+Creates the LangChain Embeddings object that runs EMBEDDING_MODEL, for the server process
+and for embedding pipeline workers alike. Which implementation is used is chosen by
+EMBEDDING_BACKEND in config.py.
+
+BACKENDS:
+  torch - HuggingFaceEmbeddings: sentence-transformers on PyTorch (the default).
+  onnx  - OnnxEmbeddings: the model's ONNX export (onnx/model.onnx in the HuggingFace repo)
+          run with ONNX Runtime, tokenized with the Rust `tokenizers` library. Nothing
+          imports torch. It reproduces the sentence-transformers pipeline (token embeddings
+          -> mean pooling over the attention mask -> L2 normalisation), so vectors match the
+          torch backend to float32 rounding. With EMBEDDING_ONNX_INT8 the weights are
+          dynamically quantized to int8 once (onnxruntime.quantization) and the quantized
+          file is reused afterwards; its vectors differ slightly.
+
+  embedding_variant(embeddings) names the backend and quantization an Embeddings from
+  create_embeddings() actually runs (after any fallback to torch). It is part of the
+  embedding cache key and of the vector store's index settings, so switching backend, or
+  falling back, re-embeds instead of mixing vectors from two variants.
+
+  If the onnx backend cannot be set up (onnxruntime or tokenizers not installed, model has
+  no ONNX export, no network for the first download) we log a warning and use torch.
+
+FILES:
+  ONNX model, tokenizer and the int8 copy live under EMBEDDING_MODEL_DIR (database/models/).
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import EMBEDDING_BACKEND, EMBEDDING_MODEL_DIR, EMBEDDING_ONNX_INT8
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+BACKENDS = ("torch", "onnx")
+
+# sentence-transformers truncates MiniLM inputs at 256 tokens; used when the repo does not say.
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+
+def create_embeddings(
+    model_name: str,
+    backend: Optional[str] = None,
+    threads: int = 0,
+    batch_size: int = 32,
+) -> Embeddings:
+    """
+    Return an Embeddings that runs model_name on the given backend (default EMBEDDING_BACKEND),
+    producing L2-normalised vectors. threads > 0 caps the CPU threads it uses (pipeline workers).
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in BACKENDS:
+        logger.warning("Unknown EMBEDDING_BACKEND %r; using torch", backend)
+        backend = "torch"
+    if backend == "onnx":
+        try:
+            return OnnxEmbeddings(
+                model_name,
+                EMBEDDING_MODEL_DIR,
+                int8=EMBEDDING_ONNX_INT8,
+                threads=threads,
+                batch_size=batch_size,
+            )
+        except Exception as e:
+            logger.warning("ONNX embedding backend unavailable, using torch: %s", e)
+    return _torch_embeddings(model_name, threads, batch_size)
+
+
+def embedding_variant(embeddings: Embeddings) -> str:
+    """Variant an Embeddings from create_embeddings() runs: "torch", "onnx" or "onnx-int8"."""
+    if isinstance(embeddings, OnnxEmbeddings):
+        return "onnx-int8" if embeddings.int8 else "onnx"
+    return "torch"
+
+
+def _torch_embeddings(model_name: str, threads: int, batch_size: int) -> Embeddings:
+    """sentence-transformers on PyTorch (imports torch and transformers)."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": "cpu"},
+        # MiniLM already outputs unit vectors; being explicit keeps 1 - d/2 a true cosine.
+        encode_kwargs={"normalize_embeddings": True, "batch_size": batch_size},
+    )
+
+
+# ==============================================================================
+# ONNX RUNTIME BACKEND
+# ==============================================================================
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from a sentence-transformers model's ONNX export on ONNX Runtime.
+    Batches are formed from texts of similar length, so little time goes into padding.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: Path,
+        int8: bool = False,
+        threads: int = 0,
+        batch_size: int = 32,
+    ):
+        """Download (once) and open the ONNX model and tokenizer; optionally quantize to int8."""
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        files = _download(model_name, Path(model_dir))
+        model_path = files["onnx/model.onnx"]
+        if int8:
+            model_path = _quantize_int8(model_path)
+        self.int8 = int8
+
+        self.tokenizer = Tokenizer.from_file(str(files["tokenizer.json"]))
+        self.tokenizer.enable_truncation(_max_seq_length(files.get("sentence_bert_config.json")))
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token=self.tokenizer.id_to_token(pad_id) or "[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {node.name for node in self.session.get_inputs()}
+        output_names = [node.name for node in self.session.get_outputs()]
+        # Token embeddings; sentence-transformers exports name them last_hidden_state.
+        self._output_name = "last_hidden_state" if "last_hidden_state" in output_names else output_names[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches of similar length; results are in the input order."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            for i, vector in zip(indices, self._embed_batch([texts[i] for i in indices])):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed one search query."""
+        return self._embed_batch([text])[0]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Tokenize, run the model, mean-pool over real tokens and L2-normalise (as sentence-transformers does)."""
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        hidden = self.session.run([self._output_name], feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).astype(np.float32).tolist()
+
+
+def _download(model_name: str, model_dir: Path) -> dict:
+    """Fetch the ONNX export and tokenizer from the HuggingFace Hub (cached); return filename -> path."""
+    from huggingface_hub import hf_hub_download
+
+    files = {}
+    for filename in ("onnx/model.onnx", "tokenizer.json", "sentence_bert_config.json"):
+        try:
+            files[filename] = Path(hf_hub_download(model_name, filename, cache_dir=str(model_dir)))
+        except Exception:
+            if filename == "sentence_bert_config.json":
+                continue  # Optional; only gives max_seq_length.
+            raise
+    return files
+
+
+def _max_seq_length(config_path: Optional[Path]) -> int:
+    """Token limit from sentence_bert_config.json, else DEFAULT_MAX_SEQ_LENGTH."""
+    if config_path is None:
+        return DEFAULT_MAX_SEQ_LENGTH
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("max_seq_length") or DEFAULT_MAX_SEQ_LENGTH)
+    except Exception:
+        return DEFAULT_MAX_SEQ_LENGTH
+
+
+def _quantize_int8(model_path: Path) -> Path:
+    """Dynamically quantize the model's weights to int8 next to it (done once, then reused)."""
+    target = model_path.with_name(model_path.stem + "_int8.onnx")
+    if target.exists():
+        return target
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info("Quantizing ONNX embedding model to int8: %s", target)
+    tmp_path = target.with_name(target.stem + ".tmp.onnx")
+    quantize_dynamic(str(model_path), str(tmp_path), weight_type=QuantType.QInt8)
+    os.replace(tmp_path, target)
+    return target
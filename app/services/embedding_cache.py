@@ -0,0 +1,412 @@
+"""
+EMBEDDING CACHE MODULE
+======================
+
+On-disk, content-addressed cache of chunk embeddings. Most of the corpus (learning
+data and old chats) does not change between index builds, so instead of paying the
+full embedding cost for every chunk on every rebuild we look each chunk up here first
+and only embed the misses.
+
+KEY:
+  blake2b-128 of (embedding model name, backend variant, chunk text). The variant is
+  embedding_variant() of the model actually loaded ("torch", "onnx" or "onnx-int8"), so
+  changing the model, backend or quantization, or an ONNX load falling back to torch, never
+  returns a stale vector; identical text in two files is embedded once.
+
+FILES (in EMBEDDING_CACHE_DIR, under database/vector_store/):
+  meta.json    - {"dim": 384}: vector width; if it does not match the model we start over.
+  keys.bin     - 16-byte keys, one per row, appended in the same order as the vectors.
+  vectors.f32  - raw float32 matrix (rows x dim), opened with numpy.memmap so a large
+                 cache is never parsed or fully loaded; only the rows we touch are read.
+  keys.idx.npy - key index: the keys' first 8 bytes (as uint64) sorted, and the row of each,
+                 memory-mapped and binary-searched, so opening the cache reads no keys.
+                 Rows appended since it was written are kept in a small in-memory dict
+                 and folded into a rewritten index once they exceed 1/8 of the cache.
+
+Both data files are append-only. If the process dies mid-append, the row count is taken
+as the number of complete rows present in both files, so a torn write is ignored. If one
+of them is missing or the files cannot be read, the cache starts over (it is only a cache).
+
+QUERY LRU:
+  QueryEmbeddingLRU is the in-memory counterpart for search queries: a bounded,
+  thread-safe LRU of query text -> vector. Repeated questions (or the same question sent
+  to /chat and then /chat/realtime) skip the model entirely.
+
+USAGE:
+  cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, embedding_variant(base))
+  embeddings = CachedEmbeddings(HuggingFaceEmbeddings(...), cache)
+  embeddings.embed_documents(texts)   # cached on disk
+  embeddings.embed_query(text)        # passed straight through (see QueryEmbeddingLRU)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+KEY_SIZE = 16  # Bytes per key in keys.bin (blake2b digest_size).
+# Appended rows kept outside the on-disk key index before it is rewritten (at least this many,
+# or 1/8 of the cache, so rewrites stay amortised on large builds).
+INDEX_TAIL_ROWS = 4096
+
+
+# ==============================================================================
+# EMBEDDING CACHE CLASS
+# ==============================================================================
+
+class EmbeddingCache:
+    """
+    Append-only map from (model, text) to a float32 vector, stored as a memory-mapped
+    matrix plus a memory-mapped sorted key index. Thread-safe; one instance per cache directory.
+    """
+
+    def __init__(self, cache_dir: Path, model_name: str, variant: Optional[str] = ""):
+        """
+        Open (or create) the cache in cache_dir for model_name run as variant (see
+        embedding_variant()). variant may be None until the model is loaded; lookups raise
+        until it is set. Nothing is read until the first lookup.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.model_name = model_name
+        self.variant = variant
+        self._keys_path = self.cache_dir / "keys.bin"
+        self._vectors_path = self.cache_dir / "vectors.f32"
+        self._meta_path = self.cache_dir / "meta.json"
+        self._index_path = self.cache_dir / "keys.idx.npy"
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = None
+        # Number of complete rows in keys.bin / vectors.f32.
+        self._count = 0
+        # keys.bin as a (rows, KEY_SIZE) uint8 memmap; vectors.f32 as (rows, dim) float32.
+        self._keys: Optional[np.memmap] = None
+        self._matrix: Optional[np.memmap] = None
+        # keys.idx.npy: (2, n) uint64, row 0 sorted key prefixes, row 1 their rows (first n rows).
+        self._index: Optional[np.ndarray] = None
+        # Key -> row for rows appended after the index was written.
+        self._tail: Dict[bytes, int] = {}
+        self._opened = False
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------------------
+    # OPEN / KEY
+    # ------------------------------------------------------------------------------
+
+    def key(self, text: str) -> bytes:
+        """Content address of one chunk for this cache's model and backend variant."""
+        if self.variant is None:
+            raise RuntimeError("Embedding cache used before its backend variant is known")
+        return hashlib.blake2b(
+            self.model_name.encode("utf-8") + b"\0" + self.variant.encode("utf-8") + b"\0" + text.encode("utf-8"),
+            digest_size=KEY_SIZE,
+        ).digest()
+
+    def _open(self):
+        """Read meta.json and map the data files and key index (called lazily, under the lock)."""
+        if self._opened:
+            return
+        self._opened = True
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = int(json.load(f)["dim"])
+        except FileNotFoundError:
+            if self._keys_path.exists() or self._vectors_path.exists():
+                logger.warning("Embedding cache metadata missing, starting a new cache")
+                self._reset()
+            return
+        except Exception as e:
+            logger.warning("Embedding cache metadata unreadable, starting a new cache: %s", e)
+            self._reset()
+            return
+        try:
+            self._open_files()
+        except Exception as e:
+            logger.warning("Embedding cache files inconsistent or unreadable, starting a new cache: %s", e)
+            self._reset()
+
+    def _open_files(self):
+        """Map keys.bin / vectors.f32 (cutting off a torn append) and the key index; raises if inconsistent."""
+        keys_exist, vectors_exist = self._keys_path.exists(), self._vectors_path.exists()
+        if keys_exist != vectors_exist:
+            raise FileNotFoundError(f"{'vectors.f32' if keys_exist else 'keys.bin'} is missing")
+        if not keys_exist:
+            return  # Metadata only: nothing was cached yet.
+        key_bytes = self._keys_path.stat().st_size
+        vector_bytes = self._vectors_path.stat().st_size
+        # Only rows that are complete in both files count (protects against a torn append).
+        rows = min(key_bytes // KEY_SIZE, vector_bytes // (self._dim * 4))
+        if key_bytes != rows * KEY_SIZE or vector_bytes != rows * self._dim * 4:
+            # Cut off the torn tail so the next append starts on a row boundary in both files.
+            self._truncate(rows)
+        self._count = rows
+        self._remap()
+        self._load_index()
+
+    def _truncate(self, rows: int):
+        """Cut keys.bin and vectors.f32 (those that exist) back to their first `rows` rows."""
+        for path, row_bytes in ((self._keys_path, KEY_SIZE), (self._vectors_path, self._dim * 4)):
+            if path.exists():
+                with open(path, "r+b") as f:
+                    f.truncate(rows * row_bytes)
+
+    def _reset(self):
+        """Drop every file of the cache (used when metadata is corrupt or the vector width changes)."""
+        self._keys = None
+        self._matrix = None
+        self._index = None
+        for path in (self._keys_path, self._vectors_path, self._meta_path, self._index_path):
+            path.unlink(missing_ok=True)
+        self._dim = None
+        self._count = 0
+        self._tail = {}
+
+    def _remap(self):
+        """Memory-map the first _count rows of keys.bin and vectors.f32 (read-only); None while empty."""
+        if self._count == 0:
+            self._keys = None
+            self._matrix = None
+            return
+        self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode="r", shape=(self._count, KEY_SIZE))
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count, self._dim))
+
+    # ------------------------------------------------------------------------------
+    # KEY INDEX
+    # ------------------------------------------------------------------------------
+
+    def _load_index(self):
+        """
+        Memory-map keys.idx.npy; rebuild it if it is missing, unreadable or covers rows that no
+        longer exist. Keys of rows appended after it was written go into _tail.
+        """
+        index = None
+        try:
+            index = np.load(self._index_path, mmap_mode="r")
+            if index.dtype != np.uint64 or index.ndim != 2 or index.shape[0] != 2 or index.shape[1] > self._count:
+                index = None
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Embedding cache key index unreadable, rebuilding it: %s", e)
+        if index is None:
+            self._write_index()
+            return
+        self._index = index
+        indexed = index.shape[1]
+        self._tail = {bytes(self._keys[row]): row for row in range(indexed, self._count)}
+
+    def _write_index(self):
+        """Sort every key's 8-byte prefix (in numpy) and write the index atomically; clears _tail."""
+        self._tail = {}
+        if self._count == 0:
+            self._index = None
+            return
+        prefixes = np.ascontiguousarray(self._keys[:, :8]).view("<u8").ravel()
+        order = np.argsort(prefixes, kind="stable")
+        index = np.stack([prefixes[order], order.astype(np.uint64)])
+        tmp_path = self._index_path.with_name(self._index_path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, index)
+            os.replace(tmp_path, self._index_path)
+            self._index = np.load(self._index_path, mmap_mode="r")
+        except Exception as e:
+            logger.warning("Failed to write embedding cache key index: %s", e)
+            self._index = index
+
+    def _find_rows(self, keys: List[bytes]) -> List[Optional[int]]:
+        """Row of each key (None if not cached): the tail dict first, then a binary search of the index."""
+        rows = [self._tail.get(key) for key in keys]
+        if self._index is None:
+            return rows
+        todo = [i for i, row in enumerate(rows) if row is None]
+        if not todo:
+            return rows
+        prefixes, index_rows = self._index[0], self._index[1]
+        wanted = np.frombuffer(b"".join(keys[i][:8] for i in todo), dtype="<u8")
+        for i, position, prefix in zip(todo, np.searchsorted(prefixes, wanted).tolist(), wanted.tolist()):
+            # Keys sharing an 8-byte prefix sit next to each other; compare the full key.
+            while position < len(prefixes) and int(prefixes[position]) == prefix:
+                row = int(index_rows[position])
+                if bytes(self._keys[row]) == keys[i]:
+                    rows[i] = row
+                    break
+                position += 1
+        return rows
+
+    # ------------------------------------------------------------------------------
+    # LOOKUP / INSERT
+    # ------------------------------------------------------------------------------
+
+    def get_many(self, texts: List[str], record_stats: bool = True) -> List[Optional[List[float]]]:
+        """
+        Return the cached vector for each text, or None where the text is not cached.
+        record_stats=False skips the hit/miss counters (for lookups that are not embedding work).
+        """
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            self._open()
+            results: List[Optional[List[float]]] = []
+            for row in self._find_rows(keys):
+                if row is None:
+                    results.append(None)
+                else:
+                    results.append(self._matrix[row].tolist())
+            if record_stats:
+                found = sum(1 for vector in results if vector is not None)
+                self.hits += found
+                self.misses += len(results) - found
+            return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Append vectors for texts that are not cached yet. Write errors are logged, never raised."""
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._open()
+            if self._dim is not None and matrix.shape[1] != self._dim:
+                logger.warning(
+                    "Embedding width changed (%d -> %d); clearing embedding cache", self._dim, matrix.shape[1]
+                )
+                self._reset()
+            keys = [self.key(text) for text in texts]
+            new_keys: List[bytes] = []
+            new_rows: List[int] = []
+            seen = set()
+            for i, (key, row) in enumerate(zip(keys, self._find_rows(keys))):
+                if row is not None or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(i)
+            if not new_keys:
+                return
+            try:
+                if self._dim is None:
+                    self._dim = int(matrix.shape[1])
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self._dim}, f)
+                # Vectors first, keys second: a key is only "in" the cache once its vector is on disk.
+                with open(self._vectors_path, "ab") as f:
+                    f.write(np.ascontiguousarray(matrix[new_rows]).tobytes())
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(new_keys))
+            except Exception as e:
+                logger.warning("Failed to write embedding cache: %s", e)
+                # Drop whatever part of this append made it to disk; otherwise the next append
+                # would put its keys and vectors on different rows.
+                try:
+                    self._truncate(self._count)
+                except Exception as truncate_error:
+                    logger.warning("Could not repair embedding cache, starting a new one: %s", truncate_error)
+                    self._reset()
+                return
+            for offset, key in enumerate(new_keys):
+                self._tail[key] = self._count + offset
+            self._count += len(new_keys)
+            self._remap()
+            if len(self._tail) > max(INDEX_TAIL_ROWS, self._count // 8):
+                self._write_index()
+
+    def __len__(self) -> int:
+        """Number of cached vectors."""
+        with self._lock:
+            self._open()
+            return self._count
+
+    def stats(self) -> dict:
+        """Row count and hit/miss counters since startup."""
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+# ==============================================================================
+# EMBEDDINGS WRAPPER
+# ==============================================================================
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings that serves embed_documents() from an EmbeddingCache and only
+    sends the misses to the wrapped model. embed_query() is passed through unchanged.
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache):
+        """Wrap `base` (the real embedding model) with `cache`."""
+        self.base = base
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Return one vector per text, embedding only the texts that are not cached."""
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embedded = self.base.embed_documents(missing_texts)
+            self.cache.put_many(missing_texts, embedded)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = list(vector)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query with the wrapped model (not cached on disk)."""
+        return self.base.embed_query(text)
+
+
+# ==============================================================================
+# QUERY EMBEDDING LRU
+# ==============================================================================
+
+class QueryEmbeddingLRU:
+    """
+    Bounded in-memory LRU of query text -> embedding, with hit/miss counters.
+    Thread-safe; the model call on a miss runs outside the lock so a slow embed never
+    blocks lookups of other queries. max_size <= 0 disables caching.
+    """
+
+    def __init__(self, max_size: int):
+        """Create an empty cache that holds at most max_size query vectors."""
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_embed(self, query: str, embed: Callable[[str], List[float]]) -> Tuple[float, ...]:
+        """Return the cached vector for query, or call embed(query), cache the result and return it."""
+        with self._lock:
+            vector = self._entries.get(query)
+            if vector is not None:
+                self._entries.move_to_end(query)
+                self.hits += 1
+                return vector
+            self.misses += 1
+        vector = tuple(embed(query))
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[query] = vector
+                self._entries.move_to_end(query)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        """Size, capacity and hit/miss counters since startup."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
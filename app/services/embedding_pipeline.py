@@ -0,0 +1,167 @@
+"""
+EMBEDDING PIPELINE MODULE
+=========================
+
+Embeds large lists of chunks for index builds. A single HuggingFace call over the whole
+chunk list keeps roughly one core busy; this pipeline instead splits the texts into
+fixed-size batches and spreads them over a pool of worker processes, each with its own
+copy of the model and its own torch thread count.
+
+HOW IT WORKS:
+  - embed(texts) yields (offset, vectors) as each batch finishes, so the caller can add
+    vectors to the FAISS index while later batches are still being embedded.
+  - Small jobs (fewer than EMBEDDING_POOL_MIN_CHUNKS texts) or EMBEDDING_WORKERS=1 run
+    in-process, batch by batch, with the caller's embedding model. Starting processes and
+    loading the model in each costs a few seconds, which only pays off on big builds.
+  - Workers load the model with the same backend as the server (torch or ONNX Runtime,
+    see embedding_backends.py) and cap their threads at EMBEDDING_TORCH_THREADS.
+  - Worker processes use the "spawn" start method (forking a process that already runs
+    torch threads is unsafe). At most 2 batches per worker are in flight at a time.
+  - If the pool cannot be started or a worker dies, the remaining batches are embedded
+    in-process, so a build never fails because of the pool.
+  - Throughput (chunks/sec) is logged at the end of every run and kept in last_run.
+
+CONFIG (config.py / .env):
+  EMBEDDING_BATCH_SIZE, EMBEDDING_WORKERS, EMBEDDING_TORCH_THREADS, EMBEDDING_POOL_MIN_CHUNKS
+"""
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+
+# ==============================================================================
+# WORKER PROCESS SIDE
+# ==============================================================================
+# These run inside the pool's processes. The model is created once per process by
+# _init_worker and reused for every batch that process receives.
+
+_worker_embeddings: Optional[Embeddings] = None
+
+
+def _init_worker(model_name: str, backend: str, threads: int, batch_size: int):
+    """Pool initializer: load the embedding model once for this process, capped at `threads` threads."""
+    global _worker_embeddings
+    from app.services.embedding_backends import create_embeddings
+
+    _worker_embeddings = create_embeddings(model_name, backend, threads=threads, batch_size=batch_size)
+
+
+def _embed_batch(offset: int, texts: List[str]) -> Tuple[int, List[List[float]]]:
+    """Embed one batch in a worker; return it with its offset so results can arrive out of order."""
+    return offset, _worker_embeddings.embed_documents(texts)
+
+
+# ==============================================================================
+# EMBEDDING PIPELINE CLASS
+# ==============================================================================
+
+class EmbeddingPipeline:
+    """
+    Streams texts through an embedding model in batches, in-process or over a process pool.
+    `embeddings` is used for in-process batches; workers load `model_name` on `backend` themselves.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        batch_size: int,
+        workers: int,
+        torch_threads: int,
+        min_pool_chunks: int,
+        backend: str = "torch",
+    ):
+        """Store the settings; no processes are started until a large enough job arrives."""
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.torch_threads = max(1, torch_threads)
+        self.min_pool_chunks = min_pool_chunks
+        # Stats of the most recent embed() run: chunks, seconds, chunks_per_sec, workers.
+        self.last_run: dict = {}
+
+    def embed(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Yield (offset, vectors) for consecutive batches of texts; vectors[i] belongs to
+        texts[offset + i]. Batches may be yielded out of order when a pool is used.
+        """
+        if not texts:
+            return
+        started = time.perf_counter()
+        batches = [(i, texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        use_pool = self.workers > 1 and len(texts) >= self.min_pool_chunks
+        done = 0
+        workers_used = 1
+        remaining = batches
+        if use_pool:
+            workers_used = min(self.workers, len(batches))
+            remaining = []
+            for offset, vectors in self._embed_in_pool(batches, workers_used, remaining):
+                done += len(vectors)
+                yield offset, vectors
+        for offset, batch in remaining:
+            vectors = self.embeddings.embed_documents(batch)
+            done += len(vectors)
+            yield offset, vectors
+
+        seconds = time.perf_counter() - started
+        rate = done / seconds if seconds > 0 else float(done)
+        self.last_run = {
+            "chunks": done,
+            "seconds": round(seconds, 3),
+            "chunks_per_sec": round(rate, 1),
+            "workers": workers_used,
+        }
+        logger.info(
+            "Embedded %d chunk(s) in %.1fs (%.1f chunks/sec, %d worker(s), batch size %d)",
+            done, seconds, rate, workers_used, self.batch_size,
+        )
+
+    def _embed_in_pool(
+        self,
+        batches: List[Tuple[int, List[str]]],
+        workers: int,
+        leftover: List[Tuple[int, List[str]]],
+    ) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Run batches on a spawn-based process pool, yielding each as it completes. Keeps at
+        most 2 batches per worker in flight. If the pool fails, the batches that did not
+        finish are appended to `leftover` for the caller to embed in-process.
+        """
+        pending_batches = list(batches)
+        in_flight = {}
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.torch_threads, self.batch_size),
+            ) as pool:
+                while pending_batches or in_flight:
+                    while pending_batches and len(in_flight) < workers * 2:
+                        offset, batch = pending_batches.pop(0)
+                        in_flight[pool.submit(_embed_batch, offset, batch)] = (offset, batch)
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        offset, batch = in_flight.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception:
+                            # Keep the failed batch so it is retried in-process.
+                            leftover.append((offset, batch))
+                            raise
+                        yield result
+        except Exception as e:
+            logger.warning("Embedding worker pool failed, finishing in-process: %s", e)
+            leftover.extend(in_flight.values())
+            leftover.extend(pending_batches)
@@ -0,0 +1,249 @@
+"""
+FAISS INDEX MODULE
+==================
+
+Builds and tunes the raw FAISS index that sits inside the LangChain FAISS store. The
+vector store service decides *when* to (re)build; this module decides *what* to build.
+
+INDEX TYPES:
+  flat - IndexFlatL2: exact search, cost grows linearly with the number of chunks.
+         Supports removal, so live updates delete chunks in place.
+  hnsw - IndexHNSWFlat: graph-based approximate search, roughly logarithmic query cost.
+         Tuned with HNSW_M (graph degree), HNSW_EF_CONSTRUCTION and HNSW_EF_SEARCH
+         (higher = better recall, slower queries).
+  ivf  - IndexIVFFlat: vectors are bucketed around IVF_NLIST k-means centroids and a query
+         scans IVF_NPROBE buckets. Needs training, so it is only built from a full set of
+         vectors (never streamed), and only used for large corpora.
+
+  With VECTOR_INDEX_TYPE=auto the type follows the corpus size: flat below
+  VECTOR_INDEX_HNSW_MIN_VECTORS, hnsw below VECTOR_INDEX_IVF_MIN_VECTORS, ivf above.
+  Run benchmarks/ann_recall.py to see recall@k vs latency for these settings.
+
+QUANTIZATION (VECTOR_INDEX_QUANTIZATION):
+  none - float32 vectors: 1536 bytes per 384-dim chunk.
+  sq8  - scalar int8 per dimension: 384 bytes per chunk (4x smaller), tiny recall loss.
+  pq   - product quantization, PQ_M sub-vectors of PQ_NBITS bits: 48 bytes per chunk with
+         the defaults (32x smaller), noticeably lossy; pair it with exact re-ranking.
+  Quantization combines with every index type (flat -> IndexScalarQuantizer / IndexPQ,
+  hnsw -> IndexHNSWSQ / IndexHNSWPQ, ivf -> IndexIVFScalarQuantizer / IndexIVFPQ). All of
+  them need training, so like IVF they are only built from a full set of vectors. PQ needs
+  at least PQ_MIN_TRAIN_VECTORS to train well; below that we store float32 instead.
+
+POSITIONS:
+  Every builder adds vectors in order, so row i of the input becomes FAISS id i. That is
+  what lets the store keep its index_to_docstore_id mapping when converting between types.
+
+FILTERED SEARCH:
+  search_parameters() wraps an IDSelector (e.g. "only chunks newer than X") into the
+  SearchParameters of the index's family, carrying over its efSearch / nprobe, so the
+  filter is applied inside the FAISS search itself: excluded ids are never candidates and
+  the top-k is filled from the allowed ones. Flat PQ (IndexPQ) cannot take a selector;
+  supports_selector() tells the caller to filter its results instead.
+
+PERSISTENCE:
+  The type is part of the saved .faiss file (faiss.write_index/read_index), so it survives
+  save/load. Search-time knobs (efSearch, nprobe) come from config and are re-applied with
+  apply_search_params() after every build or load.
+"""
+
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from config import (
+    VECTOR_INDEX_TYPE,
+    VECTOR_INDEX_HNSW_MIN_VECTORS,
+    VECTOR_INDEX_IVF_MIN_VECTORS,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    IVF_NLIST,
+    IVF_NPROBE,
+    VECTOR_INDEX_QUANTIZATION,
+    PQ_M,
+    PQ_NBITS,
+)
+
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+QUANTIZATIONS = ("none", "sq8", "pq")
+
+# k-means needs ~39 points per centroid for stable PQ codebooks (2**PQ_NBITS centroids each).
+PQ_MIN_TRAIN_VECTORS = 39 * (2 ** PQ_NBITS)
+
+
+def resolve_index_type(num_vectors: int, configured: Optional[str] = None) -> str:
+    """
+    Return the index type to use for num_vectors chunks: the configured one, or for "auto"
+    the one that fits the corpus size (flat -> hnsw -> ivf as it grows).
+    """
+    configured = (configured or VECTOR_INDEX_TYPE).lower()
+    if configured in INDEX_TYPES:
+        return configured
+    if num_vectors >= VECTOR_INDEX_IVF_MIN_VECTORS:
+        return "ivf"
+    if num_vectors >= VECTOR_INDEX_HNSW_MIN_VECTORS:
+        return "hnsw"
+    return "flat"
+
+
+def resolve_quantization(num_vectors: int, configured: Optional[str] = None) -> str:
+    """Return the vector encoding to use: the configured one, except PQ falls back to none on tiny corpora."""
+    configured = (configured or VECTOR_INDEX_QUANTIZATION).lower()
+    if configured not in QUANTIZATIONS:
+        return "none"
+    if configured == "pq" and num_vectors < PQ_MIN_TRAIN_VECTORS:
+        return "none"
+    return configured
+
+
+def index_type(index: faiss.Index) -> str:
+    """Return "flat", "hnsw" or "ivf" for an existing index (e.g. one read back from disk)."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_quantization(index: faiss.Index) -> str:
+    """Return "none", "sq8" or "pq" for how an existing index stores its vectors."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "sq8"
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "none"
+
+
+def estimate_index_bytes(index: faiss.Index) -> int:
+    """Approximate resident size of an index: vector codes plus HNSW links or IVF ids."""
+    if isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        # Level 0 keeps 2*M neighbour ids (int32) per vector; upper levels add little.
+        return index.ntotal * (storage.code_size + index.hnsw.nb_neighbors(0) * 4)
+    if isinstance(index, faiss.IndexIVF):
+        return index.ntotal * (index.code_size + 8)  # 8-byte id per vector in the inverted lists
+    return index.ntotal * index.code_size
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    """
+    True if index.remove_ids() compacts the remaining ids the way LangChain's FAISS.delete()
+    expects. Only flat-family indexes (float32, SQ8 or PQ codes) do; HNSW cannot remove at
+    all and IVF keeps the old ids.
+    """
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def ivf_nlist(num_vectors: int) -> int:
+    """Number of IVF buckets: IVF_NLIST if set, else ~4 * sqrt(n) (kept within 16..65536)."""
+    if IVF_NLIST > 0:
+        return IVF_NLIST
+    return int(min(65536, max(16, 4 * math.sqrt(num_vectors))))
+
+
+def new_index(kind: str, dim: int) -> faiss.Index:
+    """Empty index of the given kind that accepts add() immediately (flat or hnsw; ivf needs training)."""
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    else:
+        raise ValueError(f"Index type {kind!r} must be built from vectors with build_index()")
+    apply_search_params(index)
+    return index
+
+
+def _untrained_index(kind: str, quantization: str, dim: int, num_vectors: int) -> faiss.Index:
+    """Construct (but do not train or fill) the FAISS index for a type + quantization pair."""
+    sq8 = faiss.ScalarQuantizer.QT_8bit
+    if kind == "ivf":
+        quantizer = faiss.IndexFlatL2(dim)
+        nlist = ivf_nlist(num_vectors)
+        if quantization == "sq8":
+            return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, sq8, faiss.METRIC_L2)
+        if quantization == "pq":
+            return faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS)
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+    if kind == "hnsw":
+        if quantization == "sq8":
+            index = faiss.IndexHNSWSQ(dim, sq8, HNSW_M)
+        elif quantization == "pq":
+            index = faiss.IndexHNSWPQ(dim, PQ_M, HNSW_M, PQ_NBITS)
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+    if quantization == "sq8":
+        return faiss.IndexScalarQuantizer(dim, sq8, faiss.METRIC_L2)
+    if quantization == "pq":
+        return faiss.IndexPQ(dim, PQ_M, PQ_NBITS)
+    return faiss.IndexFlatL2(dim)
+
+
+def build_index(kind: str, vectors: np.ndarray, quantization: str = "none") -> faiss.Index:
+    """
+    Build an index of the given kind and quantization holding `vectors` (float32, rows x dim);
+    row i gets id i. Trained on the same vectors. With too few vectors to train IVF we fall
+    back to flat, and with too few for PQ we store float32.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    if kind == "ivf" and num_vectors < ivf_nlist(num_vectors):
+        kind = "flat"
+    if quantization == "pq" and num_vectors < PQ_MIN_TRAIN_VECTORS:
+        quantization = "none"
+    index = _untrained_index(kind, quantization, dim, num_vectors)
+    if not index.is_trained:
+        index.train(vectors)
+    if num_vectors:
+        index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index: faiss.Index):
+    """Set the configured search-time knobs (efSearch for HNSW, nprobe for IVF) on an index."""
+    kind = index_type(index)
+    if kind == "hnsw":
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif kind == "ivf":
+        index.nprobe = IVF_NPROBE
+        # A direct map lets single vectors be reconstructed by id; it is saved with the index.
+        if index.direct_map.type == faiss.DirectMap.NoMap:
+            index.make_direct_map()
+
+
+def supports_selector(index: faiss.Index) -> bool:
+    """True if index.search() accepts an IDSelector in its search parameters (all but flat PQ)."""
+    return not isinstance(index, faiss.IndexPQ)
+
+
+def search_parameters(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """
+    Search parameters that restrict a search to the ids `selector` accepts, keeping the
+    index's own efSearch (HNSW) or nprobe (IVF). Keep `selector` alive while searching.
+    """
+    kind = index_type(index)
+    if kind == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = index.hnsw.efSearch
+    elif kind == "ivf":
+        params = faiss.SearchParametersIVF()
+        params.nprobe = index.nprobe
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Return every stored vector as a (ntotal x dim) float32 matrix, row i = id i."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
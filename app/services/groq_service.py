@@ -22,7 +22,8 @@ MULTIPLE API KEYS (round-robin and fallback):
 
 FLOW:
 1. get_response(question, chat_history) is called.
-2. We ask the vector store for the top-k chunks most similar to the question (retrieval).
+2. We ask the vector store for the top-k chunks most similar to the question (retrieval),
+   trimmed per query by score and a character budget (RETRIEVAL_* in config.py).
 3. We build a system message: JARVIS_SYSTEM_PROMPT + current time + retrieved context.
 4. We send to Groq using the next key in rotation (or fallback to next key on failure).
 5. We return the assistant's reply.
@@ -37,7 +38,15 @@ from langchain_core.messages import HumanMessage, AIMessage
 
 import logging
 
-from config import GROQ_API_KEYS, GROQ_MODEL, JARVIS_SYSTEM_PROMPT
+from config import (
+    GROQ_API_KEYS,
+    GROQ_MODEL,
+    JARVIS_SYSTEM_PROMPT,
+    RETRIEVAL_K,
+    RETRIEVAL_MAX_CHARS,
+    RETRIEVAL_MIN_SCORE,
+    RETRIEVAL_SCORE_GAP,
+)
 from app.services.vector_store import VectorStoreService
 from app.utils.time_info import get_time_information
 
@@ -182,6 +191,30 @@ class GroqService:
         logger.error(f"All API keys failed. Tried keys: {masked_all_keys}")
         raise Exception(f"Error getting response from Groq: {str(last_exc)}") from last_exc
 
+    def _retrieve_context(self, question: str) -> str:
+        """
+        Text of the chunks relevant to the question, one per line, for the system message.
+        Up to RETRIEVAL_K chunks, minus those the score cutoffs or the character budget drop.
+        If retrieval fails (e.g. vector store not ready), returns "" so the LLM still answers.
+        """
+        try:
+            result = self.vector_store_service.search(
+                question,
+                k=RETRIEVAL_K,
+                min_score=RETRIEVAL_MIN_SCORE,
+                score_gap=RETRIEVAL_SCORE_GAP,
+                max_chars=RETRIEVAL_MAX_CHARS,
+            )
+        except Exception as retrieval_err:
+            logger.warning("Vector store retrieval failed, using empty context: %s", retrieval_err)
+            return ""
+        context = "\n".join(chunk.document.page_content for chunk in result.chunks)
+        logger.debug(
+            "Retrieved %d chunk(s), %d trimmed, %d chars (embed %.1f ms, search %.1f ms, rerank %.1f ms)",
+            len(result.chunks), result.trimmed, len(context), result.embed_ms, result.search_ms, result.rerank_ms,
+        )
+        return context
+
     def get_response(
         self,
         question: str,
@@ -194,14 +227,7 @@ class GroqService:
         """
         try:
             # Get relevant chunks from learning data and past chats (bounded token usage).
-            # If retrieval fails (e.g. vector store not ready), use empty context so the LLM still answers.
-            context = ""
-            try:
-                retriever = self.vector_store_service.get_retriever(k=10)
-                context_docs = retriever.invoke(question)
-                context = "\n".join([doc.page_content for doc in context_docs]) if context_docs else ""
-            except Exception as retrieval_err:
-                logger.warning("Vector store retrieval failed, using empty context: %s", retrieval_err)
+            context = self._retrieve_context(question)
 
             # Build system message: personality + current time + retrieved context.
             time_info = get_time_information()
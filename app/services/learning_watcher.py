@@ -0,0 +1,171 @@
+"""
+LEARNING DATA WATCHER MODULE
+============================
+
+Notices added, changed and deleted .txt files in database/learning_data/ while the server
+runs and hands each one to VectorStoreService.schedule_source_update(), which re-chunks and
+re-embeds just that file and swaps its chunks in the live index (queries keep running; only
+the final swap takes the index lock). Editing userdata.txt no longer needs a restart.
+
+HOW CHANGES ARE DETECTED:
+  - watchdog installed (pip install watchdog): filesystem events (inotify on Linux,
+    FSEvents / ReadDirectoryChangesW elsewhere). Editors fire several events per save, so a
+    file is only scheduled once it has been quiet for LEARNING_WATCH_DEBOUNCE seconds.
+  - otherwise: polling. Every LEARNING_WATCH_INTERVAL seconds the folder is listed and each
+    file's size and mtime compared with the previous scan.
+
+  Either way a false alarm is cheap: update_source() compares the file's hash with the
+  manifest and does nothing when the content did not change.
+
+USAGE:
+  watcher = LearningDataWatcher(vector_store_service)
+  watcher.start()   # after start_background_build(); updates queue behind the build
+  watcher.stop()    # on shutdown, before vector_store_service.close()
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config import LEARNING_DATA_DIR, LEARNING_WATCH_DEBOUNCE, LEARNING_WATCH_INTERVAL
+from app.services.vector_store import VectorStoreService
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+
+class LearningDataWatcher:
+    """Background thread that re-indexes learning .txt files when they change on disk."""
+
+    def __init__(
+        self,
+        vector_store_service: VectorStoreService,
+        directory: Path = LEARNING_DATA_DIR,
+        interval: float = LEARNING_WATCH_INTERVAL,
+        debounce: float = LEARNING_WATCH_DEBOUNCE,
+    ):
+        """Remember what to watch; nothing runs until start()."""
+        self.vector_store_service = vector_store_service
+        self.directory = Path(directory)
+        self.interval = max(0.1, interval)
+        self.debounce = max(0.0, debounce)
+        self.mode: Optional[str] = None  # "events" or "polling" once started
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        # Polling: path -> (size, mtime_ns) from the last scan.
+        self._snapshot: Dict[Path, Tuple[int, int]] = {}
+        # Events: path -> time of the latest event, waiting for the debounce period to pass.
+        self._pending: Dict[Path, float] = {}
+        self._pending_lock = threading.Lock()
+
+    def start(self):
+        """Start watching with filesystem events if watchdog is installed, else by polling."""
+        if self._thread is not None:
+            return
+        self._snapshot = self._scan()
+        if self._start_observer():
+            self.mode = "events"
+            target = self._run_events
+        else:
+            self.mode = "polling"
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="learning-data-watcher", daemon=True)
+        self._thread.start()
+        logger.info("Watching %s for learning data changes (%s)", self.directory, self.mode)
+
+    def stop(self):
+        """Stop the watcher thread (and the watchdog observer, if any)."""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------------------------
+    # FILESYSTEM EVENTS (WATCHDOG)
+    # ------------------------------------------------------------------------------
+
+    def _start_observer(self) -> bool:
+        """Start a watchdog observer on the folder; False if watchdog is missing or fails to start."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                    if path:
+                        watcher._note_event(Path(path))
+
+        try:
+            observer = Observer()
+            observer.schedule(_Handler(), str(self.directory), recursive=False)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            logger.warning("Could not start filesystem watcher, falling back to polling: %s", e)
+            return False
+        self._observer = observer
+        return True
+
+    def _note_event(self, path: Path):
+        """Remember an event for a .txt file directly in the folder (called on the observer thread)."""
+        if path.suffix != ".txt" or path.parent.resolve() != self.directory.resolve():
+            return
+        with self._pending_lock:
+            self._pending[path] = time.monotonic()
+
+    def _run_events(self):
+        """Schedule files whose last event is older than the debounce period."""
+        tick = min(self.debounce, 1.0) if self.debounce > 0 else 0.2
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            with self._pending_lock:
+                ready = [path for path, at in self._pending.items() if now - at >= self.debounce]
+                for path in ready:
+                    del self._pending[path]
+            for path in ready:
+                self._schedule(path)
+
+    # ------------------------------------------------------------------------------
+    # POLLING
+    # ------------------------------------------------------------------------------
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        """(size, mtime_ns) of every .txt file in the folder; files that vanish mid-scan are skipped."""
+        snapshot = {}
+        for path in self.directory.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _run_polling(self):
+        """Every interval, diff a fresh scan against the last one and schedule what changed."""
+        while not self._stop.wait(self.interval):
+            current = self._scan()
+            changed = [path for path, stat in current.items() if self._snapshot.get(path) != stat]
+            deleted = [path for path in self._snapshot if path not in current]
+            self._snapshot = current
+            for path in changed + deleted:
+                self._schedule(path)
+
+    def _schedule(self, path: Path):
+        """Queue one file on the vector store's update worker."""
+        logger.info("Learning data changed: %s", path.name)
+        try:
+            self.vector_store_service.schedule_source_update(path)
+        except Exception as e:
+            logger.warning("Could not schedule re-index of %s: %s", path, e)
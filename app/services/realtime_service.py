@@ -123,14 +123,8 @@ class RealtimeGroqService(GroqService):
             search_results = self.search_tavily(question, num_results=5)
 
             # Retrieve context from vector store (learning data + past chats).
-            # If retrieval fails, use empty context so the LLM still answers (e.g. with Tavily results).
-            context = ""
-            try:
-                retriever = self.vector_store_service.get_retriever(k=10)
-                context_docs = retriever.invoke(question)
-                context = "\n".join([doc.page_content for doc in context_docs]) if context_docs else ""
-            except Exception as retrieval_err:
-                logger.warning("Vector store retrieval failed, using empty context: %s", retrieval_err)
+            # If retrieval fails, context is empty so the LLM still answers (e.g. with Tavily results).
+            context = self._retrieve_context(question)
 
             # Build system message: personality + time + Tavily results + retrieved context.
             time_info = get_time_information()
@@ -0,0 +1,203 @@
+"""
+RERANKER MODULE
+===============
+
+Optional second retrieval stage: a small cross-encoder (RERANKER_MODEL, run locally on CPU
+with sentence-transformers) reads the question together with each candidate chunk and
+scores how well the chunk answers it. VectorStoreService.search() fetches a wider pool
+(RERANKER_CANDIDATES) when it is on, and keeps the k chunks the cross-encoder likes best.
+
+COST CONTROL:
+  - One forward pass per query: every uncached (question, chunk) pair goes to the model as
+    a single batch.
+  - Pair cache: scores are kept in an in-memory LRU keyed by hash(question, chunk text), so
+    a repeated question (or the same question on /chat then /chat/realtime) costs nothing.
+  - Time budget: the cost per pair of each forward pass is tracked (moving average). A query
+    scores at most as many uncached candidates as fit in RERANKER_BUDGET_MS, best first-stage
+    candidates first; the rest keep their first-stage order after the scored ones.
+  - Lazy load: the model is loaded on a background thread the first time rerank() is called.
+    Until it is ready (or if it fails to load) rerank() returns the candidates unchanged.
+
+SCORES:
+  RetrievedChunk.rerank_score is the cross-encoder's raw output (a logit for the ms-marco
+  models: higher is more relevant, not comparable with the cosine similarity in .score).
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from config import RERANKER_BUDGET_MS, RERANKER_CACHE_SIZE, RERANKER_CANDIDATES, RERANKER_MODEL
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+# Weight of the newest forward pass in the moving average of cost per pair.
+COST_SMOOTHING = 0.3
+
+
+def rerank_probability(score: float) -> float:
+    """Squash a cross-encoder logit to 0..1 (sigmoid), e.g. to mix it with cosine similarities."""
+    return 1.0 / (1.0 + math.exp(-score))
+
+
+class CrossEncoderReranker:
+    """
+    Rescores search candidates with a cross-encoder under a per-query time budget.
+    Thread-safe; one instance per VectorStoreService. Nothing is imported or loaded until
+    the first rerank() call.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL,
+        candidates: int = RERANKER_CANDIDATES,
+        budget_ms: float = RERANKER_BUDGET_MS,
+        cache_size: int = RERANKER_CACHE_SIZE,
+    ):
+        """Remember the settings; the model loads on first use."""
+        self.model_name = model_name
+        self.candidates = max(1, candidates)
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._model = None
+        self._load_started = False
+        self._load_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._ms_per_pair: Optional[float] = None
+        self.calls = 0
+        self.skipped = 0
+        self.cache_hits = 0
+        self.pairs_scored = 0
+        self.budget_cuts = 0
+        self.total_ms = 0.0
+
+    # ------------------------------------------------------------------------------
+    # MODEL LOADING
+    # ------------------------------------------------------------------------------
+
+    def is_ready(self) -> bool:
+        """True once the cross-encoder is loaded and rerank() actually rescores."""
+        return self._model is not None
+
+    def _ensure_loading(self):
+        """Start loading the model on a background thread (once)."""
+        with self._lock:
+            if self._load_started:
+                return
+            self._load_started = True
+        threading.Thread(target=self._load, name="reranker-load", daemon=True).start()
+
+    def _load(self):
+        """Import sentence-transformers and load the cross-encoder; on failure log and stay disabled."""
+        started = time.perf_counter()
+        try:
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(self.model_name, device="cpu")
+        except Exception as e:
+            self._load_error = str(e)
+            logger.warning("Cross-encoder reranker unavailable, search results are not reranked: %s", e)
+            return
+        self._model = model
+        logger.info("Loaded reranker %s in %.1fs", self.model_name, time.perf_counter() - started)
+
+    # ------------------------------------------------------------------------------
+    # RERANKING
+    # ------------------------------------------------------------------------------
+
+    def _key(self, query: str, text: str) -> bytes:
+        """Cache key of one (question, chunk text) pair."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(query.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def _affordable(self, pending: int) -> int:
+        """How many uncached pairs fit in the time budget (all of them until the cost is known)."""
+        if self.budget_ms <= 0 or self._ms_per_pair is None:
+            return pending
+        return min(pending, max(1, int(self.budget_ms / max(self._ms_per_pair, 1e-3))))
+
+    def rerank(self, query: str, chunks: List) -> Tuple[List, float]:
+        """
+        Reorder RetrievedChunk candidates (given best first-stage first) by cross-encoder score,
+        setting chunk.rerank_score. Returns (chunks, ms spent). Candidates that were not scored
+        (over the time budget) follow the scored ones in their original order; if the model is
+        not ready the list comes back unchanged.
+        """
+        if not chunks or not query:
+            return chunks, 0.0
+        if self._model is None:
+            self._ensure_loading()
+            with self._lock:
+                self.skipped += 1
+            return chunks, 0.0
+
+        started = time.perf_counter()
+        keys = [self._key(query, chunk.document.page_content) for chunk in chunks]
+        with self._lock:
+            scores = [self._cache.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._cache.move_to_end(key)
+            hits = sum(score is not None for score in scores)
+            pending = [i for i, score in enumerate(scores) if score is None]
+            affordable = self._affordable(len(pending))
+
+        to_score = pending[:affordable]
+        if to_score:
+            pairs = [(query, chunks[i].document.page_content) for i in to_score]
+            model_started = time.perf_counter()
+            predicted = self._model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            per_pair = (time.perf_counter() - model_started) * 1000 / len(pairs)
+            for i, score in zip(to_score, predicted):
+                scores[i] = float(score)
+
+        for chunk, score in zip(chunks, scores):
+            chunk.rerank_score = score
+        scored = [chunk for chunk in chunks if chunk.rerank_score is not None]
+        unscored = [chunk for chunk in chunks if chunk.rerank_score is None]
+        scored.sort(key=lambda chunk: chunk.rerank_score, reverse=True)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            if to_score:
+                self._ms_per_pair = per_pair if self._ms_per_pair is None else (
+                    COST_SMOOTHING * per_pair + (1 - COST_SMOOTHING) * self._ms_per_pair
+                )
+                if self.cache_size > 0:
+                    for i in to_score:
+                        self._cache[keys[i]] = scores[i]
+                        self._cache.move_to_end(keys[i])
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            self.calls += 1
+            self.cache_hits += hits
+            self.pairs_scored += len(to_score)
+            self.budget_cuts += len(pending) > affordable
+            self.total_ms += elapsed_ms
+        return scored + unscored, elapsed_ms
+
+    def stats(self) -> dict:
+        """Model state, pair cache and timing counters since startup."""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "ready": self.is_ready(),
+                "error": self._load_error,
+                "calls": self.calls,
+                "skipped_not_ready": self.skipped,
+                "pairs_scored": self.pairs_scored,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self._cache),
+                "budget_cuts": self.budget_cuts,
+                "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+                "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            }
@@ -0,0 +1,212 @@
+"""
+SESSION CACHE MODULE
+====================
+
+Bounded in-memory store of chat sessions for ChatService: session_id -> list of ChatMessage,
+kept in least-recently-used order. Without a bound every session touched since startup
+stays resident, so a long-running server only ever grows.
+
+LIMITS:
+  At most CHAT_CACHE_MAX_SESSIONS sessions, and their messages at most about CHAT_CACHE_MAX_MB
+  (estimated per message: text length plus a fixed overhead for the ChatMessage object).
+  0 turns a limit off. When a limit is exceeded the least recently used sessions are
+  evicted until it holds again.
+
+EVICTION:
+  A session is saved (the flush callback, ChatService.save_chat_session) before it is
+  dropped, so eviction never loses a turn; if the save fails the session stays. Never
+  evicted: the most recently used session (so a session larger than the whole budget can
+  still be used) and sessions pinned by a request in progress (pinned()). A session that
+  gains a message while it is being saved is kept. ChatService reloads an evicted session
+  from the session store (load_session_from_disk) the next time it is asked for.
+
+STATS:
+  stats() reports size, limits and hit/miss/eviction counters (GET /stats, "session_cache").
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from config import CHAT_CACHE_MAX_MB, CHAT_CACHE_MAX_SESSIONS
+from app.models import ChatMessage
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+# Rough memory of one ChatMessage beyond its text: the model object, its dict and three strs.
+MESSAGE_OVERHEAD_BYTES = 400
+
+
+def message_bytes(message: ChatMessage) -> int:
+    """Estimated memory of one message (text lengths plus MESSAGE_OVERHEAD_BYTES)."""
+    return MESSAGE_OVERHEAD_BYTES + len(message.role) + len(message.content) + len(message.timestamp or "")
+
+
+class SessionCache:
+    """
+    LRU of in-memory chat sessions bounded by session count and estimated bytes; evicted
+    sessions are saved first. Thread-safe; saves run outside the lock.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[str], bool],
+        max_sessions: int = CHAT_CACHE_MAX_SESSIONS,
+        max_bytes: int = int(CHAT_CACHE_MAX_MB * 1024 * 1024),
+        dropped: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        flush(session_id) saves a session and returns False if it could not; dropped(session_id)
+        is called after a session was evicted. max_sessions / max_bytes <= 0 means no limit.
+        """
+        self.flush = flush
+        self.dropped = dropped
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, List[ChatMessage]]" = OrderedDict()
+        # session_id -> estimated bytes of its messages; _bytes is their sum.
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        # session_id -> number of requests using it right now (never evicted while > 0).
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.eviction_failures = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        """True if the session is in memory (does not count as a use)."""
+        with self._lock:
+            return session_id in self._entries
+
+    def __len__(self) -> int:
+        """Number of sessions in memory."""
+        with self._lock:
+            return len(self._entries)
+
+    def peek(self, session_id: str) -> Optional[List[ChatMessage]]:
+        """The session's messages if in memory, without counting a hit or moving it up the LRU."""
+        with self._lock:
+            return self._entries.get(session_id)
+
+    def get(self, session_id: str) -> Optional[List[ChatMessage]]:
+        """The session's messages (hit, now most recently used) or None (miss)."""
+        with self._lock:
+            messages = self._entries.get(session_id)
+            if messages is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return messages
+
+    def put(self, session_id: str, messages: List[ChatMessage]):
+        """Add (or replace) a session as the most recently used, then evict down to the limits."""
+        size = sum(map(message_bytes, messages))
+        with self._lock:
+            self._bytes += size - self._sizes.get(session_id, 0)
+            self._entries[session_id] = messages
+            self._entries.move_to_end(session_id)
+            self._sizes[session_id] = size
+        self._evict()
+
+    def setdefault(self, session_id: str, messages: List[ChatMessage]) -> List[ChatMessage]:
+        """
+        put() unless the session is already cached; returns the cached list. Two threads loading
+        the same session at once thus end up appending to the same list.
+        """
+        with self._lock:
+            existing = self._entries.get(session_id)
+            if existing is not None:
+                self._entries.move_to_end(session_id)
+                return existing
+        self.put(session_id, messages)
+        return messages
+
+    def account(self, session_id: str, message: ChatMessage):
+        """Record a message just appended to a cached session, then evict down to the limits."""
+        with self._lock:
+            if session_id not in self._entries:
+                return
+            self._sizes[session_id] += message_bytes(message)
+            self._bytes += message_bytes(message)
+            self._entries.move_to_end(session_id)
+        self._evict()
+
+    @contextmanager
+    def pinned(self, session_id: str) -> Iterator[None]:
+        """Keep the session from being evicted inside the with-block (it need not be cached yet)."""
+        with self._lock:
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[session_id] -= 1
+                if not self._pins[session_id]:
+                    del self._pins[session_id]
+
+    def stats(self) -> dict:
+        """Size, limits and hit/miss/eviction counters since startup."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "sessions": len(self._entries),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "pinned": len(self._pins),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "eviction_failures": self.eviction_failures,
+            }
+
+    # ------------------------------------------------------------------------------
+    # EVICTION
+    # ------------------------------------------------------------------------------
+
+    def _over_limit(self) -> bool:
+        """True if either limit is exceeded (call with _lock held)."""
+        return (0 < self.max_sessions < len(self._entries)) or (0 < self.max_bytes < self._bytes)
+
+    def _evict(self):
+        """
+        Save and drop least recently used sessions until the limits hold, skipping pinned ones
+        and the most recently used; stops early if nothing else can be evicted.
+        """
+        skipped: Set[str] = set()
+        while True:
+            with self._lock:
+                if not self._over_limit():
+                    return
+                candidates = list(self._entries)[:-1]
+                victim = next(
+                    (sid for sid in candidates if sid not in skipped and not self._pins.get(sid)),
+                    None,
+                )
+                if victim is None:
+                    return
+                size = self._sizes[victim]
+            try:
+                saved = self.flush(victim)
+            except Exception as e:
+                logger.error("Saving chat session %s before eviction failed: %s", victim, e)
+                saved = False
+            with self._lock:
+                # Keep it if the save failed, a request picked it up, or it grew meanwhile.
+                if not saved or self._pins.get(victim) or self._sizes.get(victim) != size:
+                    skipped.add(victim)
+                    self.eviction_failures += not saved
+                    continue
+                del self._entries[victim]
+                del self._sizes[victim]
+                self._bytes -= size
+                self.evictions += 1
+            if self.dropped is not None:
+                self.dropped(victim)
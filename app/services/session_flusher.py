@@ -0,0 +1,217 @@
+"""
+SESSION FLUSHER MODULE
+======================
+
+Write-behind persistence for chat sessions. A request only marks its session dirty; a
+background thread writes dirty sessions to disk a moment later, so request latency no
+longer depends on the disk and several turns (of one or many sessions) share one write
+round.
+
+HOW IT FLUSHES:
+  - Group commit: the first mark_dirty() after an idle period opens a window of
+    CHAT_FLUSH_INTERVAL seconds; every session marked within it is written in the same
+    round (one call to the flush function), and a session marked several times is written
+    once.
+  - Retries: a session that fails to write stays dirty but is held back with exponential
+    backoff (CHAT_FLUSH_INTERVAL, doubling per consecutive failure, capped at
+    CHAT_FLUSH_MAX_LAG) instead of being retried in a tight loop; a successful write resets
+    it. Other sessions keep flushing on schedule meanwhile. stop() tries every session once
+    more regardless of backoff.
+  - Max lag: a turn normally reaches disk within about CHAT_FLUSH_INTERVAL. If writes fall
+    behind (slow disk) so that the oldest unwritten turn is more than CHAT_FLUSH_MAX_LAG
+    seconds old, mark_dirty() blocks until the flusher catches up (for at most that long
+    again, so a stalled disk slows requests down but never hangs them), which bounds how
+    much conversation a crash can lose. Sessions backing off after a failed write do not
+    count towards the lag, so a session that cannot be written never throttles the others.
+  - Durability of each round (atomic snapshot rename, fsync) is up to the flush function;
+    ChatService applies CHAT_FSYNC there.
+
+USAGE:
+  flusher = SessionFlusher(chat_service.flush_sessions)
+  flusher.start()
+  flusher.mark_dirty(session_id)   # after each turn
+  flusher.stop()                   # on shutdown: final drain of every dirty session
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import CHAT_FLUSH_INTERVAL, CHAT_FLUSH_MAX_LAG
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+
+class SessionFlusher:
+    """Background thread that writes dirty chat sessions in coalesced rounds."""
+
+    def __init__(
+        self,
+        flush: Callable[[List[str]], Iterable[str]],
+        interval: float = CHAT_FLUSH_INTERVAL,
+        max_lag: float = CHAT_FLUSH_MAX_LAG,
+    ):
+        """
+        flush(session_ids) writes those sessions and returns the ids it could not write.
+        Nothing runs until start().
+        """
+        self.flush = flush
+        self.interval = max(0.0, interval)
+        self.max_lag = max(self.interval, max_lag)
+        # session_id -> monotonic time it was first marked since its last write.
+        self._dirty: Dict[str, float] = {}
+        # Mark times of the round being written right now (still unwritten for max-lag purposes).
+        self._in_flight: Dict[str, float] = {}
+        # session_id -> (monotonic time before which it is not retried, consecutive failures).
+        self._backoff: Dict[str, Tuple[float, int]] = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.rounds = 0
+        self.sessions_written = 0
+        self.failures = 0
+        self.backpressure_waits = 0
+        self.max_lag_seen = 0.0
+        self.last_round_ms = 0.0
+
+    def start(self):
+        """Start the flusher thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="session-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write every dirty session now (final drain), then stop the thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        # Also catches marks that arrived while the last round was being written.
+        self._flush_round(everything=True)
+
+    def mark_dirty(self, session_id: str):
+        """
+        Note that session_id has unwritten messages; returns at once unless the flusher is
+        more than max_lag behind, in which case it waits (up to max_lag) for the backlog to clear.
+        """
+        with self._cond:
+            self._dirty.setdefault(session_id, time.monotonic())
+            if self._stopping or self._thread is None:
+                return  # Written by stop().
+            self._cond.notify_all()
+            if self._lag() > self.max_lag:
+                # Wait for the backlog, but at most max_lag itself so a broken disk cannot hang requests.
+                self.backpressure_waits += 1
+                give_up = time.monotonic() + self.max_lag
+                while self._lag() > self.max_lag and not self._stopping and time.monotonic() < give_up:
+                    self._cond.wait(0.1)
+
+    def pending(self) -> int:
+        """Number of sessions marked dirty and not yet written."""
+        with self._cond:
+            return len(self._dirty) + len(self._in_flight)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: rounds, sessions written, failures, backlog and lag."""
+        with self._cond:
+            return {
+                "interval_s": self.interval,
+                "max_lag_s": self.max_lag,
+                "pending": len(self._dirty) + len(self._in_flight),
+                "lag_s": round(self._lag(), 3),
+                "max_lag_seen_s": round(self.max_lag_seen, 3),
+                "rounds": self.rounds,
+                "sessions_written": self.sessions_written,
+                "failures": self.failures,
+                "backing_off": len(self._backoff),
+                "backpressure_waits": self.backpressure_waits,
+                "last_round_ms": round(self.last_round_ms, 2),
+            }
+
+    # ------------------------------------------------------------------------------
+    # FLUSHER THREAD
+    # ------------------------------------------------------------------------------
+
+    def _lag(self) -> float:
+        """
+        Age of the oldest unwritten mark in seconds (call with _cond held). Sessions backing
+        off after a failed write are left out: waiting would not get them written, and one
+        failing session must not throttle every other session's turns.
+        """
+        marks = [
+            mark for pending in (self._dirty, self._in_flight)
+            for session_id, mark in pending.items() if session_id not in self._backoff
+        ]
+        return time.monotonic() - min(marks) if marks else 0.0
+
+    def _retry_at(self, session_id: str) -> float:
+        """Monotonic time before which a failed session is not written again (0 if not backing off)."""
+        return self._backoff.get(session_id, (0.0, 0))[0]
+
+    def _next_round(self) -> Optional[float]:
+        """
+        When the next round is due (call with _cond held): the group-commit window of the
+        oldest mark closes, or a session's backoff runs out. None if nothing is dirty.
+        """
+        if not self._dirty:
+            return None
+        return min(max(mark + self.interval, self._retry_at(sid)) for sid, mark in self._dirty.items())
+
+    def _run(self):
+        """
+        Wait for a dirty session, hold the group-commit window open, write the round; repeat.
+        Once stopping, exits (stop() writes whatever is still dirty).
+        """
+        while not self._stopping:
+            with self._cond:
+                while not self._stopping:
+                    due = self._next_round()
+                    if due is not None and time.monotonic() >= due:
+                        break
+                    # Re-checked on every mark_dirty(): a new mark may be due before a backoff ends.
+                    self._cond.wait(None if due is None else due - time.monotonic())
+            if not self._stopping:
+                self._flush_round()
+
+    def _flush_round(self, everything: bool = False):
+        """
+        Write every session dirty right now (except those still backing off, unless everything)
+        in one call to flush(); failed ones stay dirty and back off.
+        """
+        with self._cond:
+            now = time.monotonic()
+            batch = [sid for sid in self._dirty if everything or self._retry_at(sid) <= now]
+            if not batch:
+                return
+            self._in_flight = {sid: self._dirty.pop(sid) for sid in batch}
+            self.max_lag_seen = max(self.max_lag_seen, self._lag())
+        started = time.perf_counter()
+        try:
+            failed = set(self.flush(batch) or ())
+        except Exception as e:
+            logger.error("Writing %d chat session(s) failed: %s", len(batch), e, exc_info=True)
+            failed = set(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._cond:
+            now = time.monotonic()
+            for session_id in batch:
+                if session_id not in failed:
+                    self._backoff.pop(session_id, None)
+                    continue
+                # Keep the original mark time (the turn is still unwritten) but hold it back.
+                self._dirty.setdefault(session_id, self._in_flight[session_id])
+                attempts = self._backoff.get(session_id, (0.0, 0))[1] + 1
+                delay = min(max(self.interval, 0.05) * 2 ** (attempts - 1), self.max_lag)
+                self._backoff[session_id] = (now + delay, attempts)
+            self._in_flight = {}
+            self.rounds += 1
+            self.sessions_written += len(batch) - len(failed)
+            self.failures += len(failed)
+            self.last_round_ms = elapsed_ms
+            self._cond.notify_all()
+        if failed and self._stopping:
+            logger.error("Could not save %d chat session(s) on shutdown", len(failed))
@@ -0,0 +1,87 @@
+"""
+SESSION LOCKS MODULE
+====================
+
+Per-session mutual exclusion for chat turns. The chat endpoints run in a thread pool, so
+two requests for the same session can overlap; without a lock their add_message calls
+interleave, the history sent to the LLM pairs the wrong messages and a save can capture
+a half-finished turn. ChatService holds the session's lock for a whole turn: turns of one
+session run one after another (not strictly in arrival order), turns of different
+sessions never wait for each other.
+
+LOCK TABLE:
+  One lock per session that has a turn running or waiting; the entry is dropped when the
+  last holder or waiter leaves, so the table stays as small as the number of busy sessions.
+  Locks are re-entrant, so code already holding a session's lock may take it again.
+
+METRICS:
+  stats() reports acquisitions, how many had to wait (contended), total / average / max
+  wait in milliseconds and how many sessions are busy or waited on right now (GET /stats,
+  "session_locks").
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class SessionLocks:
+    """Table of re-entrant locks keyed by session_id, created on demand, with wait-time counters."""
+
+    def __init__(self):
+        """Empty table; a session's lock is created on its first hold()."""
+        # session_id -> [lock, number of threads holding or waiting for it].
+        self._entries: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self._waiting = 0
+
+    @contextmanager
+    def hold(self, session_id: str) -> Iterator[float]:
+        """
+        Hold the session's lock inside the with-block; blocks while another turn of the same
+        session holds it. Yields the time spent waiting, in milliseconds.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(session_id, [threading.RLock(), 0])
+            entry[1] += 1
+        lock: threading.RLock = entry[0]
+        started = time.perf_counter()
+        waited = not lock.acquire(blocking=False)
+        if waited:
+            with self._lock:
+                self._waiting += 1
+            lock.acquire()
+        wait_ms = (time.perf_counter() - started) * 1000 if waited else 0.0
+        with self._lock:
+            if waited:
+                self._waiting -= 1
+                self.contended += 1
+            self.acquisitions += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        try:
+            yield wait_ms
+        finally:
+            lock.release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._entries[session_id]
+
+    def stats(self) -> dict:
+        """Acquisition and wait-time counters since startup, plus current busy/waiting sessions."""
+        with self._lock:
+            return {
+                "busy_sessions": len(self._entries),
+                "waiting": self._waiting,
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_ms_total": round(self.wait_ms_total, 2),
+                "wait_ms_avg": round(self.wait_ms_total / self.acquisitions, 2) if self.acquisitions else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 2),
+            }
@@ -0,0 +1,533 @@
+"""
+SESSION STORE MODULE
+====================
+
+Where chat sessions are persisted. ChatService writes through a SessionStore and the
+vector store's chat loader reads through the same one, so the storage can change without
+either of them knowing. Which implementation is used is chosen by CHAT_STORE in config.py.
+
+BACKENDS:
+  json   - JsonSessionStore: one snapshot + journal pair per session in database/chats_data/
+           (see chat_journal.py). The default, and the format older installs already have.
+  sqlite - SqliteSessionStore: every session in one SQLite database (CHAT_DB_PATH) in WAL
+           mode, so readers (the vector store loader, history requests) never block the
+           flusher's writes. Startup reads one table instead of globbing and parsing tens
+           of thousands of files.
+
+SOURCE PATHS:
+  Each session is addressed by its source path, chats_data/chat_<safe_id>.json, in both
+  backends (for SQLite it is only a name; no file exists). The vector store keys its
+  manifest and shards by that path, so switching backends keeps those keys stable.
+  source_stamp() stands in for a file's (size, mtime_ns): it changes whenever the session does.
+
+SQLITE SCHEMA:
+  sessions(session_id PRIMARY KEY, source UNIQUE, message_count, updated_ns)
+  messages(session_id, seq, role, content, timestamp) PRIMARY KEY (session_id, seq)
+  A message's seq is its position in the session, so appending a turn inserts only the
+  new rows, and read_page() is a range scan on the primary key. Two session ids that
+  sanitize to the same name ("a-b" and "ab") get distinct sources: the later one has a
+  short hash of its id appended (chat_ab_<hash>), and keeps that source from then on.
+
+SQLITE DURABILITY:
+  Connections run with synchronous=NORMAL (OFF for CHAT_FSYNC=off): a commit is atomic but
+  not fsynced. append() / replace() called with fsync=True switch their connection to
+  synchronous=FULL for that one commit, so the WAL is fsynced before they return.
+
+MIGRATION:
+  The first time the SQLite store opens an empty database while chat_*.json files exist,
+  it imports them (migrate_from_json) in one pass; the files are left in place. To import
+  again by hand (sessions already in the database are skipped):
+    python -m app.services.session_store
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import CHAT_DB_PATH, CHAT_FSYNC, CHAT_JOURNAL_COMPACT_LINES, CHAT_STORE, CHATS_DATA_DIR
+from app.services.chat_journal import (
+    append_messages,
+    fsync_directory,
+    journal_path,
+    read_session,
+    write_snapshot,
+)
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+BACKENDS = ("json", "sqlite")
+
+# Sessions per transaction when importing JSON files into SQLite.
+MIGRATE_BATCH_SESSIONS = 500
+
+
+def create_session_store(backend: Optional[str] = None) -> "SessionStore":
+    """Return the session store for the given backend (default CHAT_STORE)."""
+    backend = (backend or CHAT_STORE).lower()
+    if backend not in BACKENDS:
+        logger.warning("Unknown CHAT_STORE %r; using json", backend)
+        backend = "json"
+    if backend == "sqlite":
+        store = SqliteSessionStore(CHAT_DB_PATH, synchronous="OFF" if CHAT_FSYNC == "off" else "NORMAL")
+        if store.is_empty() and any(CHATS_DATA_DIR.glob("chat_*.json")):
+            store.migrate_from_json(CHATS_DATA_DIR)
+        return store
+    return JsonSessionStore(CHATS_DATA_DIR)
+
+
+class SessionStore(ABC):
+    """
+    Interface of a session store. Messages are dicts (role, content, timestamp) in session
+    order; a session's source path identifies it to the vector store (see SOURCE PATHS).
+    """
+
+    name = "base"
+
+    def __init__(self, directory: Path):
+        """directory: folder the source paths live in (chats_data/)."""
+        self.directory = Path(directory)
+
+    def source_path(self, session_id: str) -> Path:
+        """chat_{safe_session_id}.json in the store's folder, where safe_session_id has dashes/spaces removed."""
+        # Sanitize ID for use in filename (no dashes or spaces).
+        safe_session_id = session_id.replace("-", "").replace(" ", "_")
+        return self.directory / f"chat_{safe_session_id}.json"
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[List[dict]]:
+        """All messages of a session, or None if the store has no such session."""
+
+    @abstractmethod
+    def read_page(self, session_id: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        """Messages offset .. offset + limit - 1 of a session ([] past the end or if unknown)."""
+
+    @abstractmethod
+    def append(self, session_id: str, first_seq: int, messages: List[dict], fsync: bool = False):
+        """Add messages at positions first_seq, first_seq + 1, ... (first_seq = messages already stored)."""
+
+    @abstractmethod
+    def replace(self, session_id: str, messages: List[dict], fsync: bool = False):
+        """Store messages as the whole session, dropping whatever was stored for it."""
+
+    def sync(self):
+        """Make the sessions written since the last call survive a power cut (CHAT_FSYNC=full)."""
+
+    @abstractmethod
+    def list_sources(self) -> List[Path]:
+        """Source path of every stored session, sorted."""
+
+    @abstractmethod
+    def source_stamp(self, source: Path) -> Optional[Tuple[int, int]]:
+        """(size, mtime_ns)-style change stamp of a session, or None if it does not exist."""
+
+    @abstractmethod
+    def read_source(self, source: Path) -> Tuple[Optional[str], List[dict]]:
+        """(session_id, messages) of the session at a source path; raises if it cannot be read."""
+
+    @abstractmethod
+    def source_sha256(self, source: Path) -> str:
+        """Hex sha256 that changes whenever the session's messages do."""
+
+    def iter_sessions(self) -> Iterator[Tuple[Path, Optional[str], List[dict]]]:
+        """Every stored session as (source path, session_id, messages), for bulk loading."""
+        for source in self.list_sources():
+            try:
+                session_id, messages = self.read_source(source)
+            except Exception as e:
+                logger.warning("Could not read chat session %s: %s", source, e)
+                continue
+            yield source, session_id, messages
+
+    def stats(self) -> dict:
+        """Backend name plus backend-specific counters."""
+        return {"backend": self.name}
+
+    def close(self):
+        """Release files and connections. Called on shutdown, after the last write."""
+
+
+# ==============================================================================
+# JSON FILES (SNAPSHOT + JOURNAL)
+# ==============================================================================
+
+class JsonSessionStore(SessionStore):
+    """Sessions as chat_<id>.json snapshots plus .jsonl journals (see chat_journal.py)."""
+
+    name = "json"
+
+    def __init__(self, directory: Path, compact_lines: int = CHAT_JOURNAL_COMPACT_LINES):
+        """compact_lines: fold the journal into a new snapshot once it holds this many lines."""
+        super().__init__(directory)
+        self.compact_lines = compact_lines
+        # Map: session_id -> lines in its journal since the last snapshot (compaction trigger).
+        self._journal_lines: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[List[dict]]:
+        """Snapshot messages followed by those appended to the journal since; None if there is no snapshot."""
+        path = self.source_path(session_id)
+        if not path.exists():
+            return None
+        _, messages, journaled = read_session(path)
+        with self._lock:
+            self._journal_lines[session_id] = journaled
+        return messages
+
+    def read_page(self, session_id: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        """One page of a session; the files have no index, so this reads the whole session."""
+        messages = self.load(session_id) or []
+        return messages[max(0, offset):max(0, offset) + max(0, limit)]
+
+    def append(self, session_id: str, first_seq: int, messages: List[dict], fsync: bool = False):
+        """Append to the journal; once it reaches compact_lines, rewrite the snapshot and drop the journal."""
+        path = self.source_path(session_id)
+        append_messages(path, first_seq, messages, fsync=fsync)
+        with self._lock:
+            lines = self._journal_lines.get(session_id, 0) + len(messages)
+            self._journal_lines[session_id] = lines
+        if lines >= self.compact_lines:
+            _, records, _ = read_session(path)
+            self.replace(session_id, records, fsync=fsync)
+
+    def replace(self, session_id: str, messages: List[dict], fsync: bool = False):
+        """Write a fresh snapshot (temp file + rename) and delete the journal."""
+        write_snapshot(self.source_path(session_id), session_id, messages, fsync=fsync)
+        with self._lock:
+            self._journal_lines[session_id] = 0
+
+    def sync(self):
+        """fsync chats_data/ so new and renamed snapshots are durable."""
+        fsync_directory(self.directory)
+
+    def list_sources(self) -> List[Path]:
+        """Every snapshot in the folder."""
+        return sorted(self.directory.glob("*.json"))
+
+    def source_stamp(self, source: Path) -> Optional[Tuple[int, int]]:
+        """Snapshot and journal together: sizes summed, latest mtime (appended turns count as a change)."""
+        try:
+            stat = Path(source).stat()
+        except FileNotFoundError:
+            return None
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        try:
+            journal_stat = journal_path(source).stat()
+            size += journal_stat.st_size
+            mtime_ns = max(mtime_ns, journal_stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return size, mtime_ns
+
+    def read_source(self, source: Path) -> Tuple[Optional[str], List[dict]]:
+        """Session id from the snapshot and all messages (snapshot + journal)."""
+        session_id, messages, _ = read_session(source)
+        return session_id, messages
+
+    def source_sha256(self, source: Path) -> str:
+        """One hash over the snapshot's and the journal's bytes, in 1 MB blocks."""
+        digest = hashlib.sha256()
+        for path in (Path(source), journal_path(source)):
+            try:
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(block)
+            except FileNotFoundError:
+                if path == Path(source):
+                    raise
+        return digest.hexdigest()
+
+
+# ==============================================================================
+# SQLITE (WAL)
+# ==============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id    TEXT PRIMARY KEY,
+    source        TEXT NOT NULL UNIQUE,
+    message_count INTEGER NOT NULL,
+    updated_ns    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    timestamp  TEXT,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _disambiguated(source: str, session_id: str) -> str:
+    """Source name for a session whose sanitized name is taken by another session id."""
+    return f"{source}_{hashlib.blake2b(session_id.encode('utf-8'), digest_size=4).hexdigest()}"
+
+
+def _message_row(session_id: str, seq: int, message: dict) -> tuple:
+    """messages-table row for one message dict."""
+    return (session_id, seq, message.get("role", ""), message.get("content", ""), message.get("timestamp"))
+
+
+def _row_message(role: str, content: str, timestamp: Optional[str]) -> dict:
+    """Message dict for one messages-table row (no timestamp key if it had none, like the JSON files)."""
+    message = {"role": role, "content": content}
+    if timestamp is not None:
+        message["timestamp"] = timestamp
+    return message
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Sessions in one SQLite database in WAL mode. Each thread gets its own connection, so
+    reads run alongside the flusher's write transactions instead of waiting for them.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: Path, directory: Path = CHATS_DATA_DIR, synchronous: str = "NORMAL"):
+        """
+        Open (or create) the database at db_path. synchronous is SQLite's PRAGMA synchronous
+        for every connection (NORMAL: commits are not fsynced, OFF: not even checkpoints);
+        writes made with fsync=True commit with FULL regardless.
+        """
+        super().__init__(directory)
+        self.db_path = Path(db_path)
+        self.synchronous = synchronous
+        self._local = threading.local()
+        # Every connection opened (one per thread), so close() can close them all.
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def source_path(self, session_id: str) -> Path:
+        """The source stored for the session; for a new one, the sanitized name unless another session has it."""
+        return self.directory / f"{self._source_name(self._conn(), session_id)}.json"
+
+    def _source_name(self, conn: sqlite3.Connection, session_id: str) -> str:
+        """Source (file stem) of a session: stored, sanitized, or sanitized plus an id hash on collision."""
+        row = conn.execute("SELECT source FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is not None:
+            return row[0]
+        source = super().source_path(session_id).stem
+        owner = conn.execute("SELECT session_id FROM sessions WHERE source = ?", (source,)).fetchone()
+        return source if owner is None else _disambiguated(source, session_id)
+
+    def _session_for(self, source: Path) -> Optional[Tuple[str, int, int]]:
+        """(session_id, message_count, updated_ns) of the session stored under a source path."""
+        return self._conn().execute(
+            "SELECT session_id, message_count, updated_ns FROM sessions WHERE source = ?", (Path(source).stem,)
+        ).fetchone()
+
+    def _upsert_session(self, conn: sqlite3.Connection, session_id: str, source: str, count: int):
+        """
+        Record a session's message count and bump its change stamp (inside the caller's
+        transaction). A new session whose source another session took meanwhile gets the
+        disambiguated source instead.
+        """
+        upsert = (
+            "INSERT INTO sessions (session_id, source, message_count, updated_ns) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET message_count = excluded.message_count, "
+            "updated_ns = excluded.updated_ns"
+        )
+        try:
+            conn.execute(upsert, (session_id, source, count, time.time_ns()))
+        except sqlite3.IntegrityError:
+            conn.execute(upsert, (session_id, _disambiguated(source, session_id), count, time.time_ns()))
+
+    def is_empty(self) -> bool:
+        """True if no session is stored yet."""
+        return self._conn().execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None
+
+    def load(self, session_id: str) -> Optional[List[dict]]:
+        """All messages of a session in seq order; None if it is not stored."""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is None:
+            return None
+        rows = conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        )
+        return [_row_message(*row) for row in rows]
+
+    def read_page(self, session_id: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        """Range scan on (session_id, seq): reads only the requested messages."""
+        rows = self._conn().execute(
+            "SELECT role, content, timestamp FROM messages WHERE session_id = ? AND seq >= ? "
+            "ORDER BY seq LIMIT ?",
+            (session_id, max(0, offset), max(0, limit)),
+        )
+        return [_row_message(*row) for row in rows]
+
+    @contextmanager
+    def _durable(self, conn: sqlite3.Connection, fsync: bool) -> Iterator[None]:
+        """With fsync, commit inside the with-block with synchronous=FULL, then restore the default."""
+        if not fsync or self.synchronous.upper() == "FULL":
+            yield
+            return
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            yield
+        finally:
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+
+    def append(self, session_id: str, first_seq: int, messages: List[dict], fsync: bool = False):
+        """Insert the new rows and update the session in one transaction; fsync makes it durable on return."""
+        conn = self._conn()
+        with self._durable(conn, fsync), conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO messages (session_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [_message_row(session_id, first_seq + i, message) for i, message in enumerate(messages)],
+            )
+            self._upsert_session(conn, session_id, self._source_name(conn, session_id), first_seq + len(messages))
+
+    def replace(self, session_id: str, messages: List[dict], fsync: bool = False):
+        """Delete the session's rows and insert messages, in one transaction; fsync as for append()."""
+        conn = self._conn()
+        with self._durable(conn, fsync), conn:
+            self._replace(conn, session_id, self._source_name(conn, session_id), messages, commit=False)
+
+    def _replace(self, conn: sqlite3.Connection, session_id: str, source: str, messages: List[dict], commit: bool = True):
+        """replace() with an explicit source name; commit=False leaves the transaction open (migration batches)."""
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.executemany(
+            "INSERT INTO messages (session_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [_message_row(session_id, seq, message) for seq, message in enumerate(messages)],
+        )
+        self._upsert_session(conn, session_id, source, len(messages))
+        if commit:
+            conn.commit()
+
+    def list_sources(self) -> List[Path]:
+        """Source path of every session in the sessions table."""
+        rows = self._conn().execute("SELECT source FROM sessions ORDER BY source")
+        return [self.directory / f"{source}.json" for (source,) in rows]
+
+    def source_stamp(self, source: Path) -> Optional[Tuple[int, int]]:
+        """(message_count, updated_ns) of the session; updated_ns changes on every write."""
+        row = self._session_for(source)
+        return (row[1], row[2]) if row else None
+
+    def read_source(self, source: Path) -> Tuple[Optional[str], List[dict]]:
+        """Session id and messages of the session stored under this source path."""
+        row = self._session_for(source)
+        if row is None:
+            raise FileNotFoundError(f"No chat session stored as {Path(source).stem}")
+        return row[0], self.load(row[0]) or []
+
+    def source_sha256(self, source: Path) -> str:
+        """Hash of the session's messages as JSON."""
+        _, messages = self.read_source(source)
+        return hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def iter_sessions(self) -> Iterator[Tuple[Path, Optional[str], List[dict]]]:
+        """
+        Every session from one query over both tables, streamed in primary-key order and grouped
+        per session, instead of one lookup per session.
+        """
+        # Own connection: the caller may write through this thread's connection while iterating.
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            rows = conn.execute(
+                "SELECT m.session_id, s.source, m.role, m.content, m.timestamp "
+                "FROM messages m JOIN sessions s ON s.session_id = m.session_id "
+                "ORDER BY m.session_id, m.seq"
+            )
+            for (session_id, source), group in groupby(rows, key=lambda row: (row[0], row[1])):
+                messages = [_row_message(role, content, timestamp) for _, _, role, content, timestamp in group]
+                yield self.directory / f"{source}.json", session_id, messages
+        finally:
+            conn.close()
+
+    def migrate_from_json(self, directory: Path = CHATS_DATA_DIR) -> int:
+        """
+        Import every chat_*.json session (snapshot + journal) from directory; sessions already
+        in the database are skipped, unreadable files are logged and skipped. The files are
+        left in place. Returns the number of sessions imported.
+        """
+        started = time.perf_counter()
+        conn = self._conn()
+        existing = {row[0] for row in conn.execute("SELECT source FROM sessions")}
+        imported = 0
+        try:
+            for path in sorted(Path(directory).glob("chat_*.json")):
+                if path.stem in existing:
+                    continue
+                try:
+                    session_id, messages, _ = read_session(path)
+                except Exception as e:
+                    logger.warning("Skipping unreadable chat file %s: %s", path, e)
+                    continue
+                self._replace(conn, session_id or path.stem, path.stem, messages, commit=False)
+                imported += 1
+                if imported % MIGRATE_BATCH_SESSIONS == 0:
+                    conn.commit()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if imported:
+            logger.info(
+                "Imported %d chat session(s) from %s into %s in %.1fs (the JSON files can be removed)",
+                imported,
+                directory,
+                self.db_path,
+                time.perf_counter() - started,
+            )
+        return imported
+
+    def stats(self) -> dict:
+        """Session and message counts and the database file sizes."""
+        conn = self._conn()
+        sessions, messages = conn.execute("SELECT COUNT(*), COALESCE(SUM(message_count), 0) FROM sessions").fetchone()
+        wal_path = self.db_path.with_name(self.db_path.name + "-wal")
+        return {
+            "backend": self.name,
+            "sessions": sessions,
+            "messages": messages,
+            "db_bytes": self.db_path.stat().st_size if self.db_path.exists() else 0,
+            "wal_bytes": wal_path.stat().st_size if wal_path.exists() else 0,
+        }
+
+    def close(self):
+        """Checkpoint the WAL into the database file and close every connection."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            conn.close()
+        self._local = threading.local()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = SqliteSessionStore(CHAT_DB_PATH)
+    count = store.migrate_from_json(CHATS_DATA_DIR)
+    print(f"Imported {count} chat session(s) into {CHAT_DB_PATH}")
+    store.close()
@@ -3,140 +3,1871 @@ VECTOR STORE SERVICE MODULE
 ===========================
 
 This service builds and queries the FAISS vector index used for context retrieval.
-Learning data (database/learning_data/*.txt) and past chats (database/chats_data/*.json)
-are loaded at startup, split into chunks, embedded with HuggingFace, and stored in FAISS.
-When the user asks a question we embed it and retrieve the k most similar chunks; only
-those chunks are sent to the LLM, so token usage is bounded.
+Learning data (database/learning_data/*.txt) and past chats (from the session store, see
+session_store.py) are split into chunks (chats one exchange per chunk), embedded locally
+and stored in FAISS shards: "learning" and "chats" (or one chat shard per period with
+CHAT_SHARD_PERIOD). When the user asks a question we embed it and retrieve the k most
+similar chunks across the shards; only those chunks are sent to the LLM, so token usage
+is bounded.
 
 LIFECYCLE:
-  - create_vector_store(): Load all .txt and .json, chunk, embed, build FAISS, save to disk.
-    Called once at startup. Restart the server after adding new .txt files so they are included.
-  - get_retriever(k): Return a retriever that fetches k nearest chunks for a query string.
-  - save_vector_store(): Write the current FAISS index to database/vector_store/ (called after create).
+  - start_background_build() / load_or_create_vector_store(): Called once at startup. Each
+    shard reuses its saved index under database/vector_store/<shard>/ and re-embeds only the
+    sources its manifest.json says changed; is_ready() / build_progress() report the build.
+  - schedule_source_update(path): Re-index one learning file or chat session in the
+    background, so edits and new conversations are retrievable without a restart.
+  - search(query, k, ...): The k best chunks with similarity scores and timings; optional
+    hybrid BM25, reranking, MMR, recency decay and context trimming (see search()).
+  - stats(): Per-shard index counters and cache statistics (exposed on GET /stats).
+  - close(): Finish pending background updates and save the shards that changed (shutdown).
 
-Embeddings run locally (sentence-transformers); no extra API key. Groq and Realtime services
-call get_retriever() for every request to get context.
+Scores are cosine similarities: embeddings are L2-normalised, so similarity = 1 - d / 2 for
+the squared L2 distance d FAISS returns. README.md ("Vector Store") describes the manifest,
+deduplication, index types, quantization and the other retrieval options in more detail.
 """
 
+import hashlib
 import json
 import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+import faiss
 
 from config import (
+    BASE_DIR,
     LEARNING_DATA_DIR,
     CHATS_DATA_DIR,
     VECTOR_STORE_DIR,
+    LEARNING_INDEX_TYPE,
+    CHAT_SHARD_PERIOD,
     EMBEDDING_MODEL,
+    EMBEDDING_CACHE_DIR,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_WORKERS,
+    EMBEDDING_TORCH_THREADS,
+    EMBEDDING_POOL_MIN_CHUNKS,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUANTIZED_RERANK_FACTOR,
+    HYBRID_SEARCH,
+    HYBRID_FETCH_FACTOR,
+    RETRIEVAL_MMR,
+    MMR_FETCH_K,
+    MMR_LAMBDA,
+    RERANKER,
+    RECENCY_WEIGHT,
+    RECENCY_HALF_LIFE_DAYS,
+    CHAT_MAX_AGE_DAYS,
+    RRF_K,
+    BM25_K1,
+    BM25_B,
+    DEDUP_CHUNKS,
+    DEDUP_MAX_DISTANCE,
+)
+from app.services.bm25_index import BM25Index
+from app.services.dedup import SimHashIndex, simhash
+from app.services.embedding_backends import create_embeddings, embedding_variant
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingLRU
+from app.services.embedding_pipeline import EmbeddingPipeline
+from app.services.reranker import CrossEncoderReranker, rerank_probability
+from app.services.session_store import SessionStore, create_session_store
+from app.utils.startup_timeline import startup_timeline
+from app.services.faiss_index import (
+    INDEX_TYPES,
+    apply_search_params,
+    build_index,
+    estimate_index_bytes,
+    index_quantization,
+    index_type,
+    new_index,
+    reconstruct_all,
+    resolve_index_type,
+    resolve_quantization,
+    search_parameters,
+    supports_remove,
+    supports_selector,
 )
 
 
 logger = logging.getLogger("J.A.R.V.I.S")
 
+# Manifest that describes what a shard's saved index in VECTOR_STORE_DIR/<shard>/ was built from.
+# Bump MANIFEST_VERSION whenever its layout changes so old manifests force a full rebuild.
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 3
+
+# Shard names (each is a folder under VECTOR_STORE_DIR). With CHAT_SHARD_PERIOD set to a key
+# of CHAT_SHARD_PERIODS, chats go to one "chats-<period>" shard per strftime period instead.
+LEARNING_SHARD = "learning"
+CHATS_SHARD = "chats"
+CHAT_SHARD_PERIODS = {"year": "%Y", "month": "%Y-%m"}
+# Chat sources whose shard period is remembered (least recently used are forgotten).
+PERIOD_CACHE_SIZE = 65536
+
+# Rebuild HNSW/IVF indexes once this fraction of their vectors are tombstones (deleted chunks).
+TOMBSTONE_REBUILD_RATIO = 0.2
+
 
 # ==============================================================================
-# VECTOR STORE SERVICE CLASS
+# SEARCH RESULTS
 # ==============================================================================
 
-class VectorStoreService:
+@dataclass
+class RetrievedChunk:
     """
-    Builds a FAISS index from learning_data .txt files and chats_data .json files,
-    and provides a retriever to fetch the k most relevant chunks for a query.
+    One search hit: the chunk plus its cosine similarity to the query (higher is closer).
+    In hybrid mode also its BM25 score (None if BM25 did not return it) and the RRF score;
+    with the reranker on, the cross-encoder score (None if it was not scored). With recency
+    decay on, chat chunks carry the multiplier their ranking score got (see recency_factor()).
     """
+    document: Document
+    score: float
+    bm25_score: Optional[float] = None
+    fused_score: Optional[float] = None
+    rerank_score: Optional[float] = None
+    recency: Optional[float] = None
 
-    def __init__(self):
-        """Create the embedding model (local) and text splitter; vector_store is set in create_vector_store()."""
-        # Embeddings run locally (no API key); used to convert text into vectors for similarity search.
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL,
-            model_kwargs={"device": "cpu"},
-        )
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-        )
+
+@dataclass
+class SearchResult:
+    """
+    Hits of one search(), best first, with time spent embedding the query, searching FAISS
+    (search_ms, includes fusion and reranking), searching BM25 (sparse_ms, runs in parallel
+    with FAISS) and in the cross-encoder (rerank_ms). trimmed counts hits dropped by the
+    min_score / score_gap / max_chars cutoffs.
+    """
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    embed_ms: float = 0.0
+    search_ms: float = 0.0
+    sparse_ms: float = 0.0
+    rerank_ms: float = 0.0
+    trimmed: int = 0
+
+    @property
+    def documents(self) -> List[Document]:
+        """The hit chunks without scores, best first."""
+        return [chunk.document for chunk in self.chunks]
+
+
+def _distance_to_similarity(distance: float) -> float:
+    """Squared L2 distance between unit vectors -> cosine similarity (1 - d/2)."""
+    return 1.0 - float(distance) / 2.0
+
+
+def recency_factor(age_seconds: float, weight: float, half_life_days: float) -> float:
+    """
+    Ranking multiplier for a chunk of this age: (1 - weight) + weight * 0.5 ** (age / half-life).
+    1.0 for a brand-new chunk, falling towards 1 - weight as it gets older. search() scales
+    chat chunks' ranking scores (similarity, fused or cross-encoder score) by it, so between
+    two equally similar exchanges the newer wins; learning data has no timestamp and never
+    ages. RetrievedChunk.score stays the plain similarity, so the trimming cutoffs ignore it.
+    """
+    if weight <= 0 or half_life_days <= 0:
+        return 1.0
+    decay = 0.5 ** (max(0.0, age_seconds) / (half_life_days * 86400.0))
+    return (1.0 - weight) + weight * decay
+
+
+def _decayed(value: float, chunk: RetrievedChunk) -> float:
+    """A ranking score of chunk with its recency multiplier applied (unchanged if it has none)."""
+    return value if chunk.recency is None else value * chunk.recency
+
+
+def maximal_marginal_relevance(
+    relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float
+) -> List[int]:
+    """
+    Greedy MMR over candidates: relevance[i] is candidate i's similarity to the query and
+    vectors its unit vector (rows). Returns the indices of up to k picks, in pick order.
+    """
+    count = len(relevance)
+    if count == 0 or k <= 0:
+        return []
+    similarity = vectors @ vectors.T
+    picked = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to anything picked so far.
+    redundancy = similarity[picked[0]].copy()
+    while len(picked) < min(k, count):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def _trim_chunks(
+    chunks: List[RetrievedChunk],
+    min_score: Optional[float],
+    score_gap: Optional[float],
+    max_chars: Optional[int],
+) -> List[RetrievedChunk]:
+    """
+    Apply the context cutoffs to ranked hits (None or <= 0 disables one); keeps rank order.
+    min_score drops hits below that similarity, score_gap those more than that below the best
+    hit, and max_chars keeps hits while their text fits (a smaller one after a skipped one may
+    still fit).
+    """
+    if min_score and min_score > 0:
+        chunks = [chunk for chunk in chunks if chunk.score >= min_score]
+    if score_gap and score_gap > 0 and chunks:
+        best = max(chunk.score for chunk in chunks)
+        chunks = [chunk for chunk in chunks if chunk.score >= best - score_gap]
+    if max_chars and max_chars > 0:
+        kept, used = [], 0
+        for chunk in chunks:
+            size = len(chunk.document.page_content)
+            if used + size <= max_chars:
+                kept.append(chunk)
+                used += size
+        chunks = kept
+    return chunks
+
+
+def _chat_turns(messages: List[dict]) -> List[List[dict]]:
+    """Group chat messages into exchanges: each user message starts one, replies join it."""
+    turns: List[List[dict]] = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _message_time(message: dict) -> Optional[float]:
+    """Epoch seconds of a message's ISO 8601 timestamp, or None if it has none (or it does not parse)."""
+    try:
+        return datetime.fromisoformat(message["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _manifest_key(file_path: Path) -> str:
+    """Manifest key for a source file: its path relative to the project root, with forward slashes."""
+    return Path(file_path).resolve().relative_to(BASE_DIR.resolve()).as_posix()
+
+
+def _file_sha256(file_path: Path) -> str:
+    """Return the hex sha256 of a file's bytes (read in 1 MB blocks so big files stay cheap on memory)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ==============================================================================
+# VECTOR SHARD CLASS
+# ==============================================================================
+
+class VectorShard:
+    """
+    One FAISS index (with its BM25 index, near-duplicate fingerprints and manifest) over the
+    source files it owns, saved in its own folder and updated by its own worker thread.
+    The embedding model and caches are shared and come from the owning VectorStoreService.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        service: "VectorStoreService",
+        owns: Callable[[Path], bool],
+        index_kind: Optional[str] = None,
+    ):
+        """
+        Set up an empty shard; cheap. owns(path) says whether a source file belongs here;
+        index_kind overrides VECTOR_INDEX_TYPE for this shard. vector_store is set by
+        create_vector_store() / load_or_create_vector_store().
+        """
+        self.name = name
+        self.service = service
+        self.owns = owns
+        self.index_kind = index_kind
+        # Index, pickled docstore and manifest of this shard: database/vector_store/<name>/.
+        self.store_dir = VECTOR_STORE_DIR / name
         self.vector_store: Optional[FAISS] = None
+        # Manifest key (file path relative to BASE_DIR) -> fingerprint + docstore ids of its chunks.
+        # Kept in sync with the index so save_vector_store() can write an accurate manifest.
+        self._sources: Dict[str, dict] = {}
+        # Docstore ids of the "No data available yet." placeholder; dropped on the first real add.
+        self._placeholder_ids: List[str] = []
+        # Guards vector_store and _sources: held for index mutations, searches and saves.
+        self._lock = threading.RLock()
+        # One worker per shard, so live updates are applied in the order they were scheduled and
+        # a long rebuild of one shard never delays updates to another.
+        self._update_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"vector-store-{name}")
+        # Manifest keys with an update already queued; a second save before it runs is coalesced.
+        self._pending_updates: Set[str] = set()
+        # True when the live index has changes that are not yet written to disk.
+        self._dirty = False
+        # Vectors still in an HNSW/IVF index whose chunk was deleted (search skips them).
+        self._tombstones = 0
+        # Chunk timestamp per index position, for the age cutoff; None until needed after a change.
+        # _live (position holds a searchable chunk) and _dead_selector (IDSelector excluding the
+        # others, kept with the id batch it wraps) are rebuilt together with it.
+        self._times: Optional[np.ndarray] = None
+        self._live: Optional[np.ndarray] = None
+        self._dead_selector: Optional[Tuple[Any, ...]] = None
+        # Sparse (BM25) index over the same chunks as vector_store; swapped together with it.
+        self.bm25 = BM25Index(BM25_K1, BM25_B)
+        # SimHash fingerprints of the indexed chunks, for near-duplicate detection on add.
+        self.dedup = self._new_dedup()
+        # Set once the startup build (load_or_create_vector_store) has finished; searched only after.
+        self._ready = threading.Event()
+        # Startup build progress for /health: phase plus chunks embedded out of chunks to embed.
+        self._progress = {"phase": "pending", "chunks_done": 0, "chunks_total": 0, "error": None}
+
+    # ------------------------------------------------------------------------------
+    # SHARED RESOURCES (OWNED BY THE SERVICE)
+    # ------------------------------------------------------------------------------
+
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        """The service's embedding model (loaded on first use)."""
+        return self.service.embeddings
+
+    @property
+    def embedding_pipeline(self) -> EmbeddingPipeline:
+        """The service's batched embedding pipeline."""
+        return self.service.embedding_pipeline
+
+    @property
+    def embedding_cache(self) -> EmbeddingCache:
+        """The service's on-disk chunk embedding cache."""
+        return self.service.embedding_cache
+
+    @property
+    def text_splitter(self) -> RecursiveCharacterTextSplitter:
+        """The service's chunker (same CHUNK_SIZE / CHUNK_OVERLAP for every shard)."""
+        return self.service.text_splitter
 
     # ------------------------------------------------------------------------------
     # LOAD DOCUMENTS FROM DISK
     # ------------------------------------------------------------------------------
 
+    def _load_learning_file(self, file_path: Path) -> List[Document]:
+        """Read one learning .txt file; return [Document] (content + source name) or [] if empty/unreadable."""
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                return [Document(page_content=content, metadata={"source": str(file_path.name)})]
+        except Exception as e:
+            logger.warning("Could not load learning data file %s: %s", file_path, e)
+        return []
+
+    def _load_chat_file(self, file_path: Path, session: Optional[Tuple[Optional[str], List[dict]]] = None) -> List[Document]:
+        """
+        Read one chat session from the session store (or use session, its (session_id, messages)
+        already read in bulk); return one Document per exchange (User:/Assistant: lines, with
+        session_id, turn and timestamp metadata), or [] if empty/unreadable.
+        """
+        try:
+            store = self.service.session_store
+            session_id, records = session if session is not None else store.read_source(file_path)
+            session_id = session_id or file_path.stem
+            file_time: Optional[float] = None
+            documents = []
+            for turn, messages in enumerate(_chat_turns(records)):
+                # Format as "User: ..." / "Assistant: ..." so the retriever can match past conversations.
+                content = "\n".join([
+                    f"User: {msg.get('content', '')}" if msg.get('role') == 'user'
+                    else f"Assistant: {msg.get('content', '')}"
+                    for msg in messages
+                ])
+                if not content.strip():
+                    continue
+                times = [t for t in map(_message_time, messages) if t is not None]
+                if not times and file_time is None:
+                    stamp = store.source_stamp(file_path)
+                    file_time = stamp[1] / 1e9 if stamp else time.time()
+                documents.append(Document(page_content=content, metadata={
+                    "source": f"chat_{file_path.stem}",
+                    "session_id": session_id,
+                    "turn": turn,
+                    "timestamp": max(times) if times else file_time,
+                }))
+            return documents
+        except Exception as e:
+            logger.warning("Could not load chat history file %s: %s", file_path, e)
+        return []
+
     def load_learning_data(self) -> List[Document]:
         """Read all .txt files in database/learning_data/ and return one Document per file (content + source name)."""
         documents = []
         for file_path in list(LEARNING_DATA_DIR.glob("*.txt")):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    if content:
-                        documents.append(Document(page_content=content, metadata={"source": str(file_path.name)}))
-            except Exception as e:
-                logger.warning("Could not load learning data file %s: %s", file_path, e)
+            documents.extend(self._load_learning_file(file_path))
         return documents
 
     def load_chat_history(self) -> List[Document]:
-        """Load all .json files in database/chats_data/; turn each into one Document (User:/Assistant: lines)."""
+        """Load every chat session in the session store (one bulk pass); one Document per exchange."""
         documents = []
-        for file_path in list(CHATS_DATA_DIR.glob("*.json")):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    chat_data = json.load(f)
-                messages = chat_data.get("messages", [])
-                # Format as "User: ..." / "Assistant: ..." so the retriever can match past conversations.
-                chat_content = "\n".join([
-                    f"User: {msg.get('content', '')}" if msg.get('role') == 'user'
-                    else f"Assistant: {msg.get('content', '')}"
-                    for msg in messages
-                ])
-                if chat_content.strip():
-                    documents.append(Document(page_content=chat_content, metadata={"source": f"chat_{file_path.stem}"}))
-            except Exception as e:
-                logger.warning("Could not load chat history file %s: %s", file_path, e)
+        for file_path, session_id, messages in self.service.session_store.iter_sessions():
+            documents.extend(self._load_chat_file(file_path, (session_id, messages)))
         return documents
 
     # ------------------------------------------------------------------------------
-    # BUILD AND SAVE FAISS INDEX
+    # SOURCE FILES AND MANIFEST
     # ------------------------------------------------------------------------------
 
+    def _source_key(self, file_path: Path) -> str:
+        """Manifest key for a source file: its path relative to the project root, with forward slashes."""
+        return _manifest_key(file_path)
+
+    def _scan_sources(self) -> Dict[str, Path]:
+        """
+        Return every indexable source this shard owns as manifest key (path relative to BASE_DIR)
+        -> absolute path: learning .txt files and the session store's chat source paths.
+        """
+        files = sorted(LEARNING_DATA_DIR.glob("*.txt")) + self.service.session_store.list_sources()
+        return {self._source_key(file_path): file_path for file_path in files if self.owns(file_path)}
+
+    def _source_exists(self, file_path: Path) -> bool:
+        """True if the learning file exists, or the session store has the chat."""
+        if self.service._is_chat_file(file_path):
+            return self.service.session_store.source_stamp(file_path) is not None
+        return file_path.exists()
+
+    def _load_source(self, file_path: Path, session: Optional[Tuple[Optional[str], List[dict]]] = None) -> List[Document]:
+        """Load one source with the loader that matches its folder (learning .txt or chat session)."""
+        if file_path.parent == LEARNING_DATA_DIR:
+            return self._load_learning_file(file_path)
+        return self._load_chat_file(file_path, session)
+
+    def _source_name(self, key: str) -> str:
+        """The metadata["source"] the loaders give chunks of a manifest key (file name, or chat_<stem>)."""
+        file_path = BASE_DIR / key
+        if file_path.parent.resolve() == LEARNING_DATA_DIR.resolve():
+            return file_path.name
+        return f"chat_{file_path.stem}"
+
+    def _fingerprint(self, file_path: Path, previous: Optional[dict] = None) -> dict:
+        """
+        Return {size, mtime_ns, sha256} for a source. For a chat, size and mtime_ns are the
+        session store's change stamp and the hash is over the whole session (snapshot plus
+        journal for JSON), so appended turns count as a change. If size and mtime match the
+        previous fingerprint we reuse its hash instead of reading the source again. Raises
+        FileNotFoundError for a chat the store does not have.
+        """
+        store = self.service.session_store
+        chat = self.service._is_chat_file(file_path)
+        if chat:
+            stamp = store.source_stamp(file_path)
+            if stamp is None:
+                raise FileNotFoundError(f"No chat session {file_path.name}")
+            size, mtime_ns = stamp
+        else:
+            stat = file_path.stat()
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        if previous and previous.get("size") == size and previous.get("mtime_ns") == mtime_ns:
+            sha256 = previous.get("sha256")
+        else:
+            sha256 = store.source_sha256(file_path) if chat else _file_sha256(file_path)
+        return {"size": size, "mtime_ns": mtime_ns, "sha256": sha256}
+
+    def _index_settings(self) -> dict:
+        """Settings that change the vectors or chunks; if any differs from the manifest we rebuild everything."""
+        return {
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_variant": self.service.embedding_variant,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "dedup_max_distance": DEDUP_MAX_DISTANCE if DEDUP_CHUNKS else None,
+            "dedup_scope": "learning_data",
+        }
+
+    def _read_manifest(self) -> Optional[dict]:
+        """Return the saved manifest, or None if missing, unreadable, or from another manifest version."""
+        manifest_path = self.store_dir / MANIFEST_FILENAME
+        if not manifest_path.exists():
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.warning("Could not read vector store manifest %s: %s", manifest_path, e)
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def _write_manifest(self):
+        """Write the manifest next to the index (temp file + rename so a crash never leaves half a manifest)."""
+        with self._lock:
+            manifest = {
+                "version": MANIFEST_VERSION,
+                **self._index_settings(),
+                # Informational: the type is also stored in the .faiss file itself.
+                "index_type": index_type(self.vector_store.index) if self.vector_store else None,
+                "sources": dict(self._sources),
+            }
+        manifest_path = self.store_dir / MANIFEST_FILENAME
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    # ------------------------------------------------------------------------------
+    # BUILD, LOAD AND SAVE FAISS INDEX
+    # ------------------------------------------------------------------------------
+
+    def _chunk_source(self, file_path: Path, session: Optional[Tuple[Optional[str], List[dict]]] = None) -> List[Document]:
+        """
+        Load and split one source (session: a chat's (session_id, messages) if already read);
+        each chunk gets a fresh docstore id so it can be removed later.
+        """
+        with startup_timeline.phase("document_load"):
+            documents = self._load_source(file_path, session)
+        with startup_timeline.phase("chunking"):
+            chunks = self.text_splitter.split_documents(documents)
+        for chunk in chunks:
+            chunk.id = str(uuid.uuid4())
+        return chunks
+
+    def _new_entry(self, fingerprint: dict, chunks: List[Document]) -> dict:
+        """Manifest entry for a freshly chunked source; chat files also record their indexed turns."""
+        entry = {**fingerprint, "ids": [], "merged": []}
+        turns = [chunk.metadata["turn"] for chunk in chunks if "turn" in chunk.metadata]
+        if turns:
+            entry["turns"] = max(turns) + 1
+            entry["turns_sha256"] = self._turns_digest(chunks, entry["turns"])
+        return entry
+
+    def _turns_digest(self, chunks: List[Document], count: int) -> str:
+        """Hash of the chunks of a chat's first `count` exchanges, in order."""
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            if chunk.metadata.get("turn", count) < count:
+                digest.update(chunk.page_content.encode("utf-8"))
+                digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _appended_turns(self, previous: Optional[dict], chunks: List[Document]) -> Optional[List[Document]]:
+        """
+        If a chat's indexed exchanges are unchanged at the start of `chunks`, return the chunks
+        of the exchanges after them (the ones to add); otherwise None (re-index the whole file).
+        """
+        count = (previous or {}).get("turns")
+        if not count or not chunks:
+            return None
+        if self._turns_digest(chunks, count) != previous.get("turns_sha256"):
+            return None
+        return [chunk for chunk in chunks if chunk.metadata.get("turn", -1) >= count]
+
+    def _iter_embedded(self, chunks: List[Document]) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+        """
+        Yield (chunks, vectors) groups covering every chunk: first all embedding-cache hits
+        in one group, then each pipeline batch of misses as soon as it is embedded (and cached).
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        cached = self.embedding_cache.get_many(texts)
+        hits = [i for i, vector in enumerate(cached) if vector is not None]
+        if hits:
+            yield [chunks[i] for i in hits], [cached[i] for i in hits]
+        misses = [i for i, vector in enumerate(cached) if vector is None]
+        miss_texts = [texts[i] for i in misses]
+        for offset, vectors in self.embedding_pipeline.embed(miss_texts):
+            batch_texts = miss_texts[offset:offset + len(vectors)]
+            self.embedding_cache.put_many(batch_texts, vectors)
+            yield [chunks[i] for i in misses[offset:offset + len(vectors)]], vectors
+
+    def _new_store(self, dim: int) -> FAISS:
+        """Empty FAISS store (exact L2 index) that vectors can be added to batch by batch."""
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=new_index("flat", dim),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+
+    def _delete_ids(self, ids: List[str]):
+        """
+        Remove chunks from the live store (call with the lock held). Flat indexes delete in
+        place; HNSW/IVF keep the vector as a tombstone and only drop the docstore entry.
+        """
+        if not ids:
+            return
+        self._times = None
+        self.bm25.remove(ids)
+        self.dedup.remove(ids)
+        if supports_remove(self.vector_store.index):
+            self.vector_store.delete(ids)
+        else:
+            self.vector_store.docstore.delete(ids)
+            self._tombstones += len(ids)
+
+    def _new_dedup(self) -> SimHashIndex:
+        """Empty near-duplicate index with the configured distance (matching disabled if DEDUP_CHUNKS is off)."""
+        return SimHashIndex(DEDUP_MAX_DISTANCE if DEDUP_CHUNKS else -1)
+
+    def _dedup_chunks(
+        self,
+        key: str,
+        chunks: List[Document],
+        sources: Dict[str, dict],
+        dedup: SimHashIndex,
+        pending: Dict[str, Document],
+    ) -> List[Document]:
+        """
+        Return the chunks of source `key` that are not near-duplicates of an indexed chunk or
+        of one in `pending` (kept but not yet added). For each duplicate, `key` is added to
+        the kept chunk's provenance and its id to sources[key]["merged"]. Kept chunks are
+        fingerprinted into dedup and pending, and are appended to sources[key]["ids"].
+        Only learning data is deduplicated: a chat exchange keeps its own session_id and
+        timestamp (recency decay and the age cutoff depend on them), so chat chunks are all
+        kept and never fingerprinted.
+        """
+        entry = sources[key]
+        if self.service._is_chat_file(BASE_DIR / key):
+            for chunk in chunks:
+                chunk.metadata["provenance"] = [key]
+            entry["ids"].extend(chunk.id for chunk in chunks)
+            return list(chunks)
+        kept: List[Document] = []
+        for chunk in chunks:
+            fingerprint = simhash(chunk.page_content)
+            match = dedup.find(fingerprint)
+            canonical = pending.get(match) if match else None
+            if canonical is None and match and self.vector_store is not None:
+                canonical = self.vector_store.docstore.search(match)
+            if isinstance(canonical, Document):
+                provenance = canonical.metadata.setdefault("provenance", [])
+                if key not in provenance:
+                    provenance.append(key)
+                entry["merged"].append(match)
+                continue
+            chunk.metadata["provenance"] = [key]
+            dedup.add(chunk.id, fingerprint)
+            pending[chunk.id] = chunk
+            kept.append(chunk)
+        entry["ids"].extend(chunk.id for chunk in kept)
+        return kept
+
+    def _remove_source(self, key: str) -> List[str]:
+        """
+        Drop one source from the live index (call with the lock held). Its key leaves the
+        provenance of chunks it was merged into; each chunk it owns is handed to another
+        source that merged into it, and only chunks with no such source are deleted.
+        Returns the deleted ids.
+        """
+        entry = self._sources.pop(key, None)
+        if entry is None:
+            return []
+        docstore = self.vector_store.docstore
+        for doc_id in set(entry.get("merged", [])):
+            document = docstore.search(doc_id)
+            if isinstance(document, Document) and key in document.metadata.get("provenance", []):
+                document.metadata["provenance"].remove(key)
+        stale_ids: List[str] = []
+        for doc_id in entry.get("ids", []):
+            document = docstore.search(doc_id)
+            heirs = []
+            if isinstance(document, Document):
+                heirs = [
+                    other for other in document.metadata.get("provenance", [])
+                    if other != key and doc_id in self._sources.get(other, {}).get("merged", [])
+                ]
+            if not heirs:
+                stale_ids.append(doc_id)
+                continue
+            heir = self._sources[heirs[0]]
+            heir["merged"].remove(doc_id)
+            heir["ids"].append(doc_id)
+            document.metadata["provenance"] = heirs
+            document.metadata["source"] = self._source_name(heirs[0])
+        self._delete_ids(stale_ids)
+        return stale_ids
+
+    def _count_tombstones(self, store: FAISS) -> int:
+        """Number of index positions whose chunk is no longer in the docstore (after a load)."""
+        live = getattr(store.docstore, "_dict", {})
+        return sum(1 for doc_id in store.index_to_docstore_id.values() if doc_id not in live)
+
+    def _exact_vectors(self, texts: List[str], index: faiss.Index, positions: List[int]) -> np.ndarray:
+        """
+        Float32 vectors for chunks: from the embedding cache where present (exact), else
+        reconstructed from the index (exact for float32 indexes, approximate when quantized).
+        """
+        cached = self.embedding_cache.get_many(texts, record_stats=False)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            reconstructed = reconstruct_all(index)
+            for i in missing:
+                cached[i] = reconstructed[positions[i]]
+        if not cached:
+            return np.zeros((0, index.d), dtype=np.float32)
+        return np.asarray(cached, dtype=np.float32)
+
+    def _maybe_rebuild_index(self, exact_type: bool = False):
+        """
+        Rebuild the index without tombstones and/or as a different type when needed.
+
+        Needed when tombstones exceed TOMBSTONE_REBUILD_RATIO, or the corpus size calls for
+        another index type or quantization. With exact_type=False (live updates) we only move
+        up (flat -> hnsw -> ivf, float32 -> quantized) so a few deletions around a threshold
+        never cause back-and-forth rebuilds; startup passes exact_type=True. The new index is
+        built outside the lock; this relies on live updates being applied by a single
+        worker, so nothing else mutates the store meanwhile.
+        """
+        with self._lock:
+            store = self.vector_store
+            if store is None:
+                return
+            current = index_type(store.index)
+            current_quantization = index_quantization(store.index)
+            live = len(store.index_to_docstore_id) - self._tombstones
+            wanted = resolve_index_type(live, self.index_kind)
+            wanted_quantization = resolve_quantization(live)
+            if not exact_type:
+                if INDEX_TYPES.index(wanted) < INDEX_TYPES.index(current):
+                    wanted = current
+                if wanted_quantization == "none":
+                    wanted_quantization = current_quantization
+            too_many_tombstones = self._tombstones > TOMBSTONE_REBUILD_RATIO * max(1, store.index.ntotal)
+            if wanted == current and wanted_quantization == current_quantization and not too_many_tombstones:
+                return
+            docs = getattr(store.docstore, "_dict", {})
+            live_positions = sorted(pos for pos, doc_id in store.index_to_docstore_id.items() if doc_id in docs)
+            live_ids = [store.index_to_docstore_id[pos] for pos in live_positions]
+            texts = [docs[doc_id].page_content for doc_id in live_ids]
+            vectors = self._exact_vectors(texts, store.index, live_positions)
+
+        started = time.perf_counter()
+        rebuilt = build_index(wanted, vectors, wanted_quantization)
+        with self._lock:
+            store.index = rebuilt
+            store.index_to_docstore_id = {i: doc_id for i, doc_id in enumerate(live_ids)}
+            self._times = None
+            self._tombstones = 0
+            self._dirty = True
+        logger.info(
+            "Rebuilt vector index as %s (%s) with %d vector(s) in %.1fs",
+            index_type(rebuilt), index_quantization(rebuilt), len(live_ids), time.perf_counter() - started,
+        )
+
+    def _add_chunks(
+        self, vector_store: Optional[FAISS], bm25: BM25Index, chunks: List[Document]
+    ) -> Optional[FAISS]:
+        """
+        Embed chunks (cache first, then pipeline) and add them to vector_store and bm25 as
+        batches complete. Creates the store from the first batch if vector_store is None.
+        Returns the store.
+        """
+        self._set_progress("embedding", 0, len(chunks))
+        done = 0
+        batches = self._iter_embedded(chunks)
+        while True:
+            # Stepped by hand so the startup timeline can split embedding from indexing time.
+            with startup_timeline.phase("embedding"):
+                item = next(batches, None)
+            if item is None:
+                break
+            batch, vectors = item
+            with startup_timeline.phase("indexing"):
+                if vector_store is None:
+                    vector_store = self._new_store(len(vectors[0]))
+                vector_store.add_embeddings(
+                    [(chunk.page_content, vector) for chunk, vector in zip(batch, vectors)],
+                    metadatas=[chunk.metadata for chunk in batch],
+                    ids=[chunk.id for chunk in batch],
+                )
+                bm25.add_many((chunk.id, chunk.page_content) for chunk in batch)
+                self._times = None
+            done += len(batch)
+            self._set_progress("embedding", done, len(chunks))
+        return vector_store
+
+    def _bm25_from_store(self, vector_store: FAISS) -> BM25Index:
+        """Build a BM25 index over every chunk in a store's docstore (used after loading from disk)."""
+        bm25 = BM25Index(BM25_K1, BM25_B)
+        documents = getattr(vector_store.docstore, "_dict", {})
+        bm25.add_many((doc_id, document.page_content) for doc_id, document in documents.items())
+        return bm25
+
+    def _dedup_from_store(self, vector_store: FAISS) -> SimHashIndex:
+        """Fingerprint every learning-data chunk in a store's docstore (used after loading from disk)."""
+        dedup = self._new_dedup()
+        documents = getattr(vector_store.docstore, "_dict", {})
+        dedup.add_many(
+            (doc_id, document.page_content) for doc_id, document in documents.items()
+            if "session_id" not in document.metadata
+        )
+        return dedup
+
     def create_vector_store(self) -> FAISS:
         """
-        Load learning_data + chats_data, chunk, embed, build FAISS index, save to disk.
-        Called once at startup. If there are no documents we create a tiny placeholder index.
+        Load the source files this shard owns, chunk, embed, build FAISS index, save to disk.
+        Used for the first build and whenever the saved index cannot be reused. If there
+        are no documents we create a tiny placeholder index.
         """
-        learning_docs = self.load_learning_data()
-        chat_docs = self.load_chat_history()
-        all_documents = learning_docs + chat_docs
+        sources: Dict[str, dict] = {}
+        all_chunks: List[Document] = []
+        dedup = self._new_dedup()
+        pending: Dict[str, Document] = {}
+        scanned = self._scan_sources()
+        # Read this shard's chats in one bulk pass over the session store, not one lookup each.
+        sessions: Dict[str, Tuple[Optional[str], List[dict]]] = {}
+        if any(self.service._is_chat_file(file_path) for file_path in scanned.values()):
+            with startup_timeline.phase("document_load"):
+                for file_path, session_id, messages in self.service.session_store.iter_sessions():
+                    key = self._source_key(file_path)
+                    if key in scanned:
+                        sessions[key] = (session_id, messages)
+        for key, file_path in scanned.items():
+            try:
+                fingerprint = self._fingerprint(file_path)
+            except OSError as e:
+                logger.warning("Could not read source file %s: %s", file_path, e)
+                continue
+            chunks = self._chunk_source(file_path, sessions.pop(key, None))
+            sources[key] = self._new_entry(fingerprint, chunks)
+            all_chunks.extend(self._dedup_chunks(key, chunks, sources, dedup, pending))
+        merged = sum(len(entry["merged"]) for entry in sources.values())
+        if merged:
+            logger.info("Merged %d near-duplicate chunk(s) into %d indexed chunk(s)", merged, len(all_chunks))
 
-        if not all_documents:
-            # Placeholder so get_retriever() never fails; returns this single chunk for any query.
-            self.vector_store = FAISS.from_texts(["No data available yet."], self.embeddings)
+        placeholder_ids: List[str] = []
+        bm25 = BM25Index(BM25_K1, BM25_B)
+        self._set_progress("embedding", 0, len(all_chunks))
+        if not all_chunks:
+            # Placeholder so the shard always has an index; _dense_search() never returns it.
+            placeholder_ids = [str(uuid.uuid4())]
+            vector_store = FAISS.from_texts(["No data available yet."], self.embeddings, ids=placeholder_ids)
         else:
-            chunks = self.text_splitter.split_documents(all_documents)
-            self.vector_store = FAISS.from_documents(chunks, self.embeddings)
+            vector_store = self._add_chunks(None, bm25, all_chunks)
+
+        with self._lock:
+            self.vector_store = vector_store
+            self._times = None
+            self.bm25 = bm25
+            self.dedup = dedup
+            self._sources = sources
+            self._placeholder_ids = placeholder_ids
+            self._tombstones = 0
+        # Built as flat while streaming; convert once if the corpus size calls for HNSW/IVF.
+        self._set_progress("indexing")
+        with startup_timeline.phase("indexing"):
+            self._maybe_rebuild_index(exact_type=True)
+            self.save_vector_store()
+        self._mark_ready()
+        return self.vector_store
+
+    def load_or_create_vector_store(self) -> FAISS:
+        """
+        Startup entry point: reuse the saved index and re-embed only changed source files.
+
+        Falls back to a full create_vector_store() when there is no manifest, the embedding
+        model or chunk settings changed, the saved index cannot be loaded, the saved index is
+        only the empty placeholder, or applying the changes fails.
+        """
+        self._set_progress("loading")
+        manifest = self._read_manifest()
+        if manifest is None:
+            logger.info("No usable vector store manifest found; building index from scratch")
+            return self.create_vector_store()
+        if any(manifest.get(name) != value for name, value in self._index_settings().items()):
+            logger.info("Embedding model or chunk settings changed since last save; rebuilding index")
+            return self.create_vector_store()
+        if not manifest.get("sources"):
+            # The saved index is the "No data available yet." placeholder; nothing worth reusing.
+            return self.create_vector_store()
 
-        self.save_vector_store()
+        embeddings = self.embeddings
+        try:
+            with startup_timeline.phase("index_load"):
+                self.vector_store = FAISS.load_local(
+                    str(self.store_dir),
+                    embeddings,
+                    # The pickle next to the index is written by save_vector_store(), never by a third party.
+                    allow_dangerous_deserialization=True,
+                )
+        except Exception as e:
+            logger.warning("Could not load saved vector store, rebuilding: %s", e)
+            return self.create_vector_store()
+        with startup_timeline.phase("index_load"):
+            apply_search_params(self.vector_store.index)
+            self._tombstones = self._count_tombstones(self.vector_store)
+            self.bm25 = self._bm25_from_store(self.vector_store)
+            self.dedup = self._dedup_from_store(self.vector_store)
+            self._times = None
+
+        recorded: Dict[str, dict] = manifest["sources"]
+        current = self._scan_sources()
+        try:
+            self._sources = {
+                key: {**entry, "ids": list(entry.get("ids", [])), "merged": list(entry.get("merged", []))}
+                for key, entry in recorded.items()
+            }
+            changed: Dict[str, dict] = {}
+            for key, file_path in current.items():
+                previous = recorded.get(key)
+                fingerprint = self._fingerprint(file_path, previous)
+                if previous and previous.get("sha256") == fingerprint["sha256"]:
+                    # Unchanged content: keep its chunks, refresh size/mtime in case only those moved.
+                    self._sources[key].update(fingerprint)
+                else:
+                    changed[key] = fingerprint
+
+            # Remove every deleted or changed source first, so their chunks can be re-homed
+            # before the new chunks are checked for duplicates.
+            stale_ids: List[str] = []
+            for key in [key for key in recorded if key not in current or key in changed]:
+                stale_ids.extend(self._remove_source(key))
+            new_chunks: List[Document] = []
+            pending: Dict[str, Document] = {}
+            for key, fingerprint in changed.items():
+                chunks = self._chunk_source(current[key])
+                self._sources[key] = self._new_entry(fingerprint, chunks)
+                new_chunks.extend(self._dedup_chunks(key, chunks, self._sources, self.dedup, pending))
+
+            if not any(entry["ids"] for entry in self._sources.values()):
+                # Every source is gone or empty now; rebuild so we get the placeholder index.
+                return self.create_vector_store()
+            if new_chunks:
+                self._add_chunks(self.vector_store, self.bm25, new_chunks)
+            self._set_progress("indexing")
+            with startup_timeline.phase("indexing"):
+                self._maybe_rebuild_index(exact_type=True)
+        except Exception as e:
+            logger.warning("Could not apply source changes to saved vector store, rebuilding: %s", e)
+            return self.create_vector_store()
+
+        reused = len(current) - len(changed)
+        logger.info(
+            "Loaded saved vector store: %d source file(s) reused, %d chunk(s) removed, %d chunk(s) embedded",
+            reused,
+            len(stale_ids),
+            len(new_chunks),
+        )
+        if changed or stale_ids or self._dirty or self._sources != recorded:
+            with startup_timeline.phase("indexing"):
+                self.save_vector_store()
+        self._mark_ready()
         return self.vector_store
 
     def save_vector_store(self):
-        """Write the current FAISS index to database/vector_store/. On error we only log."""
-        if self.vector_store:
-            try:
-                self.vector_store.save_local(str(VECTOR_STORE_DIR))
-            except Exception as e:
-                logger.error("Failed to save vector store to disk: %s", e)
+        """Write the current FAISS index and its manifest to database/vector_store/<name>/. On error we only log."""
+        with self._lock:
+            if self.vector_store:
+                try:
+                    self.vector_store.save_local(str(self.store_dir))
+                    self._write_manifest()
+                    self._dirty = False
+                except Exception as e:
+                    logger.error("Failed to save vector store to disk: %s", e)
+
+    # ------------------------------------------------------------------------------
+    # BACKGROUND STARTUP BUILD
+    # ------------------------------------------------------------------------------
+
+    def start_background_build(self) -> Future:
+        """
+        Queue load_or_create_vector_store() on this shard's worker and return immediately.
+        Live updates scheduled meanwhile run after it, on the finished index. The future
+        resolves to True if the build succeeded.
+        """
+        return self._update_executor.submit(self._run_background_build)
+
+    def _run_background_build(self) -> bool:
+        """Worker body for start_background_build(); logs the build time or records the error."""
+        started = time.perf_counter()
+        try:
+            self.load_or_create_vector_store()
+        except Exception as e:
+            logger.error("Vector store shard %s build failed; it stays out of searches: %s", self.name, e, exc_info=True)
+            self._set_progress("failed", error=str(e))
+            return False
+        logger.info("Vector store shard %s ready in %.1fs", self.name, time.perf_counter() - started)
+        return True
+
+    def _mark_ready(self):
+        """Called at the end of a successful build or load: search() starts using this shard."""
+        self._set_progress("ready")
+        self._ready.set()
+
+    def is_ready(self) -> bool:
+        """True once the startup build has finished and search() includes this shard."""
+        return self._ready.is_set()
+
+    def _set_progress(self, phase: str, done: int = 0, total: int = 0, error: Optional[str] = None):
+        """Record the current build phase (and embedding counts) for build_progress()."""
+        with self._lock:
+            self._progress = {"phase": phase, "chunks_done": done, "chunks_total": total, "error": error}
+
+    def build_progress(self) -> dict:
+        """
+        Startup build status: phase (pending, loading, embedding, indexing, ready, failed),
+        chunk counts and an approximate percent. Embedding is the bulk of the work, so it
+        spans 5-90%; loading/chunking is below 5% and the index conversion and save above 90%.
+        """
+        with self._lock:
+            progress = dict(self._progress)
+        phase = progress["phase"]
+        if phase == "ready":
+            percent = 100.0
+        elif phase == "indexing":
+            percent = 90.0
+        elif phase == "embedding":
+            total = progress["chunks_total"]
+            percent = 5.0 + 85.0 * (progress["chunks_done"] / total if total else 1.0)
+        else:
+            percent = 0.0
+        return {"ready": self.is_ready(), **progress, "percent": round(percent, 1)}
+
+    # ------------------------------------------------------------------------------
+    # LIVE UPDATES (ONE SOURCE FILE AT A TIME)
+    # ------------------------------------------------------------------------------
+
+    def update_source(self, file_path: Path) -> bool:
+        """
+        Bring one source file's chunks in the live index up to date with the file on disk.
+
+        New or changed file: re-chunk, embed (outside the lock), then swap its old chunks for
+        the new ones. A chat that only gained exchanges keeps its indexed chunks and just
+        adds the new ones. Deleted file: remove its chunks. Unchanged content: nothing to do.
+        A file this shard no longer owns is treated as deleted. Returns True if the index
+        changed. Does nothing before the index has been built; the startup build picks the
+        file up itself.
+        """
+        file_path = Path(file_path)
+        key = self._source_key(file_path)
+        with self._lock:
+            if self.vector_store is None:
+                return False
+            previous = self._sources.get(key)
+
+        if not self._source_exists(file_path) or not self.owns(file_path):
+            if previous is None:
+                return False
+            with self._lock:
+                self._remove_source(key)
+                self._dirty = True
+            self._maybe_rebuild_index()
+            return True
+
+        fingerprint = self._fingerprint(file_path, previous)
+        if previous and previous.get("sha256") == fingerprint["sha256"]:
+            with self._lock:
+                self._sources[key].update(fingerprint)
+            return False
+
+        # Chunking and embedding are the slow part; do them without holding the lock.
+        chunks = self._chunk_source(file_path)
+        appended = self._appended_turns(previous, chunks)
+        if appended is not None:
+            vectors = self._embed_chunks(appended)
+            with self._lock:
+                # Only valid if nothing re-indexed this chat while we were embedding.
+                applied = self._sources.get(key) is previous
+                if applied:
+                    entry = self._new_entry(fingerprint, chunks)
+                    previous.update(fingerprint, turns=entry["turns"], turns_sha256=entry["turns_sha256"])
+                    self._index_embedded(key, appended, vectors)
+            if applied:
+                self._maybe_rebuild_index()
+                return True
+
+        vectors = self._embed_chunks(chunks)
+        with self._lock:
+            # Remove under the lock (the entry may have changed while we were embedding), then
+            # dedup against what is left: our old chunks may have been handed to another source.
+            self._remove_source(key)
+            self._delete_ids(self._placeholder_ids)
+            self._placeholder_ids = []
+            self._sources[key] = self._new_entry(fingerprint, chunks)
+            self._index_embedded(key, chunks, vectors)
+        self._maybe_rebuild_index()
+        return True
+
+    def _embed_chunks(self, chunks: List[Document]) -> List[List[float]]:
+        """Vectors for chunks (embedding cache first); call without the lock held."""
+        texts = [chunk.page_content for chunk in chunks]
+        return self.embeddings.embed_documents(texts) if texts else []
+
+    def _index_embedded(self, key: str, chunks: List[Document], vectors: List[List[float]]):
+        """
+        Dedup already-embedded chunks of source `key` against the live index and add the kept
+        ones to FAISS and BM25 (call with the lock held; the source's entry must exist).
+        """
+        kept = self._dedup_chunks(key, chunks, self._sources, self.dedup, {})
+        if kept:
+            vector_by_id = {chunk.id: vector for chunk, vector in zip(chunks, vectors)}
+            self.vector_store.add_embeddings(
+                [(chunk.page_content, vector_by_id[chunk.id]) for chunk in kept],
+                metadatas=[chunk.metadata for chunk in kept],
+                ids=[chunk.id for chunk in kept],
+            )
+            self.bm25.add_many((chunk.id, chunk.page_content) for chunk in kept)
+            self._times = None
+        self._dirty = True
+
+    def schedule_source_update(self, file_path: Path):
+        """
+        Queue update_source(file_path) on the background worker and return immediately.
+        If an update for the same file is already queued, this call is a no-op (that update
+        will read the latest file contents when it runs).
+        """
+        key = self._source_key(file_path)
+        with self._lock:
+            if key in self._pending_updates:
+                return
+            self._pending_updates.add(key)
+        self._update_executor.submit(self._run_source_update, Path(file_path), key)
+
+    def _run_source_update(self, file_path: Path, key: str):
+        """Worker body for schedule_source_update(); logs instead of raising (nobody awaits the result)."""
+        with self._lock:
+            # Clear first so a save that happens while we are embedding queues a fresh update.
+            self._pending_updates.discard(key)
+        try:
+            if self.update_source(file_path):
+                logger.info("Vector store updated for %s", key)
+        except Exception as e:
+            logger.warning("Failed to update vector store for %s: %s", key, e)
+
+    def close(self):
+        """Wait for queued live updates, then save the index if they changed it. Called on shutdown."""
+        self._update_executor.shutdown(wait=True)
+        if self._dirty:
+            self.save_vector_store()
+
+    # ------------------------------------------------------------------------------
+    # SEARCH (CALLED BY VectorStoreService.search)
+    # ------------------------------------------------------------------------------
+
+    def has_source(self, key: str) -> bool:
+        """True if this shard currently indexes the source file with this manifest key."""
+        with self._lock:
+            return key in self._sources
+
+    def _position_arrays(self, store: FAISS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per index position (call with the lock held): the chunk's timestamp (metadata
+        "timestamp" for chat exchanges, +inf for chunks that never age: learning data,
+        tombstones) and whether it is live (a chunk in the docstore, not the placeholder).
+        Cached until the index changes.
+        """
+        if self._times is None or len(self._times) != store.index.ntotal:
+            documents = getattr(store.docstore, "_dict", {})
+            placeholders = set(self._placeholder_ids)
+            times = np.full(store.index.ntotal, np.inf)
+            live = np.zeros(store.index.ntotal, dtype=bool)
+            for position, doc_id in store.index_to_docstore_id.items():
+                document = documents.get(doc_id)
+                if document is None or doc_id in placeholders:
+                    continue
+                live[position] = True
+                if "timestamp" in document.metadata:
+                    times[position] = document.metadata["timestamp"]
+            self._times, self._live, self._dead_selector = times, live, None
+        return self._times, self._live
+
+    def _selector(self, allowed: np.ndarray) -> Tuple[Any, ...]:
+        """
+        IDSelector accepting the allowed positions, built from whichever id list is shorter.
+        Returned with the batch it wraps: both must outlive the search.
+        """
+        kept_positions = np.flatnonzero(allowed)
+        excluded_positions = np.flatnonzero(~allowed)
+        if len(excluded_positions) < len(kept_positions):
+            batch = faiss.IDSelectorBatch(excluded_positions)
+            return faiss.IDSelectorNot(batch), batch
+        batch = faiss.IDSelectorBatch(kept_positions)
+        return batch, batch
+
+    def _dense_search(
+        self, vector: np.ndarray, k: int, min_timestamp: Optional[float] = None
+    ) -> List[RetrievedChunk]:
+        """
+        FAISS top-k for a (1 x dim) query vector; exact re-rank if quantized. Tombstones, the
+        empty-shard placeholder and, with min_timestamp, chunks older than that are excluded
+        inside the FAISS search by an IDSelector (faiss_index.search_parameters), so the
+        search fetches only as many candidates as it returns.
+        """
+        chunks: List[RetrievedChunk] = []
+        with self._lock:
+            store = self.vector_store
+            placeholders = set(self._placeholder_ids)
+            rerank = QUANTIZED_RERANK_FACTOR > 1 and index_quantization(store.index) != "none"
+            wanted = k * QUANTIZED_RERANK_FACTOR if rerank else k
+            fetch_k = min(wanted, max(store.index.ntotal, 1))
+            params = None
+            selector: Tuple[Any, ...] = ()
+            excluded: Optional[np.ndarray] = None
+            times, live = self._position_arrays(store)
+            allowed = live if min_timestamp is None else live & (times >= min_timestamp)
+            kept = int(np.count_nonzero(allowed))
+            if kept == 0:
+                return chunks
+            if kept < store.index.ntotal:
+                if supports_selector(store.index):
+                    if min_timestamp is None:
+                        # Tombstones only: the same selector serves every query until the index changes.
+                        if self._dead_selector is None:
+                            self._dead_selector = self._selector(allowed)
+                        selector = self._dead_selector
+                    else:
+                        selector = self._selector(allowed)
+                    params = search_parameters(store.index, selector[0])
+                    fetch_k = min(fetch_k, kept)
+                else:
+                    # Flat PQ takes no selector: over-fetch by the excluded count and drop them below.
+                    excluded = ~allowed
+                    fetch_k = min(fetch_k + store.index.ntotal - kept, store.index.ntotal)
+            distances, positions = store.index.search(vector, fetch_k, params=params)
+            for distance, position in zip(distances[0], positions[0]):
+                if position < 0:
+                    continue  # FAISS pads with -1 when the index has fewer than k vectors.
+                if excluded is not None and excluded[position]:
+                    continue
+                doc_id = store.index_to_docstore_id.get(int(position))
+                if doc_id in placeholders:
+                    continue
+                document = store.docstore.search(doc_id) if doc_id is not None else None
+                if isinstance(document, Document):
+                    chunks.append(RetrievedChunk(document=document, score=_distance_to_similarity(distance)))
+                    if len(chunks) == wanted:
+                        break
+        if rerank:
+            chunks = self._rerank_exact(vector[0], chunks)[:k]
+        return chunks
+
+    def _timed_bm25(self, query: str, k: int) -> Tuple[List[Tuple[str, float]], float]:
+        """BM25 top-k plus how long it took in ms (runs on the query executor)."""
+        started = time.perf_counter()
+        hits = self.bm25.search(query, k)
+        return hits, (time.perf_counter() - started) * 1000
+
+    def _fuse(
+        self,
+        query_vector: np.ndarray,
+        dense: List[RetrievedChunk],
+        sparse: List[Tuple[str, float]],
+        min_timestamp: Optional[float] = None,
+    ) -> List[RetrievedChunk]:
+        """
+        Reciprocal rank fusion of the dense and BM25 rankings: each chunk scores
+        sum(1 / (RRF_K + rank)) over the lists it appears in. BM25-only hits are fetched
+        from the docstore and get their cosine similarity from the cached chunk vector;
+        those older than min_timestamp are dropped like the dense search drops them.
+        """
+        by_id: Dict[str, RetrievedChunk] = {}
+        for rank, chunk in enumerate(dense, start=1):
+            chunk.fused_score = 1.0 / (RRF_K + rank)
+            by_id[chunk.document.id] = chunk
+
+        sparse_only: List[RetrievedChunk] = []
+        with self._lock:
+            docstore = self.vector_store.docstore
+            for rank, (doc_id, bm25_score) in enumerate(sparse, start=1):
+                chunk = by_id.get(doc_id)
+                if chunk is None:
+                    document = docstore.search(doc_id)
+                    if not isinstance(document, Document):
+                        continue  # Deleted between the BM25 lookup and now.
+                    if min_timestamp is not None and document.metadata.get("timestamp", np.inf) < min_timestamp:
+                        continue
+                    chunk = RetrievedChunk(document=document, score=0.0, fused_score=0.0)
+                    by_id[doc_id] = chunk
+                    sparse_only.append(chunk)
+                chunk.bm25_score = bm25_score
+                chunk.fused_score += 1.0 / (RRF_K + rank)
+
+        if sparse_only:
+            vectors = self.embedding_cache.get_many(
+                [chunk.document.page_content for chunk in sparse_only], record_stats=False
+            )
+            for chunk, vector in zip(sparse_only, vectors):
+                if vector is not None:
+                    distance = float(np.sum((np.asarray(vector, dtype=np.float32) - query_vector) ** 2))
+                    chunk.score = _distance_to_similarity(distance)
+        return sorted(by_id.values(), key=lambda chunk: chunk.fused_score, reverse=True)
+
+    def _rerank_exact(self, query_vector: np.ndarray, chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+        """
+        Re-score candidates from a quantized index with their exact float32 vectors (read from
+        the memory-mapped embedding cache) and sort best first. Chunks whose vector is not in
+        the cache keep their approximate score.
+        """
+        exact = self.embedding_cache.get_many([chunk.document.page_content for chunk in chunks], record_stats=False)
+        for chunk, vector in zip(chunks, exact):
+            if vector is not None:
+                distance = float(np.sum((np.asarray(vector, dtype=np.float32) - query_vector) ** 2))
+                chunk.score = _distance_to_similarity(distance)
+        return sorted(chunks, key=lambda chunk: chunk.score, reverse=True)
+
+    def reconstruct(self, doc_ids: Set[str]) -> Dict[str, np.ndarray]:
+        """Vectors of the given chunks that live in this shard, read back from the index."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            store = self.vector_store
+            if store is None:
+                return found
+            for position, doc_id in store.index_to_docstore_id.items():
+                if doc_id in doc_ids:
+                    try:
+                        found[doc_id] = store.index.reconstruct(position)
+                    except Exception:
+                        pass  # e.g. IVF without a direct map.
+        return found
+
+    def stats(self) -> dict:
+        """Index, BM25 and near-duplicate counters of this shard."""
+        with self._lock:
+            store = self.vector_store
+            index = {
+                "type": index_type(store.index) if store else None,
+                "quantization": index_quantization(store.index) if store else None,
+                "vectors": store.index.ntotal if store else 0,
+                "tombstones": self._tombstones,
+                "estimated_bytes": estimate_index_bytes(store.index) if store else 0,
+            }
+            dedup = {
+                "fingerprints": len(self.dedup),
+                "merged_chunks": sum(len(entry.get("merged", [])) for entry in self._sources.values()),
+            }
+            sources = len(self._sources)
+        return {
+            "ready": self.is_ready(),
+            "sources": sources,
+            "index": index,
+            "bm25": self.bm25.stats(),
+            "dedup": dedup,
+        }
+
+
+# ==============================================================================
+# VECTOR STORE SERVICE CLASS
+# ==============================================================================
+
+class VectorStoreService:
+    """
+    Retrieval over learning_data .txt files and chats_data .json files, kept in separate
+    shards (learning, chats or one chat shard per period) that are built, updated and saved
+    independently and searched together. Owns what the shards share: the embedding model,
+    the embedding and query caches, the chunker and the optional reranker.
+    """
+
+    def __init__(self, session_store: Optional[SessionStore] = None):
+        """
+        Create the caches, text splitter and fixed shards; cheap. The embedding model is loaded
+        on first use of .embeddings, period shards are found when the startup build begins.
+        Chats are read from session_store (default: a new one per CHAT_STORE); pass the chat
+        service's store so both share one.
+        """
+        self.session_store = session_store or create_session_store()
+        # Chunk embeddings are served from the on-disk cache when the same text was embedded before.
+        # Keyed by the backend variant actually loaded, so it is only usable once the model is
+        # (the embedding_cache property loads it; stats() reads it without).
+        self._embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, variant=None)
+        # Set together by the .embeddings property on first use (loading the model takes seconds).
+        self._embeddings: Optional[CachedEmbeddings] = None
+        self._embedding_pipeline: Optional[EmbeddingPipeline] = None
+        self._model_lock = threading.Lock()
+        # Recent query vectors, so repeated questions are not embedded again.
+        self.query_cache = QueryEmbeddingLRU(QUERY_EMBEDDING_CACHE_SIZE)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+        )
+        # Shard name -> shard. Period shards are added as chats from new periods show up.
+        self._shards: Dict[str, VectorShard] = {}
+        self._shards_lock = threading.RLock()
+        # True once the startup build has been started; shards created later build themselves.
+        self._builds_started = False
+        # Chat source -> (change stamp, period), LRU, so routing does not re-read the session on
+        # every call. The stamp is None once the period came from a message timestamp: it only
+        # depends on the first message, so it holds for every later change of the session.
+        self._periods: "OrderedDict[Path, Tuple[Optional[Tuple[int, int]], str]]" = OrderedDict()
+        self._periods_lock = threading.Lock()
+        # Set once every shard has finished its startup build.
+        self._ready = threading.Event()
+        # Runs the per-shard FAISS and BM25 lookups of one search concurrently.
+        self._query_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vector-store-query")
+        # Optional cross-encoder second stage; loads its model on the first search that uses it.
+        self.reranker: Optional[CrossEncoderReranker] = CrossEncoderReranker() if RERANKER else None
+
+        self._add_shard(LEARNING_SHARD, self._is_learning_file, LEARNING_INDEX_TYPE)
+        if CHAT_SHARD_PERIOD not in CHAT_SHARD_PERIODS:
+            self._add_shard(CHATS_SHARD, self._is_chat_file)
+
+    # ------------------------------------------------------------------------------
+    # EMBEDDING MODEL (LOADED ON FIRST USE)
+    # ------------------------------------------------------------------------------
+
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        """The chunk/query embedding model behind the on-disk cache; the first access loads it."""
+        if self._embeddings is None:
+            with self._model_lock:
+                if self._embeddings is None:
+                    self._load_embedding_model()
+        return self._embeddings
+
+    @property
+    def embedding_pipeline(self) -> EmbeddingPipeline:
+        """Batched (optionally multi-process) embedding of cache misses during index builds."""
+        if self._embedding_pipeline is None:
+            self.embeddings  # Loads the model and creates the pipeline with it.
+        return self._embedding_pipeline
+
+    @property
+    def embedding_cache(self) -> EmbeddingCache:
+        """On-disk chunk vectors for the loaded backend variant; the first access loads the model."""
+        self.embeddings
+        return self._embedding_cache
+
+    @property
+    def embedding_variant(self) -> str:
+        """Backend variant the model actually runs on ("torch", "onnx", "onnx-int8"); loads the model."""
+        self.embeddings
+        return self._embedding_cache.variant
+
+    def _load_embedding_model(self):
+        """Load the model on the configured backend (torch or ONNX); called once, under _model_lock."""
+        with startup_timeline.phase("model_load"):
+            # Embeddings run locally (no API key); used to convert text into vectors for similarity search.
+            base = create_embeddings(EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE)
+        # What actually loaded (ONNX may have fallen back to torch): keys the cache and manifest,
+        # and pipeline workers run the same backend.
+        variant = embedding_variant(base)
+        self._embedding_cache.variant = variant
+        self._embedding_pipeline = EmbeddingPipeline(
+            base,
+            EMBEDDING_MODEL,
+            backend=variant.split("-")[0],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            workers=EMBEDDING_WORKERS,
+            torch_threads=EMBEDDING_TORCH_THREADS,
+            min_pool_chunks=EMBEDDING_POOL_MIN_CHUNKS,
+        )
+        self._embeddings = CachedEmbeddings(base, self._embedding_cache)
+
+    # ------------------------------------------------------------------------------
+    # SHARDS
+    # ------------------------------------------------------------------------------
+
+    @property
+    def shards(self) -> List[VectorShard]:
+        """Current shards, learning first."""
+        with self._shards_lock:
+            return list(self._shards.values())
+
+    def _add_shard(self, name: str, owns: Callable[[Path], bool], index_kind: Optional[str] = None) -> VectorShard:
+        """Create and register a shard (call with _shards_lock held, or from __init__)."""
+        shard = VectorShard(name, self, owns, index_kind)
+        self._shards[name] = shard
+        return shard
+
+    def _is_learning_file(self, file_path: Path) -> bool:
+        """True for files directly in database/learning_data/."""
+        return Path(file_path).parent.resolve() == LEARNING_DATA_DIR.resolve()
+
+    def _is_chat_file(self, file_path: Path) -> bool:
+        """True for files directly in database/chats_data/."""
+        return Path(file_path).parent.resolve() == CHATS_DATA_DIR.resolve()
+
+    def _chat_period(self, file_path: Path) -> Optional[str]:
+        """
+        Period a chat is sharded under (CHAT_SHARD_PERIOD): year or year-month of its first
+        timestamped message, else of its last write. None if the session store does not have it.
+        """
+        try:
+            stamp = self.session_store.source_stamp(file_path)
+        except Exception as e:
+            logger.warning("Could not read chat %s for sharding: %s", file_path, e)
+            return None
+        if stamp is None:
+            return None
+        with self._periods_lock:
+            cached = self._periods.get(file_path)
+            if cached and cached[0] in (None, stamp):
+                self._periods.move_to_end(file_path)
+                return cached[1]
+        started_at = None
+        try:
+            _, messages = self.session_store.read_source(file_path)
+            started_at = next((t for t in map(_message_time, messages) if t is not None), None)
+        except Exception as e:
+            logger.warning("Could not read chat %s for sharding: %s", file_path, e)
+        # Fixed once the first timestamped message is known; until then it follows the last write.
+        final = started_at is not None
+        if started_at is None:
+            started_at = stamp[1] / 1e9
+        period = datetime.fromtimestamp(started_at, tz=timezone.utc).strftime(CHAT_SHARD_PERIODS[CHAT_SHARD_PERIOD])
+        with self._periods_lock:
+            self._periods[file_path] = (None if final else stamp, period)
+            self._periods.move_to_end(file_path)
+            while len(self._periods) > PERIOD_CACHE_SIZE:
+                self._periods.popitem(last=False)
+        return period
+
+    def _shard_for(self, file_path: Path) -> Optional[VectorShard]:
+        """
+        The shard that should index this file (None if none does, e.g. a deleted chat under
+        period sharding). A chat from a period without a shard yet gets a new one, which
+        builds itself if the startup build has already begun.
+        """
+        file_path = Path(file_path)
+        if self._is_learning_file(file_path):
+            return self._shards[LEARNING_SHARD]
+        if not self._is_chat_file(file_path):
+            return None
+        if CHAT_SHARD_PERIOD not in CHAT_SHARD_PERIODS:
+            return self._shards[CHATS_SHARD]
+        period = self._chat_period(file_path)
+        if period is None:
+            return None
+        name = f"{CHATS_SHARD}-{period}"
+        with self._shards_lock:
+            shard = self._shards.get(name)
+            if shard is not None:
+                return shard
+            shard = self._add_shard(
+                name, lambda path, period=period: self._is_chat_file(path) and self._chat_period(path) == period
+            )
+            start = self._builds_started
+        logger.info("Created vector store shard %s", name)
+        if start:
+            shard.start_background_build()
+        return shard
+
+    def _discover_shards(self):
+        """
+        Create the period shards the chats on disk need, then delete saved shard folders no
+        shard uses any more (e.g. after changing CHAT_SHARD_PERIOD) and the pre-sharding index.
+        """
+        if CHAT_SHARD_PERIOD in CHAT_SHARD_PERIODS:
+            for file_path in self.session_store.list_sources():
+                self._shard_for(file_path)
+        with self._shards_lock:
+            active = set(self._shards)
+        for path in VECTOR_STORE_DIR.glob("*"):
+            stale_shard = (
+                path.is_dir()
+                and (path.name in (LEARNING_SHARD, CHATS_SHARD) or path.name.startswith(f"{CHATS_SHARD}-"))
+                and path.name not in active
+            )
+            legacy = path.is_file() and path.name in ("index.faiss", "index.pkl", MANIFEST_FILENAME)
+            if stale_shard or legacy:
+                logger.info("Removing unused vector store data %s", path)
+                if stale_shard:
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+
+    def _source_key(self, file_path: Path) -> str:
+        """Manifest key of a source file (see VectorShard._source_key)."""
+        return _manifest_key(file_path)
+
+    # ------------------------------------------------------------------------------
+    # BUILD, LOAD AND SAVE (EVERY SHARD)
+    # ------------------------------------------------------------------------------
+
+    def load_or_create_vector_store(self):
+        """Synchronous startup: find the shards, then load (or build) each one in turn."""
+        with self._shards_lock:
+            self._builds_started = True
+        self._discover_shards()
+        for shard in self.shards:
+            shard.load_or_create_vector_store()
+        self._ready.set()
+
+    def create_vector_store(self):
+        """Rebuild every shard from its source files, ignoring what is saved on disk."""
+        for shard in self.shards:
+            shard.create_vector_store()
+        self._ready.set()
+
+    def save_vector_store(self):
+        """Write every shard's index and manifest to database/vector_store/<shard>/."""
+        for shard in self.shards:
+            shard.save_vector_store()
+
+    def start_background_build(self):
+        """
+        Build or load every shard in the background and return immediately. Each shard runs
+        on its own worker, so the small learning shard is searchable long before a large chat
+        shard finishes; search() uses whichever shards are ready.
+        """
+        threading.Thread(target=self._run_background_build, name="vector-store-build", daemon=True).start()
+
+    def _run_background_build(self):
+        """Start every shard's build, wait for all of them, then log and mark the startup timeline."""
+        started = time.perf_counter()
+        try:
+            self._discover_shards()
+        except Exception as e:
+            logger.warning("Could not scan chats for period shards: %s", e)
+        with self._shards_lock:
+            self._builds_started = True
+            futures = {shard.name: shard.start_background_build() for shard in self._shards.values()}
+        failed = [name for name, future in futures.items() if not future.result()]
+        if failed:
+            startup_timeline.mark("index_failed")
+            return
+        self._ready.set()
+        logger.info("Vector store ready in %.1fs (%d shard(s))", time.perf_counter() - started, len(futures))
+        startup_timeline.mark("index_ready")
+
+    def is_ready(self) -> bool:
+        """True once every shard has finished its startup build."""
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every shard is built (or timeout seconds pass); returns is_ready()."""
+        return self._ready.wait(timeout)
+
+    def build_progress(self) -> dict:
+        """
+        Startup build status over all shards: the least advanced phase (or failed), summed
+        chunk counts, the mean of the shards' percentages, and each shard's own progress.
+        """
+        progress = {shard.name: shard.build_progress() for shard in self.shards}
+        phases = [entry["phase"] for entry in progress.values()]
+        order = ["pending", "loading", "embedding", "indexing", "ready"]
+        if "failed" in phases:
+            phase = "failed"
+        else:
+            phase = min(phases, key=order.index) if phases else "pending"
+        errors = [entry["error"] for entry in progress.values() if entry["error"]]
+        percents = [entry["percent"] for entry in progress.values()]
+        return {
+            "ready": self.is_ready(),
+            "phase": phase,
+            "chunks_done": sum(entry["chunks_done"] for entry in progress.values()),
+            "chunks_total": sum(entry["chunks_total"] for entry in progress.values()),
+            "error": errors[0] if errors else None,
+            "percent": round(sum(percents) / len(percents), 1) if percents else 0.0,
+            "shards": progress,
+        }
+
+    # ------------------------------------------------------------------------------
+    # LIVE UPDATES (ROUTED TO THE OWNING SHARD)
+    # ------------------------------------------------------------------------------
+
+    def update_source(self, file_path: Path) -> bool:
+        """
+        Bring one source file up to date in the shard that owns it now, and remove it from any
+        other shard that still indexes it (a chat whose period changed). Returns True if any
+        shard changed.
+        """
+        file_path = Path(file_path)
+        key = self._source_key(file_path)
+        owner = self._shard_for(file_path)
+        changed = False
+        for shard in self.shards:
+            if shard is owner or shard.has_source(key):
+                changed = shard.update_source(file_path) or changed
+        return changed
+
+    def schedule_source_update(self, file_path: Path):
+        """Like update_source() but queued on the shards' workers; returns immediately."""
+        file_path = Path(file_path)
+        key = self._source_key(file_path)
+        owner = self._shard_for(file_path)
+        for shard in self.shards:
+            if shard is owner or shard.has_source(key):
+                shard.schedule_source_update(file_path)
+
+    def close(self):
+        """Wait for every shard's queued updates and save the shards they changed. Called on shutdown."""
+        for shard in self.shards:
+            shard.close()
+        self._query_executor.shutdown(wait=False)
 
     # ------------------------------------------------------------------------------
     # RETRIEVER FOR CONTEXT
     # ------------------------------------------------------------------------------
 
-    def get_retriever(self, k: int = 10):
-        """Return a retriever that returns the k most similar chunks for a query string."""
-        if not self.vector_store:
-            raise RuntimeError("Vector store not initialized. This should not happen.")
-        return self.vector_store.as_retriever(search_kwargs={"k": k})
+    def embed_query(self, query: str) -> List[float]:
+        """Return the embedding of a search query, from the LRU if it was embedded recently."""
+        return list(self.query_cache.get_or_embed(query, self.embeddings.embed_query))
+
+    def search(
+        self,
+        query: Optional[str],
+        k: int = 10,
+        query_vector: Optional[Sequence[float]] = None,
+        min_score: Optional[float] = None,
+        score_gap: Optional[float] = None,
+        max_chars: Optional[int] = None,
+        mmr: Optional[bool] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        recency_weight: Optional[float] = None,
+        max_age_days: Optional[float] = None,
+    ) -> SearchResult:
+        """
+        Return up to k chunks that best match the query, best first, with similarity scores.
+
+        Every ready shard is searched at once on the query executor (FAISS and, with
+        HYBRID_SEARCH on and a query string, BM25 fused by reciprocal rank fusion per shard);
+        the shards' candidates are merged by score (fused score in hybrid mode). The query is
+        embedded (or taken from the LRU) once, unless query_vector is given. With mmr
+        (default RETRIEVAL_MMR) the k hits are picked from the best fetch_k (MMR_FETCH_K) by
+        maximal marginal relevance with weight lambda_mult (MMR_LAMBDA). With RERANKER on, the
+        best RERANKER_CANDIDATES are rescored by the cross-encoder first (reranker.py).
+        min_score, score_gap and max_chars then trim the top k (see _trim_chunks()). Chat
+        chunks rank lower with age by recency_weight (RECENCY_WEIGHT), and those older than
+        max_age_days (CHAT_MAX_AGE_DAYS) are filtered out inside FAISS (see _dense_search()). Shards
+        still building are skipped; with none ready the result is empty.
+        """
+        shards = [shard for shard in self.shards if shard.is_ready()]
+        if not shards:
+            return SearchResult()
+        started = time.perf_counter()
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+        vector = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        embedded = time.perf_counter()
+
+        hybrid = HYBRID_SEARCH and bool(query)
+        mmr = RETRIEVAL_MMR if mmr is None else mmr
+        rerank = self.reranker is not None and bool(query)
+        pool_k = max(k, fetch_k or MMR_FETCH_K) if mmr else k
+        if rerank:
+            pool_k = max(pool_k, self.reranker.candidates)
+        candidates_k = pool_k * max(1, HYBRID_FETCH_FACTOR) if hybrid else pool_k
+        now = time.time()
+        recency_weight = RECENCY_WEIGHT if recency_weight is None else recency_weight
+        max_age_days = CHAT_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        min_timestamp = now - max_age_days * 86400.0 if max_age_days > 0 else None
+        lookups = [
+            (
+                shard,
+                self._query_executor.submit(shard._dense_search, vector, candidates_k, min_timestamp),
+                self._query_executor.submit(shard._timed_bm25, query, candidates_k) if hybrid else None,
+            )
+            for shard in shards
+        ]
+        chunks: List[RetrievedChunk] = []
+        sparse_ms = 0.0
+        for shard, dense_future, sparse_future in lookups:
+            shard_chunks = dense_future.result()
+            if sparse_future is not None:
+                sparse_hits, shard_sparse_ms = sparse_future.result()
+                sparse_ms = max(sparse_ms, shard_sparse_ms)
+                shard_chunks = shard._fuse(vector[0], shard_chunks, sparse_hits, min_timestamp)
+            chunks.extend(shard_chunks)
+        if recency_weight > 0:
+            self._apply_recency(chunks, now, recency_weight)
+        if hybrid:
+            chunks.sort(key=lambda chunk: _decayed(chunk.fused_score, chunk), reverse=True)
+        else:
+            chunks.sort(key=lambda chunk: _decayed(chunk.score, chunk), reverse=True)
+
+        chunks = chunks[:pool_k]
+        rerank_ms = 0.0
+        if rerank:
+            chunks, rerank_ms = self.reranker.rerank(query, chunks)
+            if recency_weight > 0:
+                # Age the cross-encoder's order too; candidates it did not score stay last, in order.
+                chunks.sort(
+                    key=lambda chunk: (
+                        chunk.rerank_score is not None,
+                        _decayed(rerank_probability(chunk.rerank_score), chunk) if chunk.rerank_score is not None else 0.0,
+                    ),
+                    reverse=True,
+                )
+        if mmr:
+            chunks = self._mmr(chunks, k, MMR_LAMBDA if lambda_mult is None else lambda_mult)
+        chunks = chunks[:k]
+        kept = _trim_chunks(chunks, min_score, score_gap, max_chars)
+        finished = time.perf_counter()
+
+        return SearchResult(
+            chunks=kept,
+            embed_ms=(embedded - started) * 1000,
+            search_ms=(finished - embedded) * 1000,
+            sparse_ms=sparse_ms,
+            rerank_ms=rerank_ms,
+            trimmed=len(chunks) - len(kept),
+        )
+
+    def _apply_recency(self, chunks: List[RetrievedChunk], now: float, weight: float):
+        """Set chunk.recency on every hit with a metadata timestamp (chat exchanges); see recency_factor()."""
+        for chunk in chunks:
+            timestamp = chunk.document.metadata.get("timestamp")
+            if timestamp is not None:
+                chunk.recency = recency_factor(now - timestamp, weight, RECENCY_HALF_LIFE_DAYS)
+
+    def _mmr(self, chunks: List[RetrievedChunk], k: int, lambda_mult: float) -> List[RetrievedChunk]:
+        """Pick k of the candidate hits by maximal marginal relevance, using their stored vectors."""
+        if len(chunks) <= 1:
+            return chunks
+        vectors = self._chunk_vectors(chunks)
+        relevance = np.array([
+            _decayed(rerank_probability(chunk.rerank_score) if chunk.rerank_score is not None else chunk.score, chunk)
+            for chunk in chunks
+        ], dtype=np.float32)
+        return [chunks[i] for i in maximal_marginal_relevance(relevance, vectors, k, lambda_mult)]
+
+    def _chunk_vectors(self, chunks: List[RetrievedChunk]) -> np.ndarray:
+        """
+        Unit vectors of hit chunks: from the memory-mapped embedding cache, else reconstructed
+        from the index of the shard holding them. A chunk with neither (e.g. IVF without a
+        direct map) gets a zero vector.
+        """
+        cached = self.embedding_cache.get_many([chunk.document.page_content for chunk in chunks], record_stats=False)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            wanted = {chunks[i].document.id for i in missing}
+            found: Dict[str, np.ndarray] = {}
+            for shard in self.shards:
+                found.update(shard.reconstruct(wanted - set(found)))
+            dim = len(next((vector for vector in cached if vector is not None), None) or next(iter(found.values()), []))
+            for i in missing:
+                cached[i] = found.get(chunks[i].document.id, np.zeros(dim, dtype=np.float32))
+        return np.asarray(cached, dtype=np.float32)
+
+    def similarity_search(self, query: str, k: int = 10) -> List[Document]:
+        """Return the k chunks most similar to query (search() without scores or timings)."""
+        return self.search(query, k=k).documents
+
+    def stats(self) -> dict:
+        """
+        Counters for monitoring: per-shard index stats, query-embedding LRU, embedding cache,
+        the last embedding run's throughput (None before the model is loaded), reranker.
+        """
+        pipeline = self._embedding_pipeline
+        return {
+            "shards": {shard.name: shard.stats() for shard in self.shards},
+            "query_cache": self.query_cache.stats(),
+            "embedding_cache": self._embedding_cache.stats(),
+            "embedding_pipeline": pipeline.last_run if pipeline else None,
+            "reranker": self.reranker.stats() if self.reranker else None,
+        }
+
+    def get_retriever(self, k: int = 10) -> BaseRetriever:
+        """Return a LangChain retriever that returns the k best chunks (across shards) for a query string."""
+        return _ServiceRetriever(service=self, k=k)
+
+
+class _ServiceRetriever(BaseRetriever):
+    """LangChain retriever over VectorStoreService.similarity_search (kept for compatibility)."""
+
+    service: Any
+    k: int = 10
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        """The k best chunks for query."""
+        return self.service.similarity_search(query, k=self.k)
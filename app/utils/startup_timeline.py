@@ -0,0 +1,157 @@
+"""
+STARTUP TIMELINE UTILITY
+========================
+
+Records where boot time goes: how long imports, model load, document load, chunking,
+embedding, indexing and client creation took, and when the server started serving and
+when the vector index became ready. Logged once both have happened and returned by
+GET /startup.
+
+Times are seconds since this module was first imported (app.main imports it right after
+FastAPI). A phase can run many times and in several threads at once (e.g. embedding in
+every shard's build); each call is kept as a span and:
+  - seconds        - wall-clock time covered by at least one call (overlapping calls count once),
+  - thread_seconds - the sum of all calls (> seconds when calls ran in parallel),
+  - first_start_s / last_end_s - when the phase first started and last ended.
+Phases nested in one thread do not overlap: while an inner phase runs (model_load inside
+embedding, say) the outer one is paused, so within a thread every second is counted under
+one phase only. Phases of different threads still overlap in time (the background index
+build vs. client creation), which the start/end offsets show. Startup is over once the
+"serving" mark and an "index_ready" or "index_failed" mark are set (in either order); the
+timeline then stops recording, so live updates later on do not count as startup, and logs
+its summary.
+
+Example:
+  with startup_timeline.phase("chunking"):
+      chunks = splitter.split_documents(docs)
+  startup_timeline.mark("serving")
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+
+logger = logging.getLogger("J.A.R.V.I.S")
+
+
+class StartupTimeline:
+    """
+    Thread-safe recorder of named phase spans and one-off marks. done_when lists groups of
+    mark names; once every group has at least one mark set, the timeline finishes.
+    """
+
+    def __init__(self, done_when: Sequence[Tuple[str, ...]] = ()):
+        """Start the clock now."""
+        self._origin = time.perf_counter()
+        self._done_when = [tuple(group) for group in done_when]
+        self._phases: Dict[str, dict] = {}
+        self._marks: Dict[str, float] = {}
+        self._finished = False
+        self._lock = threading.Lock()
+        # Per thread: stack of [phase name, start of its current segment] for nested phases.
+        self._local = threading.local()
+
+    def _now(self) -> float:
+        """Seconds since the timeline was created."""
+        return time.perf_counter() - self._origin
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time the with-block as one call of phase `name` (even if the block raises). A phase
+        already running in this thread is paused until the block ends.
+        """
+        stack: List[list] = self._local.__dict__.setdefault("stack", [])
+        started = self._now()
+        if stack:
+            outer = stack[-1]
+            self._add_span(outer[0], outer[1], started, call=False)
+        stack.append([name, started])
+        try:
+            yield
+        finally:
+            ended = self._now()
+            segment_start = stack.pop()[1]
+            self._add_span(name, segment_start, ended, call=True)
+            if stack:
+                stack[-1][1] = ended
+
+    def _add_span(self, name: str, start: float, end: float, call: bool):
+        """Keep [start, end] as a span of phase `name`; call=False for a segment of a paused call."""
+        with self._lock:
+            if self._finished:
+                return
+            entry = self._phases.setdefault(name, {"spans": [], "calls": 0, "first_start_s": start})
+            entry["spans"].append((start, end))
+            entry["calls"] += call
+            entry["first_start_s"] = min(entry["first_start_s"], start)
+
+    def mark(self, name: str):
+        """Remember the current time under `name`; finishes (and logs) once done_when is met."""
+        with self._lock:
+            if self._finished:
+                return
+            self._marks[name] = self._now()
+            done = bool(self._done_when) and all(
+                any(mark in self._marks for mark in group) for group in self._done_when
+            )
+            if done:
+                self._finished = True
+        if done:
+            self.log_summary()
+
+    def report(self) -> dict:
+        """Phases (in order of first start) and marks, all in seconds from the origin."""
+        with self._lock:
+            phases = []
+            for name, entry in sorted(self._phases.items(), key=lambda item: item[1]["first_start_s"]):
+                spans = sorted(entry["spans"])
+                phases.append({
+                    "name": name,
+                    "seconds": round(_covered(spans), 3),
+                    "thread_seconds": round(sum(end - start for start, end in spans), 3),
+                    "calls": entry["calls"],
+                    "first_start_s": round(entry["first_start_s"], 3),
+                    "last_end_s": round(max(end for _, end in spans), 3),
+                })
+            return {
+                "finished": self._finished,
+                "phases": phases,
+                "marks": {name: round(at, 3) for name, at in self._marks.items()},
+            }
+
+    def log_summary(self):
+        """Log one line per phase and mark."""
+        report = self.report()
+        logger.info("Startup timeline (seconds since start):")
+        for entry in report["phases"]:
+            logger.info(
+                "    %-16s %7.2fs  (%.2fs summed over threads, %d call(s), %.2fs-%.2fs)",
+                entry["name"], entry["seconds"], entry["thread_seconds"], entry["calls"],
+                entry["first_start_s"], entry["last_end_s"],
+            )
+        for name, at in report["marks"].items():
+            logger.info("    %-16s at %.2fs", name, at)
+
+
+def _covered(spans: List[Tuple[float, float]]) -> float:
+    """Total length of the union of sorted (start, end) spans."""
+    total = 0.0
+    current_start, current_end = None, None
+    for start, end in spans:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+# Process-wide timeline; everything that runs during startup records into this one.
+startup_timeline = StartupTimeline(done_when=[("serving",), ("index_ready", "index_failed")])
@@ -0,0 +1,11 @@
+"""
+BENCHMARKS PACKAGE
+==================
+
+Stand-alone scripts for tuning the retrieval settings in config.py. They are not used by
+the server; run them from the project root with python -m:
+
+  ann_recall - recall@k vs latency for flat / HNSW / IVF indexes (VECTOR_INDEX_TYPE, HNSW_EF_SEARCH, IVF_NPROBE).
+  embedding_backends - throughput, query latency and vector agreement of torch vs ONNX (EMBEDDING_BACKEND).
+  mmr_latency - added latency, relevance and redundancy of MMR retrieval (RETRIEVAL_MMR, MMR_FETCH_K, MMR_LAMBDA).
+"""
@@ -0,0 +1,126 @@
+"""
+ANN RECALL BENCHMARK - recall@k vs latency for flat / HNSW / IVF
+================================================================
+
+PURPOSE:
+  Helps pick VECTOR_INDEX_TYPE, HNSW_EF_SEARCH and IVF_NPROBE. For each setting it reports
+  recall@k against exact (flat) search and the per-query latency (p50 / p95), using the
+  same index builders the server uses (app/services/faiss_index.py).
+
+DATA:
+  By default the vectors come from the saved shard indexes in database/vector_store/*/
+  (your real chunks, all shards together), and queries are a random sample of those vectors with a little noise added.
+  With --synthetic N it uses N random unit vectors instead (no saved index needed).
+
+USAGE:
+  python -m benchmarks.ann_recall
+  python -m benchmarks.ann_recall --synthetic 200000 --k 10 --queries 500
+
+OUTPUT:
+  A markdown table: index, parameter, recall@k, p50 ms, p95 ms, build seconds.
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+import app.services.faiss_index as faiss_index
+from config import VECTOR_STORE_DIR
+
+
+def load_vectors(synthetic: int, dim: int, seed: int) -> np.ndarray:
+    """Vectors to index: the saved shards' vectors, or `synthetic` random unit vectors."""
+    if synthetic:
+        rng = np.random.default_rng(seed)
+        vectors = rng.standard_normal((synthetic, dim)).astype(np.float32)
+    else:
+        paths = sorted(VECTOR_STORE_DIR.glob("*/index.faiss"))
+        if not paths:
+            raise SystemExit(f"No saved index under {VECTOR_STORE_DIR}; start the server once or use --synthetic")
+        vectors = np.vstack([faiss_index.reconstruct_all(faiss.read_index(str(path))) for path in paths])
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Sample stored vectors and perturb them, so queries look like paraphrases of real chunks."""
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=0.05, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def time_queries(index: faiss.Index, queries: np.ndarray, k: int):
+    """Run queries one at a time (like the server does); return (ids, per-query latencies in ms)."""
+    ids = np.zeros((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids[i] = found[0]
+    return ids, np.array(latencies)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Average fraction of the true top-k that the approximate search also returned."""
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    """Build each index type, sweep its search knob and print the recall/latency table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the saved index")
+    parser.add_argument("--dim", type=int, default=384, help="vector width for --synthetic")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.synthetic, args.dim, args.seed)
+    queries = make_queries(vectors, args.queries, args.seed)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+
+    rows = []
+    started = time.perf_counter()
+    flat = faiss_index.build_index("flat", vectors)
+    build_s = time.perf_counter() - started
+    truth, latencies = time_queries(flat, queries, args.k)
+    rows.append(("flat", "-", 1.0, latencies, build_s))
+
+    sweeps = {
+        "hnsw": [16, 32, 64, 128, 256],
+        "ivf": [1, 4, 8, 16, 32, 64],
+    }
+    for kind, values in sweeps.items():
+        started = time.perf_counter()
+        index = faiss_index.build_index(kind, vectors)
+        build_s = time.perf_counter() - started
+        if faiss_index.index_type(index) != kind:
+            print(f"(skipping {kind}: too few vectors to build it)")
+            continue
+        for value in values:
+            if kind == "hnsw":
+                index.hnsw.efSearch = value
+                label = f"efSearch={value}"
+            else:
+                index.nprobe = value
+                label = f"nprobe={value} (nlist={index.nlist})"
+            found, latencies = time_queries(index, queries, args.k)
+            rows.append((kind, label, recall_at_k(found, truth), latencies, build_s))
+
+    print(f"| index | parameter | recall@{args.k} | p50 ms | p95 ms | build s |")
+    print("|---|---|---|---|---|---|")
+    for kind, label, recall, latencies, build_s in rows:
+        print(
+            f"| {kind} | {label} | {recall:.3f} | {np.percentile(latencies, 50):.3f} "
+            f"| {np.percentile(latencies, 95):.3f} | {build_s:.1f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+EMBEDDING BACKEND BENCHMARK - torch vs ONNX Runtime (fp32 / int8)
+=================================================================
+
+PURPOSE:
+  Helps pick EMBEDDING_BACKEND and EMBEDDING_ONNX_INT8. Each backend embeds the same
+  chunks (throughput, in-process, batch size EMBEDDING_BATCH_SIZE) and the same short
+  queries one at a time (latency), and its vectors are compared with the torch ones:
+  min cosine and max absolute difference. A min cosine of ~1.0 means the saved index and
+  embedding cache can be reused after switching.
+
+DATA:
+  By default the chunks are your learning data split with CHUNK_SIZE / CHUNK_OVERLAP, like
+  the server does. With --synthetic N it uses N random-word chunks of about CHUNK_SIZE chars.
+
+USAGE:
+  python -m benchmarks.embedding_backends
+  python -m benchmarks.embedding_backends --synthetic 500 --queries 100
+
+OUTPUT:
+  A markdown table: backend, load s, chunks/sec, query p50 / p95 ms, min cosine, max |diff|.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.embedding_backends import OnnxEmbeddings, create_embeddings
+from config import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL,
+    EMBEDDING_MODEL_DIR,
+    LEARNING_DATA_DIR,
+)
+
+
+def load_chunks(synthetic: int, seed: int) -> list:
+    """Learning data chunks as the server splits them, or `synthetic` random chunks of ~CHUNK_SIZE chars."""
+    if synthetic:
+        rng = random.Random(seed)
+        words = "the of and to in is you that it he was for on are as with his they at be this".split()
+        words += [f"term{i}" for i in range(500)]
+        chunks = []
+        for _ in range(synthetic):
+            text = ""
+            while len(text) < CHUNK_SIZE:
+                text += rng.choice(words) + " "
+            chunks.append(text.strip())
+        return chunks
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = []
+    for file_path in sorted(LEARNING_DATA_DIR.glob("*.txt")):
+        chunks.extend(splitter.split_text(file_path.read_text(encoding="utf-8")))
+    return chunks
+
+
+def make_queries(chunks: list, count: int, seed: int) -> list:
+    """Short queries: the first few words of randomly picked chunks."""
+    rng = random.Random(seed + 1)
+    return [" ".join(rng.choice(chunks).split()[:8]) for _ in range(count)]
+
+
+def run_backend(embeddings, chunks: list, queries: list):
+    """Return (document vectors, chunks/sec, per-query latencies in ms) for one backend."""
+    started = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    rate = len(chunks) / (time.perf_counter() - started)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return vectors, rate, np.array(latencies)
+
+
+def main():
+    """Load each backend, embed the same chunks and queries, and print the comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random chunks instead of learning data")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.synthetic, args.seed)
+    if not chunks:
+        print("No learning data found; use --synthetic N")
+        return
+    queries = make_queries(chunks, args.queries, args.seed)
+    print(f"{len(chunks)} chunks (avg {sum(map(len, chunks)) / len(chunks):.0f} chars), {len(queries)} queries\n")
+
+    backends = {
+        "torch": lambda: create_embeddings(EMBEDDING_MODEL, "torch", batch_size=EMBEDDING_BATCH_SIZE),
+        "onnx": lambda: OnnxEmbeddings(EMBEDDING_MODEL, EMBEDDING_MODEL_DIR, batch_size=EMBEDDING_BATCH_SIZE),
+        "onnx-int8": lambda: OnnxEmbeddings(
+            EMBEDDING_MODEL, EMBEDDING_MODEL_DIR, int8=True, batch_size=EMBEDDING_BATCH_SIZE
+        ),
+    }
+    rows = []
+    reference = None
+    for name, factory in backends.items():
+        started = time.perf_counter()
+        try:
+            embeddings = factory()
+        except Exception as e:
+            print(f"(skipping {name}: {e})")
+            continue
+        load_s = time.perf_counter() - started
+        vectors, rate, latencies = run_backend(embeddings, chunks, queries)
+        if reference is None:
+            reference = vectors
+        cosine = float(np.min(np.sum(vectors * reference, axis=1)))
+        max_diff = float(np.max(np.abs(vectors - reference)))
+        rows.append((name, load_s, rate, latencies, cosine, max_diff))
+
+    print("| backend | load s | chunks/sec | query p50 ms | query p95 ms | min cosine vs first | max abs diff |")
+    print("|---|---|---|---|---|---|---|")
+    for name, load_s, rate, latencies, cosine, max_diff in rows:
+        print(
+            f"| {name} | {load_s:.1f} | {rate:.1f} | {np.percentile(latencies, 50):.2f} "
+            f"| {np.percentile(latencies, 95):.2f} | {cosine:.6f} | {max_diff:.2e} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+MMR BENCHMARK - added latency and diversity of maximal marginal relevance
+=========================================================================
+
+PURPOSE:
+  Helps pick RETRIEVAL_MMR, MMR_FETCH_K and MMR_LAMBDA. For each setting it runs the same
+  queries through a flat index twice, plain top-k and top-fetch_k + MMR (the selection
+  search() uses, app/services/vector_store.py), and reports the extra time MMR adds per
+  query, plus how similar the returned chunks are to the query (relevance) and to each
+  other (redundancy; lower means more distinct information per prompt).
+
+DATA:
+  By default the vectors come from the saved shard indexes in database/vector_store/*/
+  (your real chunks, all shards together). With --synthetic N it uses N random unit vectors arranged in groups of
+  --copies near-duplicates, which is what overlapping chats look like to the index.
+  Candidate vectors are read back by row, like search() reads them from the embedding cache.
+
+USAGE:
+  python -m benchmarks.mmr_latency
+  python -m benchmarks.mmr_latency --synthetic 50000 --copies 5 --k 10
+
+OUTPUT:
+  A markdown table: fetch_k, lambda, added p50 / p95 ms, mean relevance, mean pairwise similarity.
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+import app.services.faiss_index as faiss_index
+from app.services.vector_store import maximal_marginal_relevance
+from config import VECTOR_STORE_DIR
+
+
+def load_vectors(synthetic: int, copies: int, dim: int, seed: int) -> np.ndarray:
+    """The saved shards' vectors, or `synthetic` random unit vectors in groups of near-duplicates."""
+    if synthetic:
+        rng = np.random.default_rng(seed)
+        bases = rng.standard_normal((max(1, synthetic // copies), dim)).astype(np.float32)
+        vectors = np.repeat(bases, copies, axis=0)[:synthetic]
+        vectors += rng.normal(scale=0.1, size=vectors.shape).astype(np.float32)
+    else:
+        paths = sorted(VECTOR_STORE_DIR.glob("*/index.faiss"))
+        if not paths:
+            raise SystemExit(f"No saved index under {VECTOR_STORE_DIR}; start the server once or use --synthetic")
+        vectors = np.vstack([faiss_index.reconstruct_all(faiss.read_index(str(path))) for path in paths])
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Sample stored vectors and perturb them, so queries look like paraphrases of real chunks."""
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=0.05, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def run(index, vectors: np.ndarray, queries: np.ndarray, k: int, fetch_k: int, lambda_mult):
+    """
+    Search every query (with MMR when lambda_mult is not None); return per-query latencies in ms,
+    mean similarity of the picks to the query, and mean pairwise similarity among the picks.
+    """
+    latencies, relevance, redundancy = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        distances, ids = index.search(query.reshape(1, -1), fetch_k if lambda_mult is not None else k)
+        scores = 1.0 - distances[0] / 2.0
+        rows = ids[0]
+        if lambda_mult is not None:
+            picks = maximal_marginal_relevance(scores, vectors[rows], k, lambda_mult)
+            rows, scores = rows[picks], scores[picks]
+        latencies.append((time.perf_counter() - started) * 1000)
+        picked = vectors[rows]
+        pairwise = picked @ picked.T
+        relevance.append(float(np.mean(scores)))
+        redundancy.append(float((pairwise.sum() - len(rows)) / max(1, len(rows) * (len(rows) - 1))))
+    return np.array(latencies), float(np.mean(relevance)), float(np.mean(redundancy))
+
+
+def main():
+    """Time plain top-k, then sweep fetch_k and lambda for MMR and print the comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the saved index")
+    parser.add_argument("--copies", type=int, default=5, help="near-duplicates per group for --synthetic")
+    parser.add_argument("--dim", type=int, default=384, help="vector width for --synthetic")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.synthetic, max(1, args.copies), args.dim, args.seed)
+    queries = make_queries(vectors, args.queries, args.seed)
+    index = faiss_index.build_index("flat", vectors)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+
+    baseline, base_relevance, base_redundancy = run(index, vectors, queries, args.k, args.k, None)
+    rows = [("-", "plain", baseline, base_relevance, base_redundancy)]
+    for fetch_k in (20, 50):
+        fetch_k = min(max(fetch_k, args.k), len(vectors))
+        for lambda_mult in (0.7, 0.5, 0.3):
+            latencies, relevance, redundancy = run(index, vectors, queries, args.k, fetch_k, lambda_mult)
+            rows.append((fetch_k, lambda_mult, latencies, relevance, redundancy))
+
+    print("| fetch_k | lambda | added p50 ms | added p95 ms | mean relevance | mean pairwise similarity |")
+    print("|---|---|---|---|---|---|")
+    for fetch_k, lambda_mult, latencies, relevance, redundancy in rows:
+        added = latencies - baseline
+        print(
+            f"| {fetch_k} | {lambda_mult} | {np.percentile(added, 50):.3f} | {np.percentile(added, 95):.3f} "
+            f"| {relevance:.3f} | {redundancy:.3f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -100,6 +100,38 @@ def _load_groq_api_keys() -> list:
     return keys
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a true/false setting from the environment (1/true/yes/on vs 0/false/no/off)."""
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a decimal setting from the environment; fall back to default if unset or not a number."""
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Ignoring %s=%r (not a number); using %s", name, value, default)
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment; fall back to default if unset or not a number."""
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring %s=%r (not an integer); using %s", name, value, default)
+        return default
+
+
 GROQ_API_KEYS = _load_groq_api_keys()
 # Backward compatibility: single key name still used in docs; code uses GROQ_API_KEYS.
 GROQ_API_KEY = GROQ_API_KEYS[0] if GROQ_API_KEYS else ""
@@ -126,6 +158,140 @@ EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 CHUNK_SIZE = 1000  # Characters per chunk
 CHUNK_OVERLAP = 200  # Overlap between chunks
 
+# Near-duplicate learning-data chunks (SimHash within DEDUP_MAX_DISTANCE of 64 bits) are indexed
+# once; the kept chunk lists every file it appeared in under metadata["provenance"]. This keeps
+# top-k results from being copies of each other. Chat exchanges are never merged: each keeps its
+# own session and timestamp.
+DEDUP_CHUNKS = _env_bool("DEDUP_CHUNKS", True)
+DEDUP_MAX_DISTANCE = _env_int("DEDUP_MAX_DISTANCE", 3)
+
+# EMBEDDING_BACKEND: how EMBEDDING_MODEL is run.
+#   "torch" - sentence-transformers on PyTorch (default).
+#   "onnx"  - the model's ONNX export on ONNX Runtime (pip install onnxruntime tokenizers): no torch
+#             import, faster on CPU. Same pooling and normalisation as sentence-transformers, so the
+#             vectors match and the saved index and embedding cache stay valid when switching.
+# EMBEDDING_ONNX_INT8: quantize the ONNX weights to int8 (faster again; vectors differ very slightly).
+# ONNX files are downloaded (and quantized) once into EMBEDDING_MODEL_DIR.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+EMBEDDING_ONNX_INT8 = _env_bool("EMBEDDING_ONNX_INT8", False)
+EMBEDDING_MODEL_DIR = BASE_DIR / "database" / "models"
+
+# On-disk cache of chunk vectors keyed by hash(model, chunk text). Index builds look chunks
+# up here first, so unchanged text is never embedded twice. Safe to delete (it is rebuilt).
+EMBEDDING_CACHE_DIR = VECTOR_STORE_DIR / "embedding_cache"
+
+# Index builds embed chunks in batches of EMBEDDING_BATCH_SIZE spread over EMBEDDING_WORKERS
+# processes (each with its own model copy, ~100 MB RAM). EMBEDDING_WORKERS=0 picks half the
+# CPU cores (max 8); 1 keeps everything in-process. EMBEDDING_TORCH_THREADS is the torch (or ONNX
+# Runtime) thread count per worker (0 = cores / workers). Jobs smaller than EMBEDDING_POOL_MIN_CHUNKS always run
+# in-process because starting the workers would cost more than it saves.
+_CPU_COUNT = os.cpu_count() or 1
+EMBEDDING_BATCH_SIZE = _env_int("EMBEDDING_BATCH_SIZE", 64)
+EMBEDDING_WORKERS = _env_int("EMBEDDING_WORKERS", 0) or max(1, min(8, _CPU_COUNT // 2))
+EMBEDDING_TORCH_THREADS = _env_int("EMBEDDING_TORCH_THREADS", 0) or max(1, _CPU_COUNT // EMBEDDING_WORKERS)
+EMBEDDING_POOL_MIN_CHUNKS = _env_int("EMBEDDING_POOL_MIN_CHUNKS", 512)
+
+# ============================================================================
+# VECTOR INDEX CONFIGURATION
+# ============================================================================
+# VECTOR_INDEX_TYPE: "flat" (exact), "hnsw" (graph ANN), "ivf" (inverted-file ANN) or "auto".
+# "auto" uses flat for small corpora and switches to hnsw / ivf once the number of chunks
+# reaches the thresholds below. Search-time recall vs speed: HNSW_EF_SEARCH and IVF_NPROBE
+# (higher = more accurate, slower). IVF_NLIST=0 picks ~4*sqrt(chunks) buckets automatically.
+# benchmarks/ann_recall.py prints recall@k vs latency for these settings on your own index.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto").strip().lower()
+VECTOR_INDEX_HNSW_MIN_VECTORS = _env_int("VECTOR_INDEX_HNSW_MIN_VECTORS", 20_000)
+VECTOR_INDEX_IVF_MIN_VECTORS = _env_int("VECTOR_INDEX_IVF_MIN_VECTORS", 500_000)
+HNSW_M = _env_int("HNSW_M", 32)
+HNSW_EF_CONSTRUCTION = _env_int("HNSW_EF_CONSTRUCTION", 200)
+HNSW_EF_SEARCH = _env_int("HNSW_EF_SEARCH", 64)
+IVF_NLIST = _env_int("IVF_NLIST", 0)
+IVF_NPROBE = _env_int("IVF_NPROBE", 16)
+
+# The index is split into shards saved under database/vector_store/<shard>/: "learning" for
+# learning_data and "chats" for chat sessions, each built, updated and saved on its own.
+# LEARNING_INDEX_TYPE: index type of the learning shard (same values as VECTOR_INDEX_TYPE;
+# "flat" by default because learning data is small and exact search is cheap). The chat
+# shards use VECTOR_INDEX_TYPE. CHAT_SHARD_PERIOD: "none" (one chats shard), "year" or
+# "month" (one shard per period of a session's first message, e.g. chats-2025-06), so a
+# new session only ever touches the small current-period index.
+LEARNING_INDEX_TYPE = os.getenv("LEARNING_INDEX_TYPE", "flat").strip().lower()
+CHAT_SHARD_PERIOD = os.getenv("CHAT_SHARD_PERIOD", "none").strip().lower()
+
+# VECTOR_INDEX_QUANTIZATION: how the index stores vectors. "none" = float32 (1536 bytes per
+# chunk), "sq8" = int8 per dimension (384 bytes, ~4x smaller), "pq" = product quantization
+# with PQ_M sub-vectors of PQ_NBITS bits (48 bytes with the defaults; PQ_M must divide 384).
+# With quantization on, search fetches QUANTIZED_RERANK_FACTOR x k candidates and re-ranks
+# them with the exact float32 vectors from the on-disk embedding cache (1 disables this).
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "none").strip().lower()
+PQ_M = _env_int("PQ_M", 48)
+PQ_NBITS = _env_int("PQ_NBITS", 8)
+QUANTIZED_RERANK_FACTOR = _env_int("QUANTIZED_RERANK_FACTOR", 4)
+
+# ============================================================================
+# RETRIEVAL CONFIGURATION
+# ============================================================================
+# HYBRID_SEARCH: also rank chunks with BM25 (exact words: names, IDs, numbers) and merge
+# that ranking with the dense one by reciprocal rank fusion: score = sum 1 / (RRF_K + rank).
+# Each side contributes its top HYBRID_FETCH_FACTOR x k candidates to the fusion.
+HYBRID_SEARCH = _env_bool("HYBRID_SEARCH", True)
+HYBRID_FETCH_FACTOR = _env_int("HYBRID_FETCH_FACTOR", 3)
+RRF_K = _env_int("RRF_K", 60)
+BM25_K1 = _env_float("BM25_K1", 1.5)
+BM25_B = _env_float("BM25_B", 0.75)
+
+# How much retrieved context goes into the system prompt. Up to RETRIEVAL_K chunks are fetched,
+# then trimmed per query: chunks below RETRIEVAL_MIN_SCORE cosine similarity are dropped, as are
+# chunks more than RETRIEVAL_SCORE_GAP below the best hit, and chunks are kept in rank order only
+# while they fit in RETRIEVAL_MAX_CHARS characters (~4 characters per token). An off-topic
+# question then sends little or no context instead of always ten chunks. 0 disables a limit.
+RETRIEVAL_K = _env_int("RETRIEVAL_K", 10)
+RETRIEVAL_MIN_SCORE = _env_float("RETRIEVAL_MIN_SCORE", 0.2)
+RETRIEVAL_SCORE_GAP = _env_float("RETRIEVAL_SCORE_GAP", 0.2)
+RETRIEVAL_MAX_CHARS = _env_int("RETRIEVAL_MAX_CHARS", 4000)
+
+# Recency of chat-history chunks (learning data never ages). A chat chunk's ranking score is
+# multiplied by (1 - RECENCY_WEIGHT) + RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS),
+# so with the defaults a month-old exchange ranks at 85% of its similarity and a very old
+# one at 70%; RECENCY_WEIGHT=0 turns decay off. CHAT_MAX_AGE_DAYS: chat chunks older than
+# this are never retrieved; the cutoff is applied inside the FAISS search (0 = no cutoff).
+RECENCY_WEIGHT = _env_float("RECENCY_WEIGHT", 0.3)
+RECENCY_HALF_LIFE_DAYS = _env_float("RECENCY_HALF_LIFE_DAYS", 30.0)
+CHAT_MAX_AGE_DAYS = _env_float("CHAT_MAX_AGE_DAYS", 0.0)
+
+# RETRIEVAL_MMR: pick the k chunks by maximal marginal relevance instead of pure similarity.
+# From the best MMR_FETCH_K candidates, each next chunk maximises
+#   MMR_LAMBDA * similarity(query) - (1 - MMR_LAMBDA) * max similarity(already picked chunks),
+# so near-identical passages (e.g. the same fact in several chats) do not fill every slot.
+# MMR_LAMBDA = 1 is plain similarity ranking; lower values favour diversity.
+RETRIEVAL_MMR = _env_bool("RETRIEVAL_MMR", False)
+MMR_FETCH_K = _env_int("MMR_FETCH_K", 20)
+MMR_LAMBDA = _env_float("MMR_LAMBDA", 0.5)
+
+# RERANKER: rescore the best RERANKER_CANDIDATES hits with a local cross-encoder (reads the
+# question and chunk together; much more precise than vector similarity) and keep the best k.
+# With it on, RETRIEVAL_K can be lowered (e.g. 4): the context gets fewer, better chunks.
+# All candidate pairs go through the model in one batch; (question, chunk) scores are cached in
+# an LRU of RERANKER_CACHE_SIZE pairs. RERANKER_BUDGET_MS caps the CPU time per query: from the
+# measured cost per pair, only as many candidates as fit in the budget are scored. The model
+# loads in the background on first use; until it is ready search() skips the rerank stage.
+RERANKER = _env_bool("RERANKER", False)
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_CANDIDATES = _env_int("RERANKER_CANDIDATES", 30)
+RERANKER_BUDGET_MS = _env_float("RERANKER_BUDGET_MS", 250.0)
+RERANKER_CACHE_SIZE = _env_int("RERANKER_CACHE_SIZE", 4096)
+
+# How many recent search queries keep their embedding in memory (0 disables the cache).
+# A repeated question skips the ~10-30 ms CPU embedding; 384 floats per entry is ~3 KB.
+QUERY_EMBEDDING_CACHE_SIZE = _env_int("QUERY_EMBEDDING_CACHE_SIZE", 1024)
+
+# Re-index learning_data/*.txt files while the server runs when they are added, edited or deleted.
+# With watchdog installed, filesystem events are used and a file is re-indexed once it has been quiet
+# for LEARNING_WATCH_DEBOUNCE seconds; otherwise the folder is polled every LEARNING_WATCH_INTERVAL seconds.
+LEARNING_WATCH = _env_bool("LEARNING_WATCH", True)
+LEARNING_WATCH_INTERVAL = _env_float("LEARNING_WATCH_INTERVAL", 15.0)
+LEARNING_WATCH_DEBOUNCE = _env_float("LEARNING_WATCH_DEBOUNCE", 1.0)
+
 # Maximum conversation turns (user+assistant pairs) sent to the LLM per request.
 # Older turns are kept on disk but not sent to avoid context/token limits.
 MAX_CHAT_HISTORY_TURNS = 20
@@ -134,6 +300,38 @@ MAX_CHAT_HISTORY_TURNS = 20
 # and abuse. ~32K chars ≈ ~8K tokens; keeps total prompt well under model limits.
 MAX_MESSAGE_LENGTH = 32_000
 
+# ============================================================================
+# CHAT SESSION STORAGE
+# ============================================================================
+# Each session is a snapshot (chats_data/chat_<id>.json) plus an append-only journal
+# (chat_<id>.jsonl): saving a turn appends only its new messages. Once the journal holds
+# CHAT_JOURNAL_COMPACT_LINES lines it is folded into a fresh snapshot and removed.
+CHAT_JOURNAL_COMPACT_LINES = _env_int("CHAT_JOURNAL_COMPACT_LINES", 64)
+
+# Sessions are written behind the request: a turn marks its session dirty and a background
+# flusher writes every session marked within CHAT_FLUSH_INTERVAL seconds in one round
+# (0 = write inside the request, as before). If writes fall more than CHAT_FLUSH_MAX_LAG
+# seconds behind, new turns wait for them. CHAT_FSYNC: "off" (leave it to the OS),
+# "data" (fsync each written file) or "full" (also fsync chats_data/ after each round, so
+# new and renamed files survive a power cut).
+CHAT_FLUSH_INTERVAL = _env_float("CHAT_FLUSH_INTERVAL", 1.0)
+CHAT_FLUSH_MAX_LAG = _env_float("CHAT_FLUSH_MAX_LAG", 10.0)
+CHAT_FSYNC = os.getenv("CHAT_FSYNC", "data").strip().lower()
+
+# Where sessions are stored (see app/services/session_store.py): "json" (the files above)
+# or "sqlite" (one WAL-mode database at CHAT_DB_PATH; existing JSON sessions are imported
+# the first time it starts empty). With sqlite, connections use synchronous=OFF for CHAT_FSYNC
+# "off" and NORMAL otherwise, and writes that fsync ("data", "full") commit with FULL;
+# CHAT_JOURNAL_COMPACT_LINES does not apply.
+CHAT_STORE = os.getenv("CHAT_STORE", "json").strip().lower()
+CHAT_DB_PATH = BASE_DIR / "database" / "chats.db"
+
+# Sessions kept in memory (see app/services/session_cache.py): at most CHAT_CACHE_MAX_SESSIONS
+# sessions whose messages take about CHAT_CACHE_MAX_MB. Beyond that the least recently used
+# are saved and dropped, and reloaded from the session store on their next request (0 = no limit).
+CHAT_CACHE_MAX_SESSIONS = _env_int("CHAT_CACHE_MAX_SESSIONS", 256)
+CHAT_CACHE_MAX_MB = _env_float("CHAT_CACHE_MAX_MB", 64.0)
+
 # ============================================================================
 # JARVIS PERSONALITY CONFIGURATION
 # ============================================================================
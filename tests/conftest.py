@@ -0,0 +1,83 @@
+"""
+Shared pytest setup: run from the project root (python -m pytest tests) so that
+`config` and `app` import the same way they do for run.py.
+
+FIXTURES:
+  data_dirs       - points every database/ folder (config and the service modules' copies
+                    of it) at a fresh tmp_path tree; returns that tree's BASE_DIR.
+  fake_embeddings - replaces the embedding model with a small deterministic bag-of-words
+                    embedder (no torch, no download) and counts the texts it embeds.
+"""
+
+import hashlib
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+
+FAKE_DIM = 64
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashes words into FAKE_DIM buckets and L2-normalises; texts sharing words score higher."""
+
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(FAKE_DIM, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % FAKE_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector + 1.0 / np.sqrt(FAKE_DIM)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+@pytest.fixture
+def data_dirs(tmp_path, monkeypatch) -> Path:
+    import config
+    from app.services import session_store, vector_store
+
+    base = tmp_path
+    learning = base / "database" / "learning_data"
+    chats = base / "database" / "chats_data"
+    vectors = base / "database" / "vector_store"
+    for directory in (learning, chats, vectors):
+        directory.mkdir(parents=True)
+    for module in (config, vector_store):
+        monkeypatch.setattr(module, "BASE_DIR", base)
+        monkeypatch.setattr(module, "LEARNING_DATA_DIR", learning)
+        monkeypatch.setattr(module, "CHATS_DATA_DIR", chats)
+        monkeypatch.setattr(module, "VECTOR_STORE_DIR", vectors)
+        monkeypatch.setattr(module, "EMBEDDING_CACHE_DIR", vectors / "embedding_cache")
+    monkeypatch.setattr(config, "CHAT_DB_PATH", base / "database" / "chats.db")
+    monkeypatch.setattr(session_store, "CHATS_DATA_DIR", chats)
+    monkeypatch.setattr(session_store, "CHAT_DB_PATH", base / "database" / "chats.db")
+    return base
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch) -> FakeEmbeddings:
+    from app.services import vector_store
+
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(vector_store, "create_embeddings", lambda *args, **kwargs: embeddings)
+    # Keep every batch in-process; pool workers would load the real model.
+    monkeypatch.setattr(vector_store, "EMBEDDING_POOL_MIN_CHUNKS", 10 ** 9)
+    return embeddings
@@ -0,0 +1,70 @@
+"""chat_journal: snapshot + journal reads, torn and stale lines, compaction leftovers."""
+
+import json
+
+from app.services.chat_journal import (
+    append_messages,
+    journal_path,
+    read_journal,
+    read_session,
+    write_snapshot,
+)
+
+
+def message(n):
+    return {"role": "user" if n % 2 == 0 else "assistant", "content": f"m{n}"}
+
+
+def test_read_session_joins_snapshot_and_journal(tmp_path):
+    path = tmp_path / "chat_s.json"
+    write_snapshot(path, "s", [message(0), message(1)])
+    append_messages(path, 2, [message(2), message(3)])
+    session_id, messages, journaled = read_session(path)
+    assert session_id == "s"
+    assert [m["content"] for m in messages] == ["m0", "m1", "m2", "m3"]
+    assert journaled == 2
+
+
+def test_torn_line_is_skipped_and_next_append_starts_a_new_line(tmp_path):
+    path = tmp_path / "chat_s.json"
+    write_snapshot(path, "s", [message(0)])
+    append_messages(path, 1, [message(1)])
+    with open(journal_path(path), "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "role": "us')  # Interrupted append.
+    assert [m["content"] for m in read_journal(path, 1)] == ["m1"]
+
+    append_messages(path, 2, [message(2)])
+    lines = journal_path(path).read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["seq"] == 2
+    assert [m["content"] for m in read_session(path)[1]] == ["m0", "m1", "m2"]
+
+
+def test_lines_already_in_the_snapshot_are_skipped(tmp_path):
+    path = tmp_path / "chat_s.json"
+    write_snapshot(path, "s", [message(0)])
+    append_messages(path, 1, [message(1), message(2)])
+    leftover = journal_path(path).read_text(encoding="utf-8")
+    # Crash after the compacting snapshot was renamed but before the journal was removed.
+    write_snapshot(path, "s", [message(n) for n in range(3)])
+    journal_path(path).write_text(leftover, encoding="utf-8")
+    append_messages(path, 3, [message(3)])
+    _, messages, journaled = read_session(path)
+    assert [m["content"] for m in messages] == ["m0", "m1", "m2", "m3"]
+    assert journaled == 1
+
+
+def test_gap_in_seq_stops_the_replay(tmp_path):
+    path = tmp_path / "chat_s.json"
+    write_snapshot(path, "s", [message(0)])
+    append_messages(path, 1, [message(1)])
+    append_messages(path, 3, [message(3)])  # seq 2 is missing.
+    assert [m["content"] for m in read_journal(path, 1)] == ["m1"]
+
+
+def test_write_snapshot_removes_the_journal(tmp_path):
+    path = tmp_path / "chat_s.json"
+    append_messages(path, 0, [message(0)])
+    write_snapshot(path, "s", [message(0)])
+    assert not journal_path(path).exists()
+    assert not path.with_name(path.name + ".tmp").exists()
+    assert read_journal(path, 0) == []
@@ -0,0 +1,94 @@
+"""Chat shards: routing chats to period shards, and the chat age cutoff in search()."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import vector_store
+from app.services.session_store import JsonSessionStore
+from app.services.vector_store import LEARNING_SHARD, VectorStoreService
+
+
+def chat(topic, when):
+    stamp = when.isoformat()
+    return [
+        {"role": "user", "content": f"tell me about {topic}", "timestamp": stamp},
+        {"role": "assistant", "content": f"{topic} is a fine subject", "timestamp": stamp},
+    ]
+
+
+@pytest.fixture
+def make_service(data_dirs, fake_embeddings):
+    services = []
+
+    def make(sessions):
+        store = JsonSessionStore(data_dirs / "database" / "chats_data")
+        for session_id, messages in sessions.items():
+            store.replace(session_id, messages)
+        service = VectorStoreService(store)
+        services.append(service)
+        service.load_or_create_vector_store()
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+def shard_sessions(service):
+    return {
+        shard.name: sorted(key.rsplit("/", 1)[-1] for key in shard._sources)
+        for shard in service.shards if shard.name != LEARNING_SHARD
+    }
+
+
+@pytest.mark.parametrize("period, expected", [
+    ("month", {
+        "chats-2025-12": ["chat_dec.json"],
+        "chats-2026-01": ["chat_jan.json", "chat_jan2.json"],
+    }),
+    ("year", {
+        "chats-2025": ["chat_dec.json"],
+        "chats-2026": ["chat_jan.json", "chat_jan2.json"],
+    }),
+])
+def test_chats_go_to_the_shard_of_their_first_message(make_service, monkeypatch, period, expected):
+    monkeypatch.setattr(vector_store, "CHAT_SHARD_PERIOD", period)
+    january = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    service = make_service({
+        "dec": chat("winter", datetime(2025, 12, 30, tzinfo=timezone.utc)),
+        "jan": chat("snow", january),
+        # Routed by its first message even though it continued into February.
+        "jan2": chat("ice", january) + chat("thaw", datetime(2026, 2, 2, tzinfo=timezone.utc)),
+    })
+    assert shard_sessions(service) == expected
+
+
+def test_a_new_period_gets_its_own_shard(make_service, monkeypatch):
+    monkeypatch.setattr(vector_store, "CHAT_SHARD_PERIOD", "month")
+    service = make_service({"jan": chat("snow", datetime(2026, 1, 5, tzinfo=timezone.utc))})
+    service.session_store.replace("mar", chat("spring", datetime(2026, 3, 1, tzinfo=timezone.utc)))
+    service.update_source(service.session_store.source_path("mar"))
+    # The new shard builds itself in the background, picking the chat up from the store.
+    deadline = time.monotonic() + 10
+    while not all(shard.is_ready() for shard in service.shards) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert shard_sessions(service) == {"chats-2026-01": ["chat_jan.json"], "chats-2026-03": ["chat_mar.json"]}
+
+
+def test_search_drops_chats_older_than_the_cutoff(data_dirs, make_service):
+    (data_dirs / "database" / "learning_data" / "notes.txt").write_text("notes about rockets", encoding="utf-8")
+    now = datetime.now(timezone.utc)
+    service = make_service({
+        "old": chat("rockets", now - timedelta(days=400)),
+        "new": chat("rockets", now - timedelta(days=2)),
+    })
+
+    def sources(max_age_days):
+        found = service.search("rockets", k=10, max_age_days=max_age_days, recency_weight=0.0).documents
+        return sorted(document.metadata.get("session_id") or document.metadata["source"] for document in found)
+
+    assert sources(0) == ["new", "notes.txt", "old"]
+    # Learning data never ages; only the chat older than 30 days is filtered out.
+    assert sources(30) == ["new", "notes.txt"]
@@ -0,0 +1,43 @@
+"""VectorShard._dense_search(): tombstones are excluded inside FAISS, not by over-fetching."""
+
+import numpy as np
+
+from app.services import vector_store
+from app.services.faiss_index import index_type
+from app.services.session_store import JsonSessionStore
+from app.services.vector_store import LEARNING_SHARD, VectorStoreService
+
+
+def test_tombstones_are_excluded_without_over_fetching(data_dirs, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(vector_store, "LEARNING_INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(vector_store, "TOMBSTONE_REBUILD_RATIO", 10.0)
+    learning = data_dirs / "database" / "learning_data"
+    for n in range(6):
+        (learning / f"note{n}.txt").write_text(f"shared words and topic{n}", encoding="utf-8")
+    service = VectorStoreService(JsonSessionStore(data_dirs / "database" / "chats_data"))
+    service.load_or_create_vector_store()
+    try:
+        shard = service._shards[LEARNING_SHARD]
+        assert index_type(shard.vector_store.index) == "hnsw"
+        for n in range(3):
+            (learning / f"note{n}.txt").unlink()
+            assert service.update_source(learning / f"note{n}.txt")
+        assert shard._tombstones == 3
+
+        fetched = []
+        index = shard.vector_store.index
+        search = index.search
+
+        def spy(vector, k, params=None):
+            fetched.append(k)
+            return search(vector, k, params=params)
+
+        monkeypatch.setattr(index, "search", spy, raising=False)
+        vector = np.asarray([service.embed_query("shared words")], dtype=np.float32)
+        chunks = shard._dense_search(vector, 3)
+        assert fetched == [3]
+        assert sorted(chunk.document.metadata["source"] for chunk in chunks) == [
+            "note3.txt", "note4.txt", "note5.txt",
+        ]
+    finally:
+        service.close()
@@ -0,0 +1,35 @@
+"""embedding_variant(): the cache and manifest are keyed by the backend that actually loaded."""
+
+import json
+
+from app.services import vector_store
+from app.services.embedding_backends import OnnxEmbeddings, embedding_variant
+from app.services.vector_store import LEARNING_SHARD, MANIFEST_FILENAME, VectorStoreService
+
+
+def onnx_stub(int8):
+    """An OnnxEmbeddings without loading a model (only .int8 is read)."""
+    embeddings = OnnxEmbeddings.__new__(OnnxEmbeddings)
+    embeddings.int8 = int8
+    return embeddings
+
+
+def test_variant_of_the_built_embeddings(fake_embeddings):
+    assert embedding_variant(fake_embeddings) == "torch"
+    assert embedding_variant(onnx_stub(False)) == "onnx"
+    assert embedding_variant(onnx_stub(True)) == "onnx-int8"
+
+
+def test_fallback_to_torch_is_what_the_cache_and_manifest_record(data_dirs, fake_embeddings, monkeypatch):
+    # EMBEDDING_BACKEND=onnx, but create_embeddings() fell back to torch (the fake).
+    monkeypatch.setattr("app.services.embedding_backends.EMBEDDING_BACKEND", "onnx")
+    (data_dirs / "database" / "learning_data" / "notes.txt").write_text("some notes", encoding="utf-8")
+    service = VectorStoreService()
+    service.load_or_create_vector_store()
+    try:
+        assert service.embedding_cache.variant == "torch"
+        manifest_path = vector_store.VECTOR_STORE_DIR / LEARNING_SHARD / MANIFEST_FILENAME
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        assert manifest["embedding_variant"] == "torch"
+    finally:
+        service.close()
@@ -0,0 +1,123 @@
+"""EmbeddingCache: lookups through the memory-mapped key index, reopening, damaged files."""
+
+import numpy as np
+import pytest
+
+from app.services import embedding_cache
+from app.services.embedding_cache import EmbeddingCache
+
+
+def vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32).tolist()
+
+
+@pytest.fixture
+def small_tail(monkeypatch):
+    # Rewrite the key index after a handful of appends so tests exercise index + tail lookups.
+    monkeypatch.setattr(embedding_cache, "INDEX_TAIL_ROWS", 8)
+
+
+def test_lookups_survive_reopening(tmp_path, small_tail):
+    cache = EmbeddingCache(tmp_path, "model")
+    texts = [f"text {i}" for i in range(50)]
+    stored = vectors(50)
+    for start in range(0, 50, 6):
+        cache.put_many(texts[start:start + 6], stored[start:start + 6])
+    assert len(cache) == 50
+    assert (tmp_path / "keys.idx.npy").exists()
+
+    reopened = EmbeddingCache(tmp_path, "model")
+    found = reopened.get_many(texts + ["never stored"])
+    assert found[-1] is None
+    assert np.allclose(found[:-1], stored)
+    assert len(reopened._tail) < 50  # Most keys come from the index, not a dict.
+
+
+def test_duplicates_are_stored_once(tmp_path):
+    cache = EmbeddingCache(tmp_path, "model")
+    cache.put_many(["a", "a", "b"], vectors(3))
+    cache.put_many(["b"], vectors(1, seed=1))
+    assert len(cache) == 2
+
+
+def test_model_and_variant_are_part_of_the_key(tmp_path):
+    EmbeddingCache(tmp_path, "model", "torch").put_many(["a"], vectors(1))
+    assert EmbeddingCache(tmp_path, "model", "torch").get_many(["a"])[0] is not None
+    assert EmbeddingCache(tmp_path, "model", "onnx-int8").get_many(["a"]) == [None]
+    assert EmbeddingCache(tmp_path, "other", "torch").get_many(["a"]) == [None]
+
+
+def test_torn_append_is_cut_off(tmp_path):
+    cache = EmbeddingCache(tmp_path, "model")
+    cache.put_many(["a", "b"], vectors(2))
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 6)
+    with open(tmp_path / "keys.bin", "ab") as f:
+        f.write(b"\1" * 16)
+    reopened = EmbeddingCache(tmp_path, "model")
+    assert len(reopened) == 2
+    assert (tmp_path / "keys.bin").stat().st_size == 2 * 16
+    reopened.put_many(["c"], vectors(1))
+    assert all(v is not None for v in EmbeddingCache(tmp_path, "model").get_many(["a", "b", "c"]))
+
+
+@pytest.mark.parametrize("missing", ["keys.bin", "vectors.f32"])
+def test_missing_data_file_resets_the_cache(tmp_path, missing):
+    EmbeddingCache(tmp_path, "model").put_many(["a"], vectors(1))
+    (tmp_path / missing).unlink()
+    cache = EmbeddingCache(tmp_path, "model")
+    assert cache.get_many(["a"]) == [None]
+    assert len(cache) == 0
+    cache.put_many(["a"], vectors(1))
+    assert EmbeddingCache(tmp_path, "model").get_many(["a"])[0] is not None
+
+
+def test_stale_index_is_rebuilt(tmp_path, small_tail):
+    cache = EmbeddingCache(tmp_path, "model")
+    cache.put_many([f"t{i}" for i in range(20)], vectors(20))
+    # Index covering more rows than exist (e.g. from before a truncation) is not trusted.
+    index = np.load(tmp_path / "keys.idx.npy")
+    np.save(tmp_path / "keys.idx.npy", np.concatenate([index, index], axis=1))
+    reopened = EmbeddingCache(tmp_path, "model")
+    assert all(v is not None for v in reopened.get_many([f"t{i}" for i in range(20)]))
+
+
+def test_failed_key_write_is_rolled_back(tmp_path, monkeypatch):
+    cache = EmbeddingCache(tmp_path, "model")
+    first = vectors(2)
+    cache.put_many(["a", "b"], first)
+
+    real_open = open
+
+    class FailingWrite:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def write(self, data):
+            self.f.write(data[:5])  # Part of the keys reach the disk, then the write fails.
+            raise OSError("No space left on device")
+
+    def failing_open(path, mode="r", *args, **kwargs):
+        f = real_open(path, mode, *args, **kwargs)
+        if str(path).endswith("keys.bin") and "a" in mode:
+            return FailingWrite(f)
+        return f
+
+    monkeypatch.setattr(embedding_cache, "open", failing_open, raising=False)
+    cache.put_many(["c"], vectors(1, seed=1))
+    monkeypatch.undo()
+
+    assert (tmp_path / "keys.bin").stat().st_size == 2 * 16
+    assert (tmp_path / "vectors.f32").stat().st_size == 2 * 4 * 4
+    later = vectors(1, seed=2)
+    cache.put_many(["d"], later)
+    found = cache.get_many(["a", "b", "c", "d"])
+    assert np.allclose(found[:2], first)
+    assert found[2] is None
+    assert np.allclose(found[3], later[0])
@@ -0,0 +1,127 @@
+"""SessionCache: LRU eviction by count and bytes, pins, saves before eviction; ChatService reloads."""
+
+import pytest
+
+from app.models import ChatMessage
+from app.services.session_cache import MESSAGE_OVERHEAD_BYTES, SessionCache, message_bytes
+
+
+def msgs(n, text="x"):
+    return [ChatMessage(role="user", content=text) for _ in range(n)]
+
+
+class Saver:
+    """flush callback that records saved ids; ids in `failing` report failure."""
+
+    def __init__(self):
+        self.saved = []
+        self.failing = set()
+        self.on_save = None
+
+    def __call__(self, session_id):
+        if self.on_save:
+            self.on_save(session_id)
+        self.saved.append(session_id)
+        return session_id not in self.failing
+
+
+def test_evicts_least_recently_used_after_saving_it():
+    saver, dropped = Saver(), []
+    cache = SessionCache(saver, max_sessions=2, max_bytes=0, dropped=dropped.append)
+    cache.put("a", msgs(1))
+    cache.put("b", msgs(1))
+    assert cache.get("a") is not None  # a is now more recent than b.
+    cache.put("c", msgs(1))
+    assert saver.saved == ["b"]
+    assert dropped == ["b"]
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_counts_appended_messages():
+    saver = Saver()
+    size = message_bytes(msgs(1)[0])
+    cache = SessionCache(saver, max_sessions=0, max_bytes=3 * size)
+    cache.put("a", msgs(2))
+    cache.put("b", msgs(1))
+    assert len(cache) == 2
+    grown = cache.peek("b")
+    grown.append(msgs(1)[0])
+    cache.account("b", grown[-1])
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 2 * size
+    assert size >= MESSAGE_OVERHEAD_BYTES
+
+
+def test_pinned_and_most_recent_sessions_are_never_evicted():
+    saver = Saver()
+    cache = SessionCache(saver, max_sessions=1, max_bytes=0)
+    with cache.pinned("a"):
+        cache.put("a", msgs(1))
+        cache.put("b", msgs(1))
+        # a is pinned and b is the most recent: nothing can go.
+        assert len(cache) == 2 and saver.saved == []
+    cache.put("c", msgs(1))
+    assert "c" in cache and len(cache) == 1
+    assert sorted(saver.saved) == ["a", "b"]
+
+
+def test_session_that_fails_to_save_or_grows_meanwhile_is_kept():
+    saver = Saver()
+    cache = SessionCache(saver, max_sessions=1, max_bytes=0)
+    cache.put("a", msgs(1))
+    saver.failing.add("a")
+    cache.put("b", msgs(1))
+    assert "a" in cache
+    assert cache.stats()["eviction_failures"] == 1
+
+    saver.failing.clear()
+
+    def grow(session_id):
+        # A request appends to the session while it is being saved.
+        if session_id == "a":
+            messages = cache.peek("a")
+            messages.append(msgs(1)[0])
+            cache.account("a", messages[-1])
+
+    saver.on_save = grow
+    cache.put("c", msgs(1))
+    assert "a" in cache
+
+
+def test_setdefault_returns_the_list_already_cached():
+    cache = SessionCache(Saver(), max_sessions=10, max_bytes=0)
+    first = msgs(2)
+    assert cache.setdefault("s", first) is first
+    assert cache.setdefault("s", msgs(5)) is first
+    assert cache.stats()["bytes"] == sum(map(message_bytes, first))
+
+
+@pytest.fixture
+def chat_service(data_dirs, monkeypatch):
+    from app.services import chat_service as chat_service_module
+    from app.services.session_store import JsonSessionStore
+
+    monkeypatch.setattr(chat_service_module, "CHAT_FLUSH_INTERVAL", 0)
+    store = JsonSessionStore(data_dirs / "database" / "chats_data")
+    service = chat_service_module.ChatService(groq_service=None, session_store=store)
+    yield service
+    service.close()
+
+
+def test_evicted_session_is_saved_and_reloaded(chat_service):
+    chat_service.sessions.max_sessions = 1
+    chat_service.add_message("s1", "user", "first")
+    chat_service.add_message("s2", "user", "second")
+    assert "s1" not in chat_service.sessions
+    assert [m.content for m in chat_service.get_chat_history("s1")] == ["first"]
+
+
+def test_load_keeps_persisted_count_of_session_another_thread_cached(chat_service):
+    chat_service.store.replace("s", [{"role": "user", "content": "a"}])
+    # Another thread loaded the session first, added messages and saved them.
+    theirs = msgs(3)
+    chat_service.sessions.put("s", theirs)
+    chat_service._persisted["s"] = 3
+    assert chat_service._load_session("s") is theirs
+    assert chat_service._persisted["s"] == 3
@@ -0,0 +1,126 @@
+"""SessionFlusher: group-commit rounds, retries with backoff, final drain on stop()."""
+
+import threading
+import time
+
+from app.services.session_flusher import SessionFlusher
+
+
+class RecordingFlush:
+    """flush() stand-in: records each round; ids in `failing` are reported as not written."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.rounds = []
+        self.lock = threading.Lock()
+
+    def __call__(self, session_ids):
+        with self.lock:
+            self.rounds.append(list(session_ids))
+        return [sid for sid in session_ids if sid in self.failing]
+
+    def attempts(self, session_id):
+        with self.lock:
+            return sum(session_id in batch for batch in self.rounds)
+
+
+def test_marks_within_interval_share_one_round():
+    flush = RecordingFlush()
+    flusher = SessionFlusher(flush, interval=0.2, max_lag=1.0)
+    flusher.start()
+    try:
+        for session_id in ("a", "b", "a"):
+            flusher.mark_dirty(session_id)
+        time.sleep(0.5)
+        assert flush.rounds == [["a", "b"]]
+        assert flusher.pending() == 0
+    finally:
+        flusher.stop()
+    assert flusher.stats()["sessions_written"] == 2
+
+
+def test_failing_session_retries_are_bounded_by_backoff():
+    flush = RecordingFlush(failing={"bad"})
+    flusher = SessionFlusher(flush, interval=0.01, max_lag=0.2)
+    flusher.start()
+    try:
+        flusher.mark_dirty("bad")
+        time.sleep(1.0)
+        # Backoff 0.01, 0.02, 0.04, ... capped at 0.2 s allows roughly ten attempts a second;
+        # retrying every round without backoff would make thousands.
+        attempts = flush.attempts("bad")
+        assert 3 <= attempts <= 15
+        assert flusher.stats()["backing_off"] == 1
+
+        # A healthy session is still written on schedule while the failing one backs off.
+        flusher.mark_dirty("good")
+        time.sleep(0.1)
+        assert flush.attempts("good") == 1
+        assert flusher.pending() == 1
+    finally:
+        flusher.stop()
+    # stop() tries the failing session once more regardless of its backoff.
+    assert flush.rounds[-1] == ["bad"]
+
+
+def test_success_after_failures_clears_backoff():
+    flush = RecordingFlush(failing={"s"})
+    flusher = SessionFlusher(flush, interval=0.01, max_lag=0.1)
+    flusher.start()
+    try:
+        flusher.mark_dirty("s")
+        time.sleep(0.1)
+        assert flusher.stats()["failures"] >= 1
+        flush.failing.clear()
+        time.sleep(0.3)
+        assert flusher.pending() == 0
+        assert flusher.stats()["backing_off"] == 0
+    finally:
+        flusher.stop()
+
+
+def test_flush_exception_counts_whole_round_as_failed():
+    calls = []
+
+    def broken(session_ids):
+        calls.append(list(session_ids))
+        raise OSError("disk full")
+
+    flusher = SessionFlusher(broken, interval=0.01, max_lag=1.0)
+    flusher.start()
+    try:
+        flusher.mark_dirty("a")
+        flusher.mark_dirty("b")
+        time.sleep(0.05)
+        assert flusher.pending() == 2
+        assert flusher.stats()["failures"] >= 2
+    finally:
+        flusher.stop()
+    assert sorted(calls[0]) == ["a", "b"]
+
+
+def test_stop_without_start_writes_everything():
+    flush = RecordingFlush()
+    flusher = SessionFlusher(flush, interval=10.0, max_lag=10.0)
+    flusher.mark_dirty("a")
+    flusher.mark_dirty("b")
+    flusher.stop()
+    assert flush.rounds == [["a", "b"]]
+
+
+def test_failing_session_does_not_throttle_other_sessions():
+    flush = RecordingFlush(failing={"bad"})
+    flusher = SessionFlusher(flush, interval=0.01, max_lag=0.3)
+    flusher.start()
+    try:
+        flusher.mark_dirty("bad")
+        time.sleep(0.6)  # "bad" is now older than max_lag and still unwritten.
+        started = time.monotonic()
+        for n in range(5):
+            flusher.mark_dirty(f"good{n}")
+        assert time.monotonic() - started < 0.1
+        assert flusher.stats()["backpressure_waits"] == 0
+        time.sleep(0.1)
+        assert all(flush.attempts(f"good{n}") == 1 for n in range(5))
+    finally:
+        flusher.stop()
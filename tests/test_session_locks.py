@@ -0,0 +1,71 @@
+"""SessionLocks: one turn per session at a time, sessions independent, table cleaned up."""
+
+import threading
+import time
+
+from app.services.session_locks import SessionLocks
+
+
+def run_turns(locks, session_ids, seconds=0.1):
+    """Hold each session's lock for `seconds` in its own thread; returns (elapsed, wait times)."""
+    waits = []
+    lock = threading.Lock()
+
+    def turn(session_id):
+        with locks.hold(session_id) as wait_ms:
+            time.sleep(seconds)
+        with lock:
+            waits.append(wait_ms)
+
+    threads = [threading.Thread(target=turn, args=(sid,)) for sid in session_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, waits
+
+
+def test_turns_of_one_session_run_one_after_another():
+    locks = SessionLocks()
+    elapsed, waits = run_turns(locks, ["s", "s", "s"])
+    assert elapsed >= 0.29
+    assert sum(wait > 0 for wait in waits) == 2
+    stats = locks.stats()
+    assert stats["acquisitions"] == 3
+    assert stats["contended"] == 2
+    assert stats["wait_ms_max"] >= 90
+
+
+def test_different_sessions_do_not_wait_for_each_other():
+    locks = SessionLocks()
+    elapsed, waits = run_turns(locks, ["a", "b", "c"])
+    assert elapsed < 0.25
+    assert waits == [0.0, 0.0, 0.0]
+    assert locks.stats()["contended"] == 0
+
+
+def test_entries_are_removed_when_the_last_holder_leaves():
+    locks = SessionLocks()
+    with locks.hold("s"):
+        with locks.hold("s"):  # Re-entrant.
+            assert locks.stats()["busy_sessions"] == 1
+        assert locks.stats()["busy_sessions"] == 1
+    assert locks.stats()["busy_sessions"] == 0
+    assert locks._entries == {}
+
+    run_turns(locks, ["a", "a", "b"], seconds=0.02)
+    assert locks._entries == {}
+    assert locks.stats()["waiting"] == 0
+
+
+def test_lock_is_released_when_the_turn_raises():
+    locks = SessionLocks()
+    try:
+        with locks.hold("s"):
+            raise RuntimeError("turn failed")
+    except RuntimeError:
+        pass
+    assert locks._entries == {}
+    _, waits = run_turns(locks, ["s"], seconds=0)
+    assert waits == [0.0]
@@ -0,0 +1,152 @@
+"""SqliteSessionStore, migration from the JSON files, and create_session_store()."""
+
+import threading
+
+import pytest
+
+from app.services import session_store
+from app.services.chat_journal import append_messages, write_snapshot
+from app.services.session_store import JsonSessionStore, SessionStore, SqliteSessionStore, create_session_store
+
+
+def messages(*contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": c} for i, c in enumerate(contents)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteSessionStore(tmp_path / "chats.db", tmp_path / "chats_data")
+    yield store
+    store.close()
+
+
+def test_replace_append_load_and_page(store):
+    assert store.load("s") is None
+    store.replace("s", messages("a", "b"))
+    store.append("s", 2, messages("c", "d"))
+    assert [m["content"] for m in store.load("s")] == ["a", "b", "c", "d"]
+    assert [m["content"] for m in store.read_page("s", 1, 2)] == ["b", "c"]
+    store.replace("s", messages("x"))
+    assert [m["content"] for m in store.load("s")] == ["x"]
+
+
+def test_timestamps_round_trip_and_are_optional(store):
+    store.replace("s", [{"role": "user", "content": "hi", "timestamp": "2026-01-01T00:00:00+00:00"},
+                        {"role": "assistant", "content": "hello"}])
+    assert store.load("s") == [
+        {"role": "user", "content": "hi", "timestamp": "2026-01-01T00:00:00+00:00"},
+        {"role": "assistant", "content": "hello"},
+    ]
+
+
+def test_source_paths_stamps_and_bulk_iteration(store):
+    store.replace("a-b", messages("one"))
+    store.replace("c", messages("two", "three"))
+    path = store.source_path("a-b")
+    assert path.name == "chat_ab.json"
+    assert store.list_sources() == [path, store.source_path("c")]
+
+    stamp = store.source_stamp(path)
+    sha = store.source_sha256(path)
+    store.append("a-b", 1, messages("four"))
+    assert store.source_stamp(path) != stamp
+    assert store.source_sha256(path) != sha
+    session_id, stored = store.read_source(path)
+    assert (session_id, [m["content"] for m in stored]) == ("a-b", ["one", "four"])
+    assert store.source_stamp(store.directory / "chat_missing.json") is None
+
+    sessions = {p.name: (sid, len(m)) for p, sid, m in store.iter_sessions()}
+    assert sessions == {"chat_ab.json": ("a-b", 2), "chat_c.json": ("c", 2)}
+
+
+def test_fsync_commits_with_synchronous_full_then_restores_default(store):
+    conn = store._conn()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    store.replace("s", messages("a"), fsync=True)
+    store.append("s", 1, messages("b"), fsync=False)
+    conn.set_trace_callback(None)
+    pragmas = [s for s in statements if s.startswith("PRAGMA synchronous")]
+    assert pragmas == ["PRAGMA synchronous=FULL", "PRAGMA synchronous=NORMAL"]
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+def test_failed_write_rolls_back(store):
+    store.replace("s", messages("a"))
+    with pytest.raises(Exception):
+        store.replace("s", [{"role": None, "content": None}], fsync=True)
+    assert [m["content"] for m in store.load("s")] == ["a"]
+    assert not store._conn().in_transaction
+
+
+def test_each_thread_gets_its_own_connection(store):
+    store.replace("s", messages("a"))
+    seen = []
+
+    def read():
+        seen.append((store._conn(), store.load("s")))
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    assert seen[0][0] is not store._conn()
+    assert seen[0][1] == messages("a")
+
+
+def test_migrate_from_json_imports_snapshot_and_journal_once(tmp_path, store):
+    chats = tmp_path / "chats_data"
+    chats.mkdir()
+    write_snapshot(chats / "chat_s1.json", "s-1", messages("a", "b"))
+    append_messages(chats / "chat_s1.json", 2, messages("c"))
+    write_snapshot(chats / "chat_s2.json", "s2", messages("x"))
+    (chats / "chat_bad.json").write_text("{not json", encoding="utf-8")
+
+    assert store.migrate_from_json(chats) == 2
+    assert [m["content"] for m in store.load("s-1")] == ["a", "b", "c"]
+    assert store.source_path("s-1") == chats / "chat_s1.json"
+    # Sessions already in the database are skipped, even if their files changed since.
+    append_messages(chats / "chat_s1.json", 3, messages("d"))
+    assert store.migrate_from_json(chats) == 0
+    assert len(store.load("s-1")) == 3
+
+
+def test_create_session_store_migrates_an_empty_database(data_dirs, monkeypatch):
+    chats = data_dirs / "database" / "chats_data"
+    write_snapshot(chats / "chat_old.json", "old", messages("hello"))
+
+    monkeypatch.setattr(session_store, "CHAT_STORE", "json")
+    assert isinstance(create_session_store(), JsonSessionStore)
+
+    store = create_session_store("sqlite")
+    try:
+        assert isinstance(store, SqliteSessionStore)
+        assert store.load("old") == messages("hello")
+        assert store.synchronous == ("OFF" if session_store.CHAT_FSYNC == "off" else "NORMAL")
+    finally:
+        store.close()
+
+
+def test_session_ids_that_sanitize_alike_get_distinct_sources(store):
+    store.replace("a-b", messages("first"))
+    store.replace("ab", messages("second"))
+    store.append("ab", 1, messages("more"))
+    store.append("a-b", 1, messages("again"))
+    assert [m["content"] for m in store.load("a-b")] == ["first", "again"]
+    assert [m["content"] for m in store.load("ab")] == ["second", "more"]
+
+    first, second = store.source_path("a-b"), store.source_path("ab")
+    assert first.name == "chat_ab.json"
+    assert second != first and second.stem.startswith("chat_ab_")
+    assert sorted(store.list_sources()) == sorted([first, second])
+    assert store.read_source(second)[0] == "ab"
+    # The source a session got is kept for good.
+    assert store.source_path("ab") == second
+
+
+def test_a_store_missing_part_of_the_interface_cannot_be_created(tmp_path):
+    class Partial(SessionStore):
+        def load(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial(tmp_path)
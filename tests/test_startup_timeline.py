@@ -0,0 +1,54 @@
+"""StartupTimeline: nested phases do not overlap; parallel calls count wall-clock time once."""
+
+import threading
+import time
+
+from app.utils.startup_timeline import StartupTimeline
+
+
+def phases(timeline):
+    return {entry["name"]: entry for entry in timeline.report()["phases"]}
+
+
+def test_nested_phase_pauses_the_outer_one():
+    timeline = StartupTimeline()
+    with timeline.phase("embedding"):
+        time.sleep(0.05)
+        with timeline.phase("model_load"):
+            time.sleep(0.1)
+        time.sleep(0.05)
+    report = phases(timeline)
+    assert report["embedding"]["calls"] == 1
+    assert report["model_load"]["calls"] == 1
+    assert 0.08 <= report["embedding"]["seconds"] < 0.15
+    assert 0.08 <= report["model_load"]["seconds"] < 0.15
+
+
+def test_parallel_calls_report_wall_clock_and_summed_time():
+    timeline = StartupTimeline()
+
+    def build():
+        with timeline.phase("indexing"):
+            time.sleep(0.1)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    entry = phases(timeline)["indexing"]
+    assert entry["calls"] == 4
+    assert entry["seconds"] < 0.2
+    assert entry["thread_seconds"] >= 0.38
+
+
+def test_recording_stops_once_done():
+    timeline = StartupTimeline(done_when=[("serving",), ("index_ready", "index_failed")])
+    timeline.mark("serving")
+    timeline.mark("index_failed")
+    with timeline.phase("late"):
+        pass
+    report = timeline.report()
+    assert report["finished"]
+    assert "late" not in phases(timeline)
+    assert set(report["marks"]) == {"serving", "index_failed"}
@@ -0,0 +1,104 @@
+"""VectorStoreService startup build: the background build and reusing the saved index."""
+
+import os
+
+import pytest
+
+from app.services import vector_store
+from app.services.session_store import JsonSessionStore
+from app.services.vector_store import LEARNING_SHARD, VectorShard, VectorStoreService
+
+
+@pytest.fixture
+def learning(data_dirs):
+    folder = data_dirs / "database" / "learning_data"
+    for name, text in (("alpha.txt", "alpha notes about rockets"), ("beta.txt", "beta notes about oceans")):
+        (folder / name).write_text(text, encoding="utf-8")
+    return folder
+
+
+@pytest.fixture
+def restart(data_dirs, fake_embeddings, monkeypatch):
+    """
+    Build the index once, then return a function that starts a fresh service on the saved
+    one and returns it with the learning-shard rebuilds, chunked files and hashed files.
+    """
+    first = VectorStoreService(JsonSessionStore(data_dirs / "database" / "chats_data"))
+    first.load_or_create_vector_store()
+    first.close()
+    fake_embeddings.embedded.clear()
+    rebuilt, chunked, hashed = [], [], []
+    create, chunk = VectorShard.create_vector_store, VectorShard._chunk_source
+    file_sha256 = vector_store._file_sha256
+
+    def spy_create(shard):
+        # The chats shard has no sessions here, so it always rebuilds its empty placeholder.
+        if shard.name == LEARNING_SHARD:
+            rebuilt.append(shard.name)
+        return create(shard)
+
+    def spy_chunk(shard, file_path, *args, **kwargs):
+        chunked.append(file_path.name)
+        return chunk(shard, file_path, *args, **kwargs)
+
+    def spy_sha256(file_path):
+        hashed.append(file_path.name)
+        return file_sha256(file_path)
+
+    monkeypatch.setattr(VectorShard, "create_vector_store", spy_create)
+    monkeypatch.setattr(VectorShard, "_chunk_source", spy_chunk)
+    monkeypatch.setattr(vector_store, "_file_sha256", spy_sha256)
+    services = []
+
+    def start():
+        service = VectorStoreService(JsonSessionStore(data_dirs / "database" / "chats_data"))
+        services.append(service)
+        service.load_or_create_vector_store()
+        return service, rebuilt, chunked, hashed
+
+    yield start
+    for service in services:
+        service.close()
+
+
+def test_background_build_makes_every_shard_searchable(data_dirs, fake_embeddings):
+    (data_dirs / "database" / "learning_data" / "notes.txt").write_text("the launch code is amber", encoding="utf-8")
+    store = JsonSessionStore(data_dirs / "database" / "chats_data")
+    store.replace("s1", [{"role": "user", "content": "what about the amber launch"}])
+    service = VectorStoreService(store)
+    try:
+        service.start_background_build()
+        assert service.wait_until_ready(timeout=30)
+        assert all(shard.is_ready() for shard in service.shards)
+        contents = [document.page_content for document in service.similarity_search("amber launch", k=5)]
+        assert any("launch code" in content for content in contents)
+        assert any("amber launch" in content for content in contents)
+    finally:
+        service.close()
+
+
+def test_restart_with_unchanged_sources_reuses_the_saved_index(learning, restart, fake_embeddings):
+    service, rebuilt, chunked, hashed = restart()
+    assert rebuilt == [] and chunked == [] and hashed == []
+    assert fake_embeddings.embedded == []
+    assert [doc.metadata["source"] for doc in service.similarity_search("rockets", k=1)] == ["alpha.txt"]
+
+
+def test_changed_content_reindexes_only_that_source(learning, restart, fake_embeddings):
+    (learning / "beta.txt").write_text("beta notes about deep oceans and tides", encoding="utf-8")
+    service, rebuilt, chunked, hashed = restart()
+    assert rebuilt == []
+    assert chunked == hashed == ["beta.txt"]
+    assert fake_embeddings.embedded == ["beta notes about deep oceans and tides"]
+    assert service.similarity_search("tides", k=1)[0].page_content == "beta notes about deep oceans and tides"
+
+
+def test_touched_file_is_rehashed_but_not_reindexed(learning, restart, fake_embeddings):
+    stat = (learning / "alpha.txt").stat()
+    os.utime(learning / "alpha.txt", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    service, rebuilt, chunked, hashed = restart()
+    assert rebuilt == [] and chunked == []
+    assert hashed == ["alpha.txt"]
+    assert fake_embeddings.embedded == []
+    shard = service._shards[LEARNING_SHARD]
+    assert shard._sources[service._source_key(learning / "alpha.txt")]["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
@@ -0,0 +1,111 @@
+"""VectorShard.update_source(): appended chat turns, edited history and deleted files."""
+
+import pytest
+
+from app.services.chat_journal import append_messages, write_snapshot
+from app.services.session_store import JsonSessionStore
+from app.services.vector_store import CHATS_SHARD, VectorStoreService
+
+
+def exchange(n):
+    return [
+        {"role": "user", "content": f"question {n} about topic{n}", "timestamp": f"2026-01-01T00:0{n}:00+00:00"},
+        {"role": "assistant", "content": f"answer {n} about topic{n}", "timestamp": f"2026-01-01T00:0{n}:30+00:00"},
+    ]
+
+
+@pytest.fixture
+def service(data_dirs, fake_embeddings):
+    (data_dirs / "database" / "learning_data" / "notes.txt").write_text("some learning notes", encoding="utf-8")
+    store = JsonSessionStore(data_dirs / "database" / "chats_data", compact_lines=1000)
+    store.replace("s1", exchange(0) + exchange(1))
+    service = VectorStoreService(store)
+    service.load_or_create_vector_store()
+    yield service
+    service.close()
+
+
+def chat_entry(service, store_path):
+    shard = service._shards[CHATS_SHARD]
+    return shard, shard._sources[service._source_key(store_path)]
+
+
+def test_stats_report_the_last_embedding_run(service):
+    last_run = service.stats()["embedding_pipeline"]
+    assert last_run["chunks"] >= 1
+    assert set(last_run) == {"chunks", "seconds", "chunks_per_sec", "workers"}
+
+
+def test_appended_turns_are_added_without_reembedding(service, fake_embeddings):
+    store = service.session_store
+    path = store.source_path("s1")
+    shard, entry = chat_entry(service, path)
+    old_ids = list(entry["ids"])
+    assert entry["turns"] == 2
+
+    store.append("s1", 4, exchange(2))
+    fake_embeddings.embedded.clear()
+    assert service.update_source(path)
+
+    _, entry = chat_entry(service, path)
+    assert entry["turns"] == 3
+    assert entry["ids"][:len(old_ids)] == old_ids
+    assert len(entry["ids"]) == len(old_ids) + 1
+    # Only the new exchange reached the model; the indexed ones were kept as they were.
+    assert len(fake_embeddings.embedded) == 1
+    assert "topic2" in fake_embeddings.embedded[0]
+    assert not service.update_source(path)
+
+
+def test_edited_history_reindexes_the_whole_chat(service, fake_embeddings):
+    store = service.session_store
+    path = store.source_path("s1")
+    _, entry = chat_entry(service, path)
+    old_ids = set(entry["ids"])
+
+    edited = exchange(0) + exchange(1)
+    edited[1]["content"] = "a different first answer"
+    store.replace("s1", edited + exchange(2))
+    fake_embeddings.embedded.clear()
+    assert service.update_source(path)
+
+    _, entry = chat_entry(service, path)
+    assert entry["turns"] == 3
+    assert not old_ids & set(entry["ids"])
+    assert any("a different first answer" in text for text in fake_embeddings.embedded)
+
+
+def test_journal_appends_take_the_fast_path(data_dirs, service, fake_embeddings):
+    path = service.session_store.source_path("s1")
+    write_snapshot(path, "s1", exchange(0) + exchange(1))
+    append_messages(path, 4, exchange(2))
+    append_messages(path, 6, exchange(3))
+    fake_embeddings.embedded.clear()
+    assert service.update_source(path)
+    assert len(fake_embeddings.embedded) == 2
+    _, entry = chat_entry(service, path)
+    assert entry["turns"] == 4
+
+
+def test_deleting_a_duplicates_owner_hands_the_chunk_to_the_other_file(data_dirs, fake_embeddings):
+    learning = data_dirs / "database" / "learning_data"
+    paragraph = "the reactor core runs on palladium and needs a fresh cell every week"
+    for name in ("first.txt", "second.txt"):
+        (learning / name).write_text(paragraph, encoding="utf-8")
+    service = VectorStoreService(JsonSessionStore(data_dirs / "database" / "chats_data"))
+    service.load_or_create_vector_store()
+    try:
+        [hit] = service.similarity_search("reactor palladium", k=5)
+        owner = hit.metadata["source"]
+        other = ({"first.txt", "second.txt"} - {owner}).pop()
+        assert len(hit.metadata["provenance"]) == 2
+
+        (learning / owner).unlink()
+        assert service.update_source(learning / owner)
+
+        [hit] = service.similarity_search("reactor palladium", k=5)
+        assert hit.page_content == paragraph
+        assert hit.metadata["source"] == other
+        assert hit.metadata["provenance"] == [service._source_key(learning / other)]
+    finally:
+        service.close()